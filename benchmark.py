@@ -0,0 +1,431 @@
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+from src import QOI, QOICompressed, QOIDecoder, QOIEncoder, load_image
+from src.compressed import METHODS
+
+INPUT_IMAGE = "fruits.png"
+
+DEFAULT_SIZES = (64, 256, 512)
+DEFAULT_REPEAT = 3
+# Relative slowdown (or size/memory growth) reported as a regression
+DEFAULT_THRESHOLD = 0.10
+# Levels of the second-stage compressors measured by the compression benchmark
+DEFAULT_LEVELS = (1, 6, 9)
+
+
+# --- Corpus ---
+
+
+def _flat(size, rng):
+    return np.broadcast_to(np.array([40, 120, 200], np.uint8), (size, size, 3)).copy()
+
+
+def _gradient(size, rng):
+    ramp = np.linspace(0, 255, size)
+    image = np.empty((size, size, 3), np.uint8)
+    image[..., 0] = ramp[None, :]
+    image[..., 1] = ramp[:, None]
+    image[..., 2] = (ramp[None, :] + ramp[:, None]) / 2
+    return image
+
+
+def _noise(size, rng):
+    return rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+
+
+def _photo(size, rng):
+    if os.path.exists(INPUT_IMAGE):
+        img = Image.open(INPUT_IMAGE).convert("RGB")
+        return np.asarray(img.resize((size, size), Image.Resampling.BICUBIC)).copy()
+    # Smooth random field with some grain, when the sample photo is missing
+    coarse = rng.integers(0, 256, (size // 16 + 2, size // 16 + 2, 3), dtype=np.uint8)
+    img = Image.fromarray(coarse).resize((size, size), Image.Resampling.BICUBIC)
+    grain = rng.integers(-4, 5, (size, size, 3))
+    return np.clip(np.asarray(img) + grain, 0, 255).astype(np.uint8)
+
+
+def _alpha(size, rng):
+    image = np.empty((size, size, 4), np.uint8)
+    image[..., :3] = _photo(size, rng)
+    yy, xx = np.mgrid[0:size, 0:size]
+    image[..., 3] = ((xx * 7 + yy * 3) % 256).astype(np.uint8)
+    # Sprinkle fully transparent holes
+    image[rng.random((size, size)) < 0.1, 3] = 0
+    return image
+
+
+def _long_run(size, rng):
+    # Horizontal bands of a few hundred identical pixels
+    colors = rng.integers(0, 256, (size * size // 300 + 1, 3), dtype=np.uint8)
+    lengths = rng.integers(100, 500, len(colors))
+    flat = np.repeat(colors, lengths, axis=0)[: size * size]
+    if len(flat) < size * size:
+        flat = np.concatenate([flat, np.zeros((size * size - len(flat), 3), np.uint8)])
+    return flat.reshape(size, size, 3)
+
+
+CORPUS_KINDS = {
+    "flat": _flat,
+    "gradient": _gradient,
+    "noise": _noise,
+    "photo": _photo,
+    "alpha": _alpha,
+    "long-run": _long_run,
+}
+
+
+def make_corpus(sizes=DEFAULT_SIZES, kinds=None, seed=0):
+    """
+    Generate the benchmark images, identical from one run to the next.
+
+    :param sizes: Square image sizes.
+    :param kinds: Subset of CORPUS_KINDS, or None for all of them.
+    :param seed: Random seed.
+    :return: List of (name, kind, pixels) with pixels a (size, size, channels) uint8 array.
+    """
+    corpus = []
+    for kind in kinds or CORPUS_KINDS:
+        for size in sizes:
+            rng = np.random.default_rng([seed, size, list(CORPUS_KINDS).index(kind)])
+            corpus.append((f"{kind}-{size}", kind, CORPUS_KINDS[kind](size, rng)))
+    return corpus
+
+
+# --- Implementations ---
+
+
+def _description(pixels):
+    height, width, channels = pixels.shape
+    return {"width": width, "height": height, "channels": channels, "colorspace": 0}
+
+
+def _png_encode(pixels):
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _png_decode(data):
+    return Image.open(io.BytesIO(data)).tobytes()
+
+
+IMPLEMENTATIONS = {
+    "python": (
+        lambda pixels: QOIEncoder.encode(pixels.tobytes(), _description(pixels)),
+        lambda data: QOIDecoder.decode(data)["data"],
+    ),
+    "numpy": (
+        lambda pixels: QOIEncoder.encode_vectorized(pixels, _description(pixels)),
+        lambda data: QOIDecoder.decode_vectorized(data)["data"],
+    ),
+    "qoi-class": (
+        lambda pixels: QOI.encode(
+            pixels.tobytes(), *pixels.shape[1::-1], pixels.shape[2]
+        ),
+        lambda data: QOI.decode(data)["data"],
+    ),
+    "png": (_png_encode, _png_decode),
+}
+
+try:
+    import qoi as OfficialQOI
+
+    IMPLEMENTATIONS["c-extension"] = (
+        OfficialQOI.encode,
+        lambda data: OfficialQOI.decode(data).tobytes(),
+    )
+except ImportError:
+    pass
+
+
+# --- Measurements ---
+
+
+def _best_time(fn, arg, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _peak_memory(fn, arg):
+    tracemalloc.start()
+    try:
+        fn(arg)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmarks(corpus, implementations=None, repeat=DEFAULT_REPEAT, log=print):
+    """
+    Time every implementation on every image of the corpus.
+
+    Timings are the best of `repeat` runs; peak memory is measured on a separate
+    run under tracemalloc (allocations made outside Python's allocators, e.g. by
+    C extensions using malloc directly, are not seen).
+
+    :param corpus: Output of make_corpus.
+    :param implementations: Names from IMPLEMENTATIONS, or None for all of them.
+    :param repeat: Timed runs per measurement.
+    :param log: Progress callback, or None.
+    :return: List of result dictionaries.
+    """
+    results = []
+    for name, kind, pixels in corpus:
+        megapixels = pixels.shape[0] * pixels.shape[1] / 1e6
+        for impl in implementations or IMPLEMENTATIONS:
+            encode, decode = IMPLEMENTATIONS[impl]
+            encode_time, encoded = _best_time(encode, pixels, repeat)
+            decode_time, decoded = _best_time(decode, bytes(encoded), repeat)
+            result = {
+                "image": name,
+                "kind": kind,
+                "width": pixels.shape[1],
+                "height": pixels.shape[0],
+                "channels": pixels.shape[2],
+                "implementation": impl,
+                "encode_mps": megapixels / encode_time,
+                "decode_mps": megapixels / decode_time,
+                "bytes_per_pixel": len(encoded) / (megapixels * 1e6),
+                "encode_peak_bytes": _peak_memory(encode, pixels),
+                "decode_peak_bytes": _peak_memory(decode, bytes(encoded)),
+                "roundtrip_ok": bytes(decoded) == pixels.tobytes(),
+            }
+            results.append(result)
+            if log is not None:
+                log(
+                    f"{name:>14} {impl:>12}  enc {result['encode_mps']:8.2f} MP/s"
+                    f"  dec {result['decode_mps']:8.2f} MP/s"
+                    f"  {result['bytes_per_pixel']:.3f} B/px"
+                    + ("" if result["roundtrip_ok"] else "  ROUNDTRIP MISMATCH")
+                )
+    return results
+
+
+def save_results(path, results, repeat=DEFAULT_REPEAT):
+    """Write results as JSON, with enough metadata to tell machines and versions apart."""
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def run_compression_benchmarks(
+    corpus, methods=None, levels=DEFAULT_LEVELS, repeat=DEFAULT_REPEAT, log=print
+):
+    """
+    Measure the size/throughput trade-off of `QOICompressed` at every method and level.
+
+    Every image also gets a "qoi" row (plain `QOIEncoder.encode_vectorized` output,
+    level 0) as the reference for sizes and speeds.
+
+    :param corpus: Output of make_corpus (or any list of (name, kind, pixels)).
+    :param methods: Names from src.compressed.METHODS, or None for all of them.
+    :param levels: Compression levels measured for every method.
+    :param repeat: Timed runs per measurement.
+    :param log: Progress callback, or None.
+    :return: List of result dictionaries.
+    """
+    results = []
+    for name, kind, pixels in corpus:
+        megapixels = pixels.shape[0] * pixels.shape[1] / 1e6
+        description = _description(pixels)
+        plain_size = None
+        configurations = [("qoi", 0)] + [
+            (method, level) for method in methods or METHODS for level in levels
+        ]
+        for method, level in configurations:
+            if method == "qoi":
+                encode = lambda p: QOIEncoder.encode_vectorized(p, description)
+                decode = lambda data: QOIDecoder.decode_vectorized(data)["data"]
+            else:
+                encode = lambda p: QOICompressed.encode(p, description, method, level)
+                decode = lambda data: QOICompressed.decode(data)["data"]
+
+            encode_time, encoded = _best_time(encode, pixels, repeat)
+            decode_time, decoded = _best_time(decode, encoded, repeat)
+            if plain_size is None:
+                plain_size = len(encoded)
+            result = {
+                "image": name,
+                "kind": kind,
+                "method": method,
+                "level": level,
+                "encode_mps": megapixels / encode_time,
+                "decode_mps": megapixels / decode_time,
+                "bytes_per_pixel": len(encoded) / (megapixels * 1e6),
+                "raw_ratio": len(encoded) / pixels.size,
+                "qoi_ratio": len(encoded) / plain_size,
+                "roundtrip_ok": decoded == pixels.tobytes(),
+            }
+            results.append(result)
+            if log is not None:
+                log(
+                    f"{name:>14} {method:>5} {level}  enc {result['encode_mps']:8.2f} MP/s"
+                    f"  dec {result['decode_mps']:8.2f} MP/s"
+                    f"  {result['raw_ratio']:6.1%} of raw"
+                    f"  {result['qoi_ratio']:6.1%} of QOI"
+                    + ("" if result["roundtrip_ok"] else "  ROUNDTRIP MISMATCH")
+                )
+    return results
+
+
+# --- Regression tracking ---
+
+# metric -> True if higher is better
+COMPARED_METRICS = {
+    "encode_mps": True,
+    "decode_mps": True,
+    "bytes_per_pixel": False,
+    "encode_peak_bytes": False,
+    "decode_peak_bytes": False,
+}
+
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare two result lists measured on the same corpus.
+
+    :param baseline: Results of the reference run.
+    :param current: Results of the run under test.
+    :param threshold: Relative change tolerated before flagging a regression.
+    :return: List of (image, implementation, metric, baseline value, current value,
+             relative change, regressed) rows; relative change is signed so that
+             negative is worse.
+    """
+    reference = {(r["image"], r["implementation"]): r for r in baseline}
+    rows = []
+    for result in current:
+        base = reference.get((result["image"], result["implementation"]))
+        if base is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = base[metric], result[metric]
+            if old == 0:
+                continue
+            change = (new - old) / old if higher_is_better else (old - new) / old
+            rows.append(
+                (
+                    result["image"],
+                    result["implementation"],
+                    metric,
+                    old,
+                    new,
+                    change,
+                    change < -threshold,
+                )
+            )
+        if base["roundtrip_ok"] and not result["roundtrip_ok"]:
+            rows.append(
+                (result["image"], result["implementation"], "roundtrip_ok")
+                + (True, False, -1.0, True)
+            )
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="QOI codec benchmark suite.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Run the benchmarks and save JSON results")
+    run.add_argument("-o", "--output", default="bench_results.json")
+    run.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    run.add_argument("--kinds", nargs="+", choices=list(CORPUS_KINDS))
+    run.add_argument("--impl", nargs="+", choices=list(IMPLEMENTATIONS))
+    run.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    run.add_argument("--seed", type=int, default=0)
+
+    compression = commands.add_parser(
+        "compression", help="Measure QOI + zlib/bz2/lzma sizes and speeds"
+    )
+    compression.add_argument("-o", "--output", help="Also save JSON results here")
+    compression.add_argument(
+        "--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES)
+    )
+    compression.add_argument("--kinds", nargs="+", choices=list(CORPUS_KINDS))
+    compression.add_argument(
+        "--images", nargs="+", default=[], help="Also measure these image files"
+    )
+    compression.add_argument("--methods", nargs="+", choices=list(METHODS))
+    compression.add_argument(
+        "--levels", type=int, nargs="+", default=list(DEFAULT_LEVELS)
+    )
+    compression.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    compression.add_argument("--seed", type=int, default=0)
+
+    compare = commands.add_parser("compare", help="Flag regressions against a baseline")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    compare.add_argument(
+        "-v", "--verbose", action="store_true", help="Show unchanged metrics too"
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        corpus = make_corpus(args.sizes, args.kinds, args.seed)
+        results = run_benchmarks(corpus, args.impl, args.repeat)
+        save_results(args.output, results, args.repeat)
+        print(f"Saved {len(results)} results to {args.output}")
+        return 0 if all(r["roundtrip_ok"] for r in results) else 1
+
+    if args.command == "compression":
+        corpus = make_corpus(args.sizes, args.kinds, args.seed)
+        for path in args.images:
+            corpus.append((os.path.basename(path), "file", load_image(path)[0]))
+        results = run_compression_benchmarks(
+            corpus, args.methods, args.levels, args.repeat
+        )
+        if args.output:
+            save_results(args.output, results, args.repeat)
+        return 0 if all(r["roundtrip_ok"] for r in results) else 1
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    with open(args.current) as f:
+        current = json.load(f)["results"]
+
+    rows = compare_results(baseline, current, args.threshold)
+    regressions = 0
+    for image, impl, metric, old, new, change, regressed in rows:
+        regressions += regressed
+        if regressed or args.verbose or change > args.threshold:
+            flag = (
+                "REGRESSION"
+                if regressed
+                else "improved" if change > args.threshold else ""
+            )
+            print(
+                f"{image:>14} {impl:>12} {metric:>18}  {old:12.4g} -> {new:12.4g}"
+                f"  {change:+7.1%}  {flag}"
+            )
+    print(f"{regressions} regressions out of {len(rows)} comparisons")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
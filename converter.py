@@ -1,45 +1,542 @@
+import argparse
+import functools
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
 from PIL import Image
 
-from src import QOIDecoder, QOIEncoder
+from src import (
+    ConversionCache,
+    PNGReader,
+    PNGWriter,
+    QOIDecoder,
+    QOIEncoder,
+    QOIStreamDecoder,
+    QOIStreamEncoder,
+    load_image,
+)
 
 INPUT_IMAGE = "fruits.png"
 
+RAW_EXTENSIONS = (".dng", ".cr2", ".nef", ".arw", ".raw")
+MANIFEST_NAME = ".qoi-manifest.json"
+
+# Pixels decoded and encoded at a time by the streaming conversions
+STREAM_BATCH_PIXELS = 1 << 16
+
+
+def png_to_qoi(png_path, qoi_path, verbose=True, streaming=False):
+    """
+    Convert a PNG file to QOI.
+
+    :param streaming: Decode the PNG row by row and encode rows as they come, so
+                      memory use does not grow with the image size. Slower than
+                      Pillow on Average/Paeth-filtered rows; PNG files the
+                      streaming reader does not support go through Pillow.
+    """
+    if streaming and _png_to_qoi_streaming(png_path, qoi_path):
+        if verbose:
+            print(f"Converted {png_path} to {qoi_path}")
+        return
 
-def png_to_qoi(png_path, qoi_path):
     img = Image.open(png_path)
+    if img.mode not in ("RGB", "RGBA"):
+        has_alpha = "A" in img.getbands() or "transparency" in img.info
+        img = img.convert("RGBA" if has_alpha else "RGB")
     width, height = img.size
-    raw_data = img.tobytes()
 
-    encoded = QOIEncoder.encode(
-        raw_data,
+    QOIEncoder.encode_to_file(
+        np.asarray(img),
         {
             "width": width,
             "height": height,
             "channels": len(img.getbands()),
             "colorspace": 0,
         },
+        qoi_path,
     )
+    if verbose:
+        print(f"Converted {png_path} to {qoi_path}")
 
-    with open(qoi_path, "wb") as f:
-        f.write(encoded)
-    print(f"Converted {png_path} to {qoi_path}")
 
+def _png_to_qoi_streaming(png_path, qoi_path):
+    """Convert with PNGReader feeding QOIStreamEncoder; False if the PNG is not supported."""
+    with open(png_path, "rb") as f:
+        try:
+            reader = PNGReader(f)
+        except ValueError:
+            return False
 
-def qoi_to_png(qoi_path, png_path):
-    with open(qoi_path, "rb") as f:
-        content = f.read()
+        stream = QOIStreamEncoder(
+            {
+                "width": reader.width,
+                "height": reader.height,
+                "channels": reader.channels,
+                "colorspace": 0,
+            }
+        )
+        batch_rows = STREAM_BATCH_PIXELS // max(reader.width, 1)
+        with open(qoi_path, "wb") as out:
+            for chunk in stream.iter_encode(reader.iter_rows(batch_rows)):
+                out.write(chunk)
+    return True
 
-    decoded = QOIDecoder.decode(content)
+
+def qoi_to_png(qoi_path, png_path, verbose=True, streaming=False, compress_level=6):
+    """
+    Convert a QOI file to PNG.
+
+    :param streaming: Decode the QOI file row by row and write rows to the PNG as
+                      they come, so memory use does not grow with the image size.
+    :param compress_level: zlib level of the PNG, from 0 (fastest) to 9 (smallest).
+    """
+    if streaming:
+        _qoi_to_png_streaming(qoi_path, png_path, compress_level)
+        if verbose:
+            print(f"Converted {qoi_path} to {png_path}")
+        return
+
+    decoded = QOIDecoder.decode_file(qoi_path)
     mode = "RGBA" if decoded["channels"] == 4 else "RGB"
 
-    img = Image.frombytes(
-        mode, (decoded["width"], decoded["height"]), bytes(decoded["data"])
+    img = Image.frombuffer(
+        mode, (decoded["width"], decoded["height"]), decoded["data"], "raw", mode, 0, 1
+    )
+    img.save(png_path, format="PNG", compress_level=compress_level)
+    if verbose:
+        print(f"Converted {qoi_path} to {png_path}")
+
+
+def _qoi_to_png_streaming(qoi_path, png_path, compress_level):
+    """Convert with QOIStreamDecoder feeding PNGWriter."""
+    with open(qoi_path, "rb") as f, open(png_path, "wb") as out:
+        stream = QOIStreamDecoder(f)
+        writer = PNGWriter(
+            out, stream.width, stream.height, stream.output_channels, compress_level
+        )
+        batch_rows = STREAM_BATCH_PIXELS // max(stream.width, 1)
+        for rows in stream.iter_rows(batch_rows):
+            writer.write_rows(rows)
+        writer.close()
+
+
+def raw_to_qoi(raw_path, qoi_path, verbose=True):
+    pixel_data, desc = load_image(raw_path)
+    QOIEncoder.encode_to_file(pixel_data, desc, qoi_path)
+    if verbose:
+        print(f"Converted {raw_path} to {qoi_path}")
+
+
+# --- Batch conversion ---
+
+CONVERSIONS = {".png": (".qoi", png_to_qoi), ".qoi": (".png", qoi_to_png)}
+CONVERSIONS.update({ext: (".qoi", raw_to_qoi) for ext in RAW_EXTENSIONS})
+
+
+def collect_jobs(inputs, output_dir=None):
+    """
+    Expand files, directories (recursively) and glob patterns into conversions.
+
+    :param inputs: Paths or glob patterns.
+    :param output_dir: Directory receiving the outputs, or None to write next to the inputs.
+                       Files found in a directory keep their path relative to it.
+    :return: Sorted list of (source, destination) paths.
+    """
+    jobs = {}
+    for source, base in find_files(inputs):
+        stem, ext = os.path.splitext(source)
+        if ext.lower() not in CONVERSIONS:
+            continue
+        target = stem + CONVERSIONS[ext.lower()][0]
+        if output_dir is not None:
+            name = os.path.relpath(target, base) if base else os.path.basename(target)
+            target = os.path.join(output_dir, name)
+        jobs[source] = target
+    return sorted(jobs.items())
+
+
+def exclude_outputs(jobs, manifest):
+    """
+    Keep conversions from reading or overwriting each other's files when
+    outputs are written next to the inputs.
+
+    Files the manifest records as converted from another input of the batch
+    are outputs of an earlier run, not inputs. A remaining conversion whose
+    output is the input of another one (a.png and a.qoi, both given) is refused.
+
+    :param jobs: (source, destination) pairs, as returned by `collect_jobs`.
+    :param manifest: Manifest of previous conversions.
+    :return: (jobs to run, refused jobs) lists.
+    """
+    sources = {os.path.abspath(source) for source, _ in jobs}
+    jobs = [
+        (source, target)
+        for source, target in jobs
+        if manifest.get(os.path.abspath(source), {}).get("source") not in sources
+    ]
+    sources = {os.path.abspath(source) for source, _ in jobs}
+    refused = [job for job in jobs if os.path.abspath(job[1]) in sources]
+    return [job for job in jobs if job not in refused], refused
+
+
+def find_files(inputs):
+    """
+    Expand files, directories (recursively) and glob patterns into file paths.
+
+    :param inputs: Paths or glob patterns.
+    :return: Generator of (path, base) pairs, base being the directory the file
+             was found in, or None for files given directly or by pattern.
+    """
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            for root, _, files in os.walk(pattern):
+                for name in files:
+                    yield os.path.join(root, name), pattern
+        else:
+            matches = (
+                glob.glob(pattern, recursive=True)
+                if glob.has_magic(pattern)
+                else [pattern]
+            )
+            for path in matches:
+                if os.path.isfile(path):
+                    yield path, None
+
+
+def load_manifest(path):
+    """Read a manifest of previous conversions, keyed by destination path."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_manifest(path, manifest):
+    """Write the manifest atomically, so an interrupted run never truncates it."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=0, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def is_up_to_date(source, target, manifest):
+    """
+    A conversion is skipped when its output is newer than its input, or when the
+    manifest records this exact input (size and mtime) and output (size).
+    """
+    try:
+        source_stat = os.stat(source)
+        target_stat = os.stat(target)
+    except FileNotFoundError:
+        return False
+
+    if target_stat.st_mtime_ns >= source_stat.st_mtime_ns:
+        return True
+
+    entry = manifest.get(os.path.abspath(target))
+    return entry is not None and entry == {
+        "source": os.path.abspath(source),
+        "source_size": source_stat.st_size,
+        "source_mtime_ns": source_stat.st_mtime_ns,
+        "target_size": target_stat.st_size,
+    }
+
+
+def write_atomic(convert, source, target):
+    """Run a conversion through a temporary file, so a partial output never looks up to date."""
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    try:
+        convert(source, tmp_path, verbose=False)
+        os.replace(tmp_path, target)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def convert_file(
+    source,
+    target,
+    cache_dir=None,
+    cache_bytes=None,
+    streaming=False,
+    compress_level=None,
+):
+    """
+    Convert one file in a worker process, reusing the conversion cache if one is given.
+    With streaming, PNG and QOI files are converted row by row (see `png_to_qoi`
+    and `qoi_to_png`); compress_level applies to PNG outputs.
+
+    :return: (source, target, input size, manifest entry or None, error message or None)
+    """
+    try:
+        source_stat = os.stat(source)
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        convert = CONVERSIONS[os.path.splitext(source)[1].lower()][1]
+        options = {}
+        if streaming and convert in (png_to_qoi, qoi_to_png):
+            options["streaming"] = True
+        if compress_level is not None and convert is qoi_to_png:
+            options["compress_level"] = compress_level
+        params = {"conversion": convert.__name__, **options}
+        convert = functools.partial(convert, **options)
+        if cache_dir is None:
+            write_atomic(convert, source, target)
+        else:
+            ConversionCache(cache_dir, cache_bytes).convert(
+                source,
+                target,
+                functools.partial(write_atomic, convert),
+                params,
+            )
+    except Exception as e:
+        return source, target, 0, None, f"{type(e).__name__}: {e}"
+
+    entry = {
+        "source": os.path.abspath(source),
+        "source_size": source_stat.st_size,
+        "source_mtime_ns": source_stat.st_mtime_ns,
+        "target_size": os.stat(target).st_size,
+    }
+    return source, target, source_stat.st_size, entry, None
+
+
+def batch_convert(
+    inputs,
+    output_dir=None,
+    workers=None,
+    manifest_path=None,
+    force=False,
+    cache_dir=None,
+    cache_bytes=None,
+    streaming=False,
+    compress_level=None,
+):
+    """
+    Convert PNG to QOI, QOI to PNG and RAW to QOI on a process pool.
+
+    :param inputs: Files, directories or glob patterns.
+    :param output_dir: Directory receiving the outputs, or None to write next to the inputs.
+    :param workers: Number of worker processes, defaults to the CPU count.
+    :param manifest_path: Manifest of completed conversions, defaults to
+                          MANIFEST_NAME in the output (or current) directory.
+    :param force: Convert even when the output is up to date.
+    :param cache_dir: Content-addressed conversion cache directory, or None to disable it.
+    :param cache_bytes: Byte budget of the cache, enforced as the batch progresses.
+    :param streaming: Convert row by row in bounded memory where supported.
+    :param compress_level: zlib level of PNG outputs (0-9), or None for the default.
+    :return: (converted, skipped, failed) counts, refused conversions counting as failed.
+    """
+    if manifest_path is None:
+        manifest_path = os.path.join(output_dir or ".", MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    cache = None if cache_dir is None else ConversionCache(cache_dir, cache_bytes)
+
+    jobs, refused = exclude_outputs(collect_jobs(inputs, output_dir), manifest)
+    for source, target in refused:
+        sys.stderr.write(f"Refusing {source}: {target} is an input too\n")
+    pending = [
+        (source, target)
+        for source, target in jobs
+        if force or not is_up_to_date(source, target, manifest)
+    ]
+    skipped = len(jobs) - len(pending)
+    print(f"{len(jobs)} files, {skipped} up to date, {len(pending)} to convert")
+
+    converted = failed = done_bytes = 0
+    started = last_report = last_save = time.perf_counter()
+
+    def report(final=False):
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        sys.stderr.write(
+            f"\r{converted + failed}/{len(pending)} files"
+            f"  {(converted + failed) / elapsed:.1f} files/s"
+            f"  {done_bytes / elapsed / 1e6:.1f} MB/s" + ("\n" if final else "")
+        )
+        sys.stderr.flush()
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Bounded submission keeps memory flat on very large batches
+        queue = iter(pending)
+        running = set()
+        while True:
+            while len(running) < workers * 4:
+                job = next(queue, None)
+                if job is None:
+                    break
+                running.add(
+                    executor.submit(
+                        convert_file,
+                        *job,
+                        cache_dir,
+                        cache_bytes,
+                        streaming,
+                        compress_level,
+                    )
+                )
+            if not running:
+                break
+
+            finished, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                source, target, size, entry, error = future.result()
+                if error is not None:
+                    failed += 1
+                    sys.stderr.write(f"\nFailed {source}: {error}\n")
+                    continue
+                converted += 1
+                done_bytes += size
+                manifest[os.path.abspath(target)] = entry
+
+            now = time.perf_counter()
+            if now - last_report > 0.2:
+                report()
+                last_report = now
+            # Persist progress now and then, so an interrupted run resumes
+            if now - last_save > 30:
+                save_manifest(manifest_path, manifest)
+                if cache is not None:
+                    cache.evict()
+                last_save = now
+
+    report(final=True)
+    save_manifest(manifest_path, manifest)
+    if cache is not None:
+        cache.evict()
+    return converted, skipped, failed + len(refused)
+
+
+def check_file(path, full=False):
+    """
+    Probe (header only) or validate (whole chunk stream) one QOI file.
+
+    :return: (path, description, error) tuple, description being None on error.
+    """
+    try:
+        check = QOIDecoder.validate if full else QOIDecoder.probe
+        return path, check(path), None
+    except (OSError, ValueError) as e:
+        return path, None, str(e)
+
+
+def check_files(inputs, full=False, workers=None):
+    """
+    Probe or validate every .qoi file of the inputs without decoding pixels.
+
+    Probing prints one tab-separated line (path, width, height, channels,
+    colorspace) per file; validating only reports invalid files.
+
+    :param inputs: Files, directories or glob patterns.
+    :param full: Validate the chunk streams instead of reading the headers only.
+    :param workers: Number of worker processes, defaults to the CPU count.
+    :return: (checked, invalid) counts.
+    """
+    paths = sorted(
+        path
+        for path, _ in find_files(inputs)
+        if os.path.splitext(path)[1].lower() == ".qoi"
+    )
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        invalid = _report_checks((check_file(path, full) for path in paths), full)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            invalid = _report_checks(
+                executor.map(
+                    functools.partial(check_file, full=full), paths, chunksize=256
+                ),
+                full,
+            )
+
+    sys.stderr.write(f"{len(paths)} files checked, {invalid} invalid\n")
+    return len(paths), invalid
+
+
+def _report_checks(results, full) -> int:
+    """Print the outcome of every check_file result; returns the number of invalid files."""
+    invalid = 0
+    for path, description, error in results:
+        if error is not None:
+            invalid += 1
+            sys.stderr.write(f"Invalid {path}: {error}\n")
+        elif not full:
+            print(
+                f"{path}\t{description['width']}\t{description['height']}"
+                f"\t{description['channels']}\t{description['colorspace']}"
+            )
+    return invalid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Convert PNG to QOI, QOI to PNG and RAW to QOI in parallel."
+    )
+    parser.add_argument("inputs", nargs="+", help="Files, directories or globs")
+    parser.add_argument("-o", "--output-dir", help="Write outputs to this directory")
+    parser.add_argument("-j", "--workers", type=int, help="Worker processes")
+    parser.add_argument("--manifest", help=f"Manifest path (default: {MANIFEST_NAME})")
+    parser.add_argument(
+        "-f", "--force", action="store_true", help="Convert up-to-date files too"
     )
-    img.save(png_path)
-    print(f"Converted {qoi_path} to {png_path}")
+    parser.add_argument("--cache", help="Conversion cache directory")
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=ConversionCache.DEFAULT_MAX_BYTES >> 20,
+        help="Conversion cache budget in MiB",
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Convert row by row in bounded memory (slower for PNG inputs)",
+    )
+    parser.add_argument(
+        "--png-level",
+        type=int,
+        choices=range(10),
+        help="zlib level of PNG outputs, 0 (fastest) to 9 (smallest)",
+    )
+    parser.add_argument(
+        "--probe",
+        action="store_true",
+        help="Print the dimensions of the .qoi inputs instead of converting",
+    )
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="Check the structure of the .qoi inputs instead of converting",
+    )
+    args = parser.parse_args(argv)
+
+    if args.probe or args.validate:
+        _, invalid = check_files(args.inputs, args.validate, args.workers)
+        return 1 if invalid else 0
+
+    _, _, failed = batch_convert(
+        args.inputs,
+        args.output_dir,
+        args.workers,
+        args.manifest,
+        args.force,
+        args.cache,
+        args.cache_size << 20,
+        args.streaming,
+        args.png_level,
+    )
+    return 1 if failed else 0
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(main())
+
     # Example conversions
     png_to_qoi(INPUT_IMAGE, "fruits_converted.qoi")
     qoi_to_png("fruits_converted.qoi", "fruits_reconverted.png")
@@ -1,4 +1,6 @@
-from src import QOIEncoder, load_image
+import os
+
+from src import ConversionCache, QOIEncoder, load_image
 
 INPUT_IMAGE = "fruits.png"
 OUTPUT_QOI = "fruits.qoi"
@@ -7,17 +9,45 @@ INPUT_IMAGE = "test.dng"
 OUTPUT_QOI = "test.qoi"
 OUTPUT_PNG = "test.png"
 
-if __name__ == "__main__":
-    pixel_data, desc = load_image(INPUT_IMAGE)
+# Encoded outputs are reused when the same source is converted again (None disables it)
+CACHE_DIR = ".qoi-cache"
+# Developed RAW pixels are kept as memory-mapped .npy files (None disables it),
+# least recently used files being evicted beyond RAW_CACHE_BYTES
+RAW_CACHE_DIR = ".raw-cache"
+RAW_CACHE_BYTES = 1 << 30
+# Demosaic RAW files at half resolution, much faster than a full development
+HALF_SIZE = False
+
+
+def encode_image(input_path, output_path):
+    pixel_data, desc = load_image(
+        input_path,
+        half_size=HALF_SIZE,
+        raw_cache_dir=RAW_CACHE_DIR,
+        raw_cache_bytes=RAW_CACHE_BYTES,
+    )
     print(
-        f"Loaded image {INPUT_IMAGE}: {desc['width']}x{desc['height']} Channels: {desc['channels']}"
+        f"Loaded image {input_path}: {desc['width']}x{desc['height']} Channels: {desc['channels']}"
     )
-    print(f"Original {INPUT_IMAGE} {len(pixel_data)} bytes")
+    print(f"Original {input_path} {pixel_data.nbytes} bytes")
+
+    # Encode to QOI with our implementation, writing block by block straight
+    # from the loaded buffer
+    QOIEncoder.encode_to_file(pixel_data, desc, output_path)
 
-    # Encode to QOI in pure Python (our implementation)
-    encoded = QOIEncoder.encode(pixel_data.tobytes(), desc)
 
-    with open(OUTPUT_QOI, "wb") as f:
-        f.write(encoded)
+if __name__ == "__main__":
+    if CACHE_DIR is None:
+        encode_image(INPUT_IMAGE, OUTPUT_QOI)
+    else:
+        cache = ConversionCache(CACHE_DIR)
+        if cache.convert(
+            INPUT_IMAGE,
+            OUTPUT_QOI,
+            encode_image,
+            {"conversion": "load_image", "half_size": HALF_SIZE},
+        ):
+            print(f"Reused cached QOI for {INPUT_IMAGE}")
+        cache.evict()
 
-    print(f"Encoded QOI to {len(encoded)} bytes")
+    print(f"Encoded QOI to {os.path.getsize(OUTPUT_QOI)} bytes")
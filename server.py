@@ -0,0 +1,449 @@
+import argparse
+import asyncio
+import collections
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from src import QOIDecoder, QOIEncoder
+from src.decoder import parse_header
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Response bodies are written in chunks of this size, waiting for the client in between
+STREAM_CHUNK_BYTES = 1 << 16
+# Number of recent requests the latency percentiles are computed over
+LATENCY_WINDOW = 1000
+
+
+# --- Conversions (run in the worker processes) ---
+
+
+def png_to_qoi_bytes(data: bytes, max_pixels: int) -> bytes:
+    img = Image.open(io.BytesIO(data))
+    if img.size[0] * img.size[1] > max_pixels:
+        raise OverflowError("image has too many pixels")
+    if img.mode not in ("RGB", "RGBA"):
+        has_alpha = "A" in img.getbands() or "transparency" in img.info
+        img = img.convert("RGBA" if has_alpha else "RGB")
+
+    return QOIEncoder.encode_vectorized(
+        np.asarray(img),
+        {
+            "width": img.size[0],
+            "height": img.size[1],
+            "channels": len(img.mode),
+            "colorspace": 0,
+        },
+    )
+
+
+def qoi_to_png_bytes(data: bytes, max_pixels: int) -> bytes:
+    width, height, _, _, _ = parse_header(data[:14])
+    if width * height > max_pixels:
+        raise OverflowError("image has too many pixels")
+
+    decoded = QOIDecoder.decode_vectorized(data)
+    mode = "RGBA" if decoded["channels"] == 4 else "RGB"
+    img = Image.frombuffer(
+        mode, (decoded["width"], decoded["height"]), decoded["data"], "raw", mode, 0, 1
+    )
+    out = io.BytesIO()
+    img.save(out, format="PNG")
+    return out.getvalue()
+
+
+ROUTES = {
+    "/png-to-qoi": (png_to_qoi_bytes, "image/qoi"),
+    "/qoi-to-png": (qoi_to_png_bytes, "image/png"),
+}
+
+
+# --- Server ---
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, reason: str, message: str = ""):
+        super().__init__(message or reason)
+        self.status = status
+        self.reason = reason
+
+
+class ConversionService:
+    """
+    Minimal HTTP/1.1 conversion server running the codecs on a process pool.
+
+    `POST /png-to-qoi` and `POST /qoi-to-png` take the image as request body
+    and stream the converted image back with chunked transfer encoding.
+    `GET /metrics` returns queue depth, counters and latency percentiles as
+    JSON. Jobs wait in a bounded queue served by one dispatcher per worker
+    process, so at most `workers` conversions run at a time; when the queue
+    is full, requests are rejected at once with 503 instead of piling up.
+    """
+
+    def __init__(
+        self,
+        workers: int = None,
+        queue_size: int = 64,
+        max_body_bytes: int = 64 << 20,
+        max_pixels: int = 100_000_000,
+        max_connections: int = 256,
+    ):
+        """
+        :param workers: Worker processes, and the number of concurrent conversions.
+        :param queue_size: Jobs allowed to wait for a worker before requests are rejected.
+        :param max_body_bytes: Largest accepted request body.
+        :param max_pixels: Largest accepted image, in pixels.
+        :param max_connections: Connections served at once; others wait to be accepted.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.max_body_bytes = max_body_bytes
+        self.max_pixels = max_pixels
+        self.max_connections = max_connections
+
+        self.counters = collections.Counter()
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.queue_waits = collections.deque(maxlen=LATENCY_WINDOW)
+        self.in_flight = 0
+        self._server = None
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        """Start listening; returns the bound (host, port)."""
+        self._queue = asyncio.Queue(self.queue_size)
+        self._connections = asyncio.Semaphore(self.max_connections)
+        # Spawned rather than forked: forked workers would inherit the client
+        # sockets open at that time and keep those connections from closing.
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self._dispatchers = [
+            asyncio.create_task(self._dispatch()) for _ in range(self.workers)
+        ]
+        self._server = await asyncio.start_server(self._serve_connection, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+        for task in self._dispatchers:
+            task.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        self._pool.shutdown(cancel_futures=True)
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    def metrics(self) -> dict:
+        """Current queue depth, counters and latency percentiles (in milliseconds)."""
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_size": self.queue_size,
+            "in_flight": self.in_flight,
+            "workers": self.workers,
+            "counters": dict(self.counters),
+            "latency_ms": _percentiles(self.latencies),
+            "queue_wait_ms": _percentiles(self.queue_waits),
+        }
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            convert, body, future, enqueued = await self._queue.get()
+            self.queue_waits.append(time.perf_counter() - enqueued)
+            if future.cancelled():
+                continue
+            self.in_flight += 1
+            try:
+                result = await loop.run_in_executor(
+                    self._pool, convert, body, self.max_pixels
+                )
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            else:
+                if not future.cancelled():
+                    future.set_result(result)
+            finally:
+                self.in_flight -= 1
+
+    async def _serve_connection(self, reader, writer):
+        async with self._connections:
+            try:
+                while await self._serve_request(reader, writer):
+                    pass
+            except (asyncio.IncompleteReadError, ConnectionError):
+                pass
+            finally:
+                writer.close()
+
+    async def _serve_request(self, reader, writer) -> bool:
+        """Handle one request; returns whether the connection stays open."""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as e:
+            if not e.partial:
+                # Closed between requests
+                return False
+            # The end of the head is unknown, so the connection cannot be reused
+            error = HTTPError(400, "Bad Request", "truncated request head")
+            return await self._reject(writer, error, False)
+        except asyncio.LimitOverrunError:
+            error = HTTPError(431, "Request Header Fields Too Large")
+            return await self._reject(writer, error, False)
+        started = time.perf_counter()
+
+        request_line, *header_lines = head.decode("latin-1").split("\r\n")
+        method, path, _ = (request_line.split(" ") + ["", ""])[:3]
+        headers = {}
+        for line in header_lines:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        keep_alive = headers.get("connection", "").lower() != "close"
+        length = headers.get("content-length", "0")
+
+        try:
+            # isdigit alone accepts digits int() rejects, such as "²"
+            if not (length.isascii() and length.isdigit()):
+                # The body cannot be delimited, so the connection cannot be reused
+                keep_alive = False
+                raise HTTPError(400, "Bad Request", "invalid Content-Length")
+            length = int(length)
+            if length > self.max_body_bytes:
+                # The body is not read, so the connection cannot be reused
+                keep_alive = False
+                raise HTTPError(413, "Payload Too Large")
+
+            if method == "POST" and path in ROUTES:
+                request_body = await reader.readexactly(length)
+                body, content_type = await self._convert(path, request_body)
+            else:
+                # Skip an unused body, so the next request starts after it
+                await _discard(reader, length)
+                if method == "GET" and path == "/metrics":
+                    body, content_type = (
+                        json.dumps(self.metrics()).encode(),
+                        "application/json",
+                    )
+                else:
+                    raise HTTPError(404, "Not Found")
+        except HTTPError as e:
+            return await self._reject(writer, e, keep_alive)
+
+        await self._respond(writer, 200, "OK", body, content_type, keep_alive)
+        self.counters["200"] += 1
+        if method == "POST":
+            self.latencies.append(time.perf_counter() - started)
+        return keep_alive
+
+    async def _reject(self, writer, error: HTTPError, keep_alive: bool) -> bool:
+        """Answer with the status of an error; returns whether the connection stays open."""
+        self.counters[str(error.status)] += 1
+        await self._respond(
+            writer,
+            error.status,
+            error.reason,
+            str(error).encode(),
+            "text/plain",
+            keep_alive,
+        )
+        return keep_alive
+
+    async def _convert(self, path: str, request_body: bytes):
+        convert, content_type = ROUTES[path]
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((convert, request_body, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            raise HTTPError(503, "Service Unavailable", "job queue is full")
+
+        try:
+            return await future, content_type
+        except OverflowError as e:
+            raise HTTPError(413, "Payload Too Large", str(e))
+        except Exception as e:
+            raise HTTPError(422, "Unprocessable Entity", f"{type(e).__name__}: {e}")
+
+    async def _respond(self, writer, status, reason, body, content_type, keep_alive):
+        writer.write(
+            (
+                f"HTTP/1.1 {status} {reason}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                "Transfer-Encoding: chunked\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+            ).encode("latin-1")
+        )
+        # Stream the body, letting slow clients apply backpressure
+        view = memoryview(body)
+        for start in range(0, len(view), STREAM_CHUNK_BYTES):
+            chunk = view[start : start + STREAM_CHUNK_BYTES]
+            writer.write(b"%x\r\n" % len(chunk))
+            writer.write(chunk)
+            writer.write(b"\r\n")
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+async def _discard(reader, length: int):
+    """Read and drop `length` bytes of request body, a chunk at a time."""
+    while length:
+        length -= len(await reader.readexactly(min(length, STREAM_CHUNK_BYTES)))
+
+
+def _percentiles(samples) -> dict:
+    if not samples:
+        return {}
+    values = np.asarray(samples) * 1000
+    p50, p90, p99 = np.percentile(values, (50, 90, 99))
+    return {
+        "count": len(values),
+        "p50": float(p50),
+        "p90": float(p90),
+        "p99": float(p99),
+        "max": float(values.max()),
+    }
+
+
+# --- Client ---
+
+
+async def request(reader, writer, method: str, path: str, body: bytes = b""):
+    """
+    Send one request over an open keep-alive connection.
+
+    :return: (status, response body)
+    """
+    writer.write(
+        (
+            f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n"
+        ).encode("latin-1")
+        + body
+    )
+    await writer.drain()
+
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    chunks = []
+    while True:
+        size = int((await reader.readline()).strip(), 16)
+        chunks.append(await reader.readexactly(size + 2))
+        if size == 0:
+            break
+    return status, b"".join(chunk[:-2] for chunk in chunks)
+
+
+async def run_load(
+    host: str,
+    port: int,
+    path: str,
+    payload: bytes,
+    requests: int = 200,
+    concurrency: int = 8,
+) -> dict:
+    """
+    Load generator: `concurrency` keep-alive clients send `requests` conversions in total.
+
+    :return: Throughput and latency summary.
+    """
+    latencies = []
+    statuses = collections.Counter()
+    remaining = iter(range(requests))
+
+    async def client():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            for _ in remaining:
+                start = time.perf_counter()
+                status, _ = await request(reader, writer, "POST", path, payload)
+                latencies.append(time.perf_counter() - start)
+                statuses[status] += 1
+        finally:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "seconds": elapsed,
+        "requests_per_s": requests / elapsed,
+        "MB_per_s": requests * len(payload) / elapsed / 1e6,
+        "statuses": dict(statuses),
+        "latency_ms": _percentiles(latencies),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="QOI conversion service.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="Run the conversion server")
+    serve.add_argument("--host", default=DEFAULT_HOST)
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("-j", "--workers", type=int)
+    serve.add_argument("--queue-size", type=int, default=64)
+    serve.add_argument("--max-body-mb", type=int, default=64)
+    serve.add_argument("--max-megapixels", type=int, default=100)
+
+    load = commands.add_parser("load", help="Measure throughput and tail latency")
+    load.add_argument("file", help="Image sent with every request")
+    load.add_argument("--host", default=DEFAULT_HOST)
+    load.add_argument("--port", type=int, default=DEFAULT_PORT)
+    load.add_argument("--path", choices=list(ROUTES), default="/png-to-qoi")
+    load.add_argument("-n", "--requests", type=int, default=200)
+    load.add_argument("-c", "--concurrency", type=int, default=8)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "load":
+        with open(args.file, "rb") as f:
+            payload = f.read()
+        summary = asyncio.run(
+            run_load(
+                args.host,
+                args.port,
+                args.path,
+                payload,
+                args.requests,
+                args.concurrency,
+            )
+        )
+        print(json.dumps(summary, indent=2))
+        return 0
+
+    async def serve_forever():
+        service = ConversionService(
+            args.workers,
+            args.queue_size,
+            args.max_body_mb << 20,
+            args.max_megapixels * 1_000_000,
+        )
+        host, port = await service.start(args.host, args.port)
+        print(f"Serving on http://{host}:{port} with {service.workers} workers")
+        try:
+            await service.serve_forever()
+        finally:
+            await service.close()
+
+    try:
+        asyncio.run(serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,40 @@
+from .backends import available_backends, decode, encode, register_backend
+from .cache import ConversionCache
+from .checkpoint import QOIRowIndex
+from .compressed import QOICompressed
 from .decoder import QOIDecoder
 from .encoder import QOIEncoder
+from .pack import QOIPackReader, QOIPackWriter
+from .pillow_plugin import QOIImageFile
+from .png import PNGReader, PNGWriter
 from .qoi import QOI
+from .sequence import QOISequenceReader, QOISequenceWriter
+from .stats import QOIStats
+from .stream import QOIStreamDecoder, QOIStreamEncoder
+from .strips import QOIStrips
 from .utils import load_image
 
-__all__ = ["QOIEncoder", "QOIDecoder", "QOI", "load_image"]
+__all__ = [
+    "encode",
+    "decode",
+    "available_backends",
+    "register_backend",
+    "QOIEncoder",
+    "QOIDecoder",
+    "QOIStreamEncoder",
+    "QOIStreamDecoder",
+    "QOIStrips",
+    "QOIRowIndex",
+    "QOIPackWriter",
+    "QOIPackReader",
+    "QOICompressed",
+    "QOISequenceWriter",
+    "QOISequenceReader",
+    "ConversionCache",
+    "QOIStats",
+    "QOIImageFile",
+    "PNGReader",
+    "PNGWriter",
+    "QOI",
+    "load_image",
+]
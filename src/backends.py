@@ -0,0 +1,215 @@
+import os
+
+import numpy as np
+
+from .decoder import QOIDecoder, parse_header
+from .encoder import QOIEncoder, _as_flat_uint8
+
+# Environment variable naming the backend used when no `backend=` is given
+BACKEND_ENV = "QOI_BACKEND"
+
+
+class Backend:
+    """
+    One QOI engine behind the `encode`/`decode` front ends.
+
+    `encode(color_data, description) -> bytes` and
+    `decode(file_data, output_channels) -> dict` follow the calling conventions
+    of `QOIEncoder.encode` and `QOIDecoder.decode`. Backends with a higher
+    `speed` rank are preferred by the automatic selection.
+    """
+
+    __slots__ = ("name", "encode", "decode", "speed")
+
+    def __init__(self, name: str, encode, decode, speed: int):
+        self.name = name
+        self.encode = encode
+        self.decode = decode
+        self.speed = speed
+
+    def __repr__(self):
+        return f"Backend({self.name!r})"
+
+
+# Registered backends, by name
+BACKENDS = {}
+# Result of the self-check for every backend name (True when allowed)
+_verified = {}
+
+
+def register_backend(name: str, encode, decode, speed: int = 0):
+    """
+    Add or replace a backend. It is self-checked before its first use.
+
+    :param name: Backend name, as used by `backend=` and the QOI_BACKEND variable.
+    :param encode: Callable (color_data, description) -> bytes.
+    :param decode: Callable (file_data, output_channels) -> dict.
+    :param speed: Rank in the automatic selection; the highest verified backend wins.
+    """
+    BACKENDS[name] = Backend(name, encode, decode, speed)
+    _verified.pop(name, None)
+
+
+def available_backends() -> list:
+    """Names of the backends that passed the self-check, fastest first."""
+    ranked = sorted(BACKENDS.values(), key=lambda b: -b.speed)
+    return [b.name for b in ranked if _check_backend(b)]
+
+
+def get_backend(name: str = None) -> Backend:
+    """
+    Resolve the backend to use.
+
+    :param name: Backend name, or None for the QOI_BACKEND variable, or else the
+                 fastest backend that passed the self-check.
+    :return: Backend.
+    """
+    if name is None:
+        name = os.environ.get(BACKEND_ENV) or None
+    if name is None:
+        return BACKENDS[available_backends()[0]]
+
+    if name not in BACKENDS:
+        raise ValueError(
+            f"QOI: Unknown backend {name!r}, expected one of {sorted(BACKENDS)}"
+        )
+    backend = BACKENDS[name]
+    if not _check_backend(backend):
+        raise ValueError(f"QOI: The {name!r} backend failed its self-check")
+    return backend
+
+
+def encode(color_data, description: dict, backend: str = None) -> bytes:
+    """
+    Encode a QOI file with the selected backend.
+
+    :param color_data: Bytes-like object, NumPy array or list of ints containing pixel data.
+    :param description: Dictionary containing 'width', 'height', 'channels', 'colorspace'.
+    :param backend: Backend name overriding the automatic selection.
+    :return: bytes object containing the QOI file content.
+    """
+    return get_backend(backend).encode(color_data, description)
+
+
+def decode(file_data, output_channels: int = None, backend: str = None) -> dict:
+    """
+    Decode a QOI file with the selected backend.
+
+    :param file_data: Bytes-like object containing the QOI file.
+    :param output_channels: Number of channels of the output, or None for the file's own.
+    :param backend: Backend name overriding the automatic selection.
+    :return: Dictionary containing width, height, colorspace, channels, and data (bytes).
+    """
+    return get_backend(backend).decode(file_data, output_channels)
+
+
+# --- Self-Check ---
+
+
+def _check_images():
+    """Small images exercising every opcode, with and without alpha."""
+    rng = np.random.default_rng(1)
+    rgb = np.cumsum(rng.integers(-3, 4, (16, 24, 3)), axis=1).astype(np.uint8)
+    rgb[4:6] = rng.integers(0, 256, (2, 24, 3))
+    rgb[8:10] = 7
+    rgb[12] = rgb[2]
+    rgba = np.concatenate([rgb, np.full((16, 24, 1), 255, np.uint8)], axis=2)
+    rgba[10:12, :, 3] = rng.integers(0, 2, (2, 24)) * 255
+    return rgb, rgba
+
+
+def _check_backend(backend: Backend) -> bool:
+    """Run the self-check of a backend once per process and remember the outcome."""
+    if backend.name not in _verified:
+        try:
+            _verified[backend.name] = _self_check(backend)
+        except Exception:
+            _verified[backend.name] = False
+    return _verified[backend.name]
+
+
+def _self_check(backend: Backend) -> bool:
+    """
+    Check that a backend encodes byte-identically to the pure Python reference
+    and decodes the reference streams back to the same pixels.
+    """
+    for image in _check_images():
+        height, width, channels = image.shape
+        for colorspace in (0, 1):
+            description = {
+                "width": width,
+                "height": height,
+                "channels": channels,
+                "colorspace": colorspace,
+            }
+            reference = QOIEncoder.encode(image.tobytes(), description)
+            # Every input type the front end accepts
+            for color_data in (image, image.reshape(-1), image.tobytes()):
+                if bytes(backend.encode(color_data, description)) != reference:
+                    return False
+            decoded = backend.decode(reference, None)
+            if (
+                bytes(decoded["data"]) != image.tobytes()
+                or decoded["colorspace"] != colorspace
+            ):
+                return False
+    return True
+
+
+# --- Built-in Backends ---
+
+register_backend(
+    "python",
+    lambda color_data, description: QOIEncoder.encode(
+        _as_flat_uint8(color_data), description
+    ),
+    lambda file_data, output_channels: QOIDecoder.decode(
+        file_data, output_channels=output_channels
+    ),
+    speed=0,
+)
+
+register_backend(
+    "numpy",
+    QOIEncoder.encode_vectorized,
+    lambda file_data, output_channels: QOIDecoder.decode_vectorized(
+        file_data, output_channels=output_channels
+    ),
+    speed=10,
+)
+
+try:
+    import qoi as _qoi_extension
+except ImportError:
+    _qoi_extension = None
+
+
+def _c_encode(color_data, description: dict) -> bytes:
+    width, height, channels, colorspace = QOIEncoder._check_description(description)
+    flat = _as_flat_uint8(color_data)
+    if flat.size != width * height * channels:
+        raise ValueError("QOI.encode: The length of colorData is incorrect")
+    return _qoi_extension.encode(
+        flat.reshape(height, width, channels),
+        _qoi_extension.QOIColorSpace(colorspace),
+    )
+
+
+def _c_decode(file_data, output_channels: int = None) -> dict:
+    width, height, _, colorspace, output_channels = parse_header(
+        bytes(memoryview(file_data)[:14]), output_channels
+    )
+    pixels = _qoi_extension.decode(
+        np.frombuffer(file_data, dtype=np.uint8), channels=output_channels
+    )
+    return {
+        "width": width,
+        "height": height,
+        "colorspace": colorspace,
+        "channels": output_channels,
+        "data": pixels.tobytes(),
+    }
+
+
+if _qoi_extension is not None:
+    register_backend("c", _c_encode, _c_decode, speed=20)
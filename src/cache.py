@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import shutil
+
+
+class ConversionCache:
+    """
+    On-disk cache of conversion outputs, addressed by the content of their source.
+
+    Entries are keyed by a SHA-256 of the source bytes and of the conversion
+    parameters, so the same image under another name or path is a hit. Hits
+    are hard-linked to the requested output (copied when linking is not
+    possible, e.g. across file systems). Every file lands in the cache or in
+    the output through a temporary file and an atomic rename, so concurrent
+    workers never see partial entries. The modification time of an entry is
+    its last use, and `evict` drops the least recently used entries until
+    the cache fits in `max_bytes`.
+
+    Outputs linked from the cache share their inode with the entry, so they
+    must be replaced rather than modified in place; `convert` always writes
+    to a new file renamed over the output.
+    """
+
+    DEFAULT_MAX_BYTES = 1 << 30
+
+    def __init__(self, directory: str, max_bytes: int = None):
+        """
+        :param directory: Cache directory, created if missing.
+        :param max_bytes: Byte budget enforced by `evict`.
+        """
+        self.directory = str(directory)
+        self.max_bytes = self.DEFAULT_MAX_BYTES if max_bytes is None else max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(source_path: str, params: dict = None) -> str:
+        """
+        Cache key of a conversion.
+
+        :param source_path: Path of the source file, hashed by content.
+        :param params: JSON-serializable conversion parameters (channels, colorspace,
+                       RAW postprocess options...).
+        :return: Hexadecimal key.
+        """
+        with open(source_path, "rb") as f:
+            digest = hashlib.file_digest(f, "sha256")
+        digest.update(json.dumps(params or {}, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def path(self, key: str) -> str:
+        """Location of an entry, fanned out over 256 subdirectories."""
+        return os.path.join(self.directory, key[:2], key)
+
+    def fetch(self, key: str, target: str) -> bool:
+        """
+        Place a cached output at `target`.
+
+        :param key: Cache key.
+        :param target: Output path.
+        :return: True on a hit, False if the entry is missing.
+        """
+        entry = self.path(key)
+        tmp_path = f"{target}.{os.getpid()}.tmp"
+        try:
+            os.link(entry, tmp_path)
+        except FileNotFoundError:
+            return False
+        except OSError:
+            try:
+                shutil.copyfile(entry, tmp_path)
+            except FileNotFoundError:
+                return False
+
+        # Mark as recently used, which also makes the output newer than its source
+        os.utime(tmp_path)
+        os.replace(tmp_path, target)
+        if os.path.exists(tmp_path):
+            # Renaming a link over another link to the same inode does nothing
+            os.remove(tmp_path)
+        return True
+
+    def store(self, key: str, output_path: str):
+        """
+        Add a freshly written output to the cache.
+
+        :param key: Cache key.
+        :param output_path: File to cache (copied, the original is left in place).
+        """
+        entry = self.path(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        tmp_path = f"{entry}.{os.getpid()}.tmp"
+        try:
+            os.link(output_path, tmp_path)
+        except OSError:
+            shutil.copyfile(output_path, tmp_path)
+        os.replace(tmp_path, entry)
+
+    def evict(self) -> int:
+        """
+        Remove least recently used entries until the cache fits in its byte budget.
+
+        :return: Number of bytes freed.
+        """
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+                total += stat.st_size
+
+        freed = 0
+        entries.sort()
+        for _, size, path in entries:
+            if total - freed <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Another worker evicted it first
+                continue
+            freed += size
+        return freed
+
+    def convert(self, source_path: str, target: str, convert, params: dict = None):
+        """
+        Run `convert(source_path, target)` unless the cache already holds its output.
+
+        :param source_path: Source file.
+        :param target: Output path.
+        :param convert: Callable writing the output for a source file, called with
+                        a temporary path next to `target`.
+        :param params: Conversion parameters, part of the cache key.
+        :return: True on a cache hit, False if the conversion ran.
+        """
+        key = self.key(source_path, params)
+        if self.fetch(key, target):
+            return True
+
+        # An earlier hit may have linked the target to another entry: write a
+        # new file and rename it over the target instead of rewriting that inode
+        tmp_path = f"{target}.{os.getpid()}.tmp"
+        try:
+            convert(source_path, tmp_path)
+            self.store(key, tmp_path)
+            os.replace(tmp_path, target)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return False
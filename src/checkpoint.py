@@ -0,0 +1,355 @@
+import struct
+
+import numpy as np
+
+from .decoder import (
+    CHUNK_LENGTHS,
+    DECODE_WINDOW_BYTES,
+    VectorDecoderState,
+    _hash,
+    decode_window,
+    decode_window_chunks,
+    parse_header,
+)
+
+
+class QOIRowIndex:
+    """
+    Checkpoint index for random-access row decoding of a standard QOI file.
+
+    A QOI stream can only be decoded from the start, since every chunk depends
+    on the previous pixel and the 64-entry color index. The row index stores
+    that decoder state every `every_rows` rows, so `decode_rows` only has to
+    decode from the nearest checkpoint instead of from the top of the image.
+    It is kept next to the image as a sidecar file (see `sidecar_path`).
+
+    Sidecar layout (Big Endian):
+
+    - magic "qoix" (4), version (1), size of the QOI file (8)
+    - width (4), height (4), channels (1), colorspace (1)
+    - rows between checkpoints (4), checkpoint count (4)
+    - per checkpoint: offset of the next chunk (8), previous pixel RGBA (4),
+      pixels still pending from a run crossing the checkpoint (1),
+      color index as 64 RGBA entries (256)
+    """
+
+    MAGIC = b"qoix"
+    VERSION = 1
+    HEADER = struct.Struct(">4sBQIIBBII")
+    CHECKPOINT = struct.Struct(">Q4sB256s")
+    DEFAULT_EVERY_ROWS = 64
+
+    def __init__(
+        self,
+        description: dict,
+        every_rows: int,
+        file_size: int,
+        offsets: np.ndarray,
+        prev: np.ndarray,
+        pending: np.ndarray,
+        index: np.ndarray,
+    ):
+        """
+        :param description: Dictionary with width, height, channels and colorspace of the image.
+        :param every_rows: Number of rows between two checkpoints.
+        :param file_size: Size in bytes of the indexed QOI file.
+        :param offsets: (n,) offsets of the first chunk still to read at each checkpoint.
+        :param prev: (n, 4) uint8 previous pixel at each checkpoint.
+        :param pending: (n,) pixels of a run chunk already read but not yet output.
+        :param index: (n, 64) little-endian uint32 color index at each checkpoint.
+        """
+        self.description = description
+        self.every_rows = every_rows
+        self.file_size = file_size
+        self.offsets = offsets
+        self.prev = prev
+        self.pending = pending
+        self.index = index
+
+    @staticmethod
+    def sidecar_path(qoi_path: str) -> str:
+        """Path of the sidecar index belonging to a QOI file."""
+        return str(qoi_path) + ".idx"
+
+    @classmethod
+    def build(cls, file_data, every_rows: int = None) -> "QOIRowIndex":
+        """
+        Build the index in a single decoding pass, without materializing the image.
+
+        :param file_data: Bytes-like object (bytes, bytearray, mmap...) containing the QOI file.
+        :param every_rows: Number of rows between two checkpoints.
+        :return: QOIRowIndex.
+        """
+        if every_rows is None:
+            every_rows = cls.DEFAULT_EVERY_ROWS
+        if every_rows < 1:
+            raise ValueError("QOI.decode: The checkpoint interval is invalid")
+
+        data = np.frombuffer(file_data, dtype=np.uint8)
+        width, height, channels, colorspace, _ = parse_header(data[:14].tobytes())
+        total_pixels = width * height
+
+        # Pixel position of every checkpoint
+        targets = np.arange(0, height, every_rows, dtype=np.int64) * width
+        count = len(targets)
+        offsets = np.zeros(count, dtype=np.int64)
+        prev = np.zeros((count, 4), dtype=np.uint8)
+        pending = np.zeros(count, dtype=np.uint8)
+        index = np.zeros((count, 64), dtype="<u4")
+
+        state = VectorDecoderState()
+        read_pos = 14
+        pixels_processed = 0
+        done = 0
+
+        # Checkpoints at the very start (and all of them for an empty image)
+        while done < count and targets[done] <= pixels_processed:
+            offsets[done] = read_pos
+            prev[done] = state.prev
+            index[done] = state.index
+            done += 1
+
+        while pixels_processed < total_pixels:
+            entry_index = state.index.copy()
+            read_pos, chunks = decode_window_chunks(
+                data,
+                read_pos,
+                min(read_pos + DECODE_WINDOW_BYTES, len(data)),
+                total_pixels - pixels_processed,
+                state,
+            )
+            if chunks is None:
+                raise ValueError("QOI.decode: Incomplete image")
+
+            chunk_offsets, tags, counts, values = chunks
+            ends = pixels_processed + np.cumsum(counts)
+
+            # Checkpoints strictly inside this window; one falling on its end
+            # is the start of the next window.
+            stop = done + int(np.searchsorted(targets[done:], ends[-1]))
+            if stop > done:
+                points = targets[done:stop]
+                # Chunk that produced the pixel just before each checkpoint
+                last = np.searchsorted(ends, points)
+                offsets[done:stop] = chunk_offsets[last] + CHUNK_LENGTHS[tags[last]]
+                prev[done:stop] = values[last]
+                pending[done:stop] = ends[last] - points
+
+                # Index entry h holds the last chunk value hashing to h, if any
+                packed = values.view("<u4").ravel()
+                hashes = _hash(values)
+                for h in range(64):
+                    hits = np.flatnonzero(hashes == h)
+                    if len(hits) == 0:
+                        index[done:stop, h] = entry_index[h]
+                        continue
+                    latest = np.searchsorted(hits, last, side="right") - 1
+                    index[done:stop, h] = np.where(
+                        latest >= 0, packed[hits[latest]], entry_index[h]
+                    )
+                done = stop
+
+            pixels_processed = int(ends[-1])
+
+            # Checkpoints on the window boundary
+            while done < count and targets[done] == pixels_processed:
+                offsets[done] = read_pos
+                prev[done] = state.prev
+                index[done] = state.index
+                done += 1
+
+        description = {
+            "width": width,
+            "height": height,
+            "channels": channels,
+            "colorspace": colorspace,
+        }
+        return cls(description, every_rows, len(data), offsets, prev, pending, index)
+
+    @classmethod
+    def build_file(cls, path: str, every_rows: int = None) -> "QOIRowIndex":
+        """
+        Build the index of a QOI file and write it to its sidecar path.
+
+        :param path: Path of the QOI file.
+        :param every_rows: Number of rows between two checkpoints.
+        :return: QOIRowIndex.
+        """
+        with open(path, "rb") as f:
+            row_index = cls.build(f.read(), every_rows)
+        row_index.save(cls.sidecar_path(path))
+        return row_index
+
+    def to_bytes(self) -> bytes:
+        """Serialize the index in the sidecar layout."""
+        d = self.description
+        parts = [
+            self.HEADER.pack(
+                self.MAGIC,
+                self.VERSION,
+                self.file_size,
+                d["width"],
+                d["height"],
+                d["channels"],
+                d["colorspace"],
+                self.every_rows,
+                len(self.offsets),
+            )
+        ]
+        for i in range(len(self.offsets)):
+            parts.append(
+                self.CHECKPOINT.pack(
+                    int(self.offsets[i]),
+                    self.prev[i].tobytes(),
+                    int(self.pending[i]),
+                    self.index[i].tobytes(),
+                )
+            )
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, index_data) -> "QOIRowIndex":
+        """
+        Parse an index serialized by `to_bytes`.
+
+        :param index_data: Bytes-like object containing the sidecar.
+        :return: QOIRowIndex.
+        """
+        index_data = memoryview(index_data)
+        if len(index_data) < cls.HEADER.size:
+            raise ValueError("QOI.decode: Row index too short for header")
+
+        (
+            magic,
+            version,
+            file_size,
+            width,
+            height,
+            channels,
+            colorspace,
+            every_rows,
+            count,
+        ) = cls.HEADER.unpack(index_data[: cls.HEADER.size])
+        if magic != cls.MAGIC:
+            raise ValueError("QOI.decode: The signature of the row index is invalid")
+        if version != cls.VERSION:
+            raise ValueError("QOI.decode: Unsupported row index version")
+        if len(index_data) != cls.HEADER.size + count * cls.CHECKPOINT.size:
+            raise ValueError("QOI.decode: The row index is truncated")
+
+        offsets = np.zeros(count, dtype=np.int64)
+        prev = np.zeros((count, 4), dtype=np.uint8)
+        pending = np.zeros(count, dtype=np.uint8)
+        index = np.zeros((count, 64), dtype="<u4")
+        for i, pos in enumerate(
+            range(cls.HEADER.size, len(index_data), cls.CHECKPOINT.size)
+        ):
+            offset, px, run, entries = cls.CHECKPOINT.unpack(
+                index_data[pos : pos + cls.CHECKPOINT.size]
+            )
+            offsets[i] = offset
+            prev[i] = np.frombuffer(px, dtype=np.uint8)
+            pending[i] = run
+            index[i] = np.frombuffer(entries, dtype="<u4")
+
+        description = {
+            "width": width,
+            "height": height,
+            "channels": channels,
+            "colorspace": colorspace,
+        }
+        return cls(description, every_rows, file_size, offsets, prev, pending, index)
+
+    def save(self, path: str):
+        """Write the index to a sidecar file."""
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> "QOIRowIndex":
+        """Read an index from a sidecar file."""
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+    def decode_rows(
+        self, file_data, start: int, stop: int, output_channels: int = None
+    ) -> dict:
+        """
+        Decode rows [start, stop) of the indexed image.
+
+        :param file_data: Bytes-like object (bytes, bytearray, mmap...) containing the QOI file.
+        :param start: First row to decode.
+        :param stop: Row after the last one to decode.
+        :param output_channels: Number of channels of the output, or None for the file's own.
+        :return: Dictionary with width, height (stop - start), colorspace, channels and data.
+        """
+        data = np.frombuffer(file_data, dtype=np.uint8)
+        width, height, channels, colorspace, output_channels = parse_header(
+            data[:14].tobytes(), output_channels
+        )
+        d = self.description
+        if len(data) != self.file_size or (width, height, channels, colorspace) != (
+            d["width"],
+            d["height"],
+            d["channels"],
+            d["colorspace"],
+        ):
+            raise ValueError("QOI.decode: The row index does not match the file")
+        if not (0 <= start <= stop <= height):
+            raise ValueError("QOI.decode: The requested rows are out of range")
+
+        result = np.empty(((stop - start) * width, output_channels), dtype=np.uint8)
+        if start == stop:
+            return {
+                "width": width,
+                "height": 0,
+                "colorspace": colorspace,
+                "channels": output_channels,
+                "data": result.tobytes(),
+            }
+
+        # --- Resume from the nearest checkpoint ---
+        checkpoint = start // self.every_rows
+        state = VectorDecoderState()
+        state.prev = self.prev[checkpoint].copy()
+        state.index = self.index[checkpoint].copy()
+        read_pos = int(self.offsets[checkpoint])
+
+        skip = (start - checkpoint * self.every_rows) * width
+        wanted = (stop - checkpoint * self.every_rows) * width
+        pixels_processed = 0
+
+        def emit(pixels):
+            # Drop the pixels before `start`, then copy the rest
+            lo = max(skip - pixels_processed, 0)
+            if lo < len(pixels):
+                at = pixels_processed + lo - skip
+                result[at : at + len(pixels) - lo] = pixels[lo:, :output_channels]
+
+        # The remainder of a run crossing the checkpoint
+        run = min(int(self.pending[checkpoint]), wanted)
+        if run:
+            emit(np.broadcast_to(state.prev, (run, 4)))
+            pixels_processed += run
+
+        while pixels_processed < wanted:
+            read_pos, pixels = decode_window(
+                data,
+                read_pos,
+                min(read_pos + DECODE_WINDOW_BYTES, len(data)),
+                wanted - pixels_processed,
+                state,
+            )
+            if pixels is None:
+                raise ValueError("QOI.decode: Incomplete image")
+
+            emit(pixels)
+            pixels_processed += len(pixels)
+
+        return {
+            "width": width,
+            "height": stop - start,
+            "colorspace": colorspace,
+            "channels": output_channels,
+            "data": result.tobytes(),
+        }
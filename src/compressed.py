@@ -0,0 +1,248 @@
+import bz2
+import io
+import lzma
+import struct
+import zlib
+
+import numpy as np
+
+from .decoder import parse_header
+from .encoder import QOIEncoder, _as_flat_uint8, _iter_vectorized
+from .stream import QOIStreamDecoder
+
+# Second-stage compressors: method -> (id stored in the header, default level,
+# compressor factory, decompressor factory)
+METHODS = {
+    "zlib": (1, 6, zlib.compressobj, zlib.decompressobj),
+    "bz2": (2, 9, bz2.BZ2Compressor, bz2.BZ2Decompressor),
+    "lzma": (
+        3,
+        6,
+        lambda level: lzma.LZMACompressor(preset=level),
+        lzma.LZMADecompressor,
+    ),
+}
+METHOD_NAMES = {method_id: name for name, (method_id, *_) in METHODS.items()}
+# Levels accepted by each method
+LEVELS = {"zlib": range(10), "bz2": range(1, 10), "lzma": range(10)}
+
+
+class QOICompressed:
+    """
+    QOI file wrapped in a stdlib second-stage compressor (zlib, bz2 or lzma).
+
+    QOI leaves redundancy that a general-purpose compressor removes (repeated
+    rows, recurring chunk sequences), so when storage or network bandwidth
+    matter more than CPU time the QOI stream is compressed once more.
+    Layout (Big Endian):
+
+    - magic "qoiz" (4), method id (1), level (1), length of the QOI file (8)
+    - the QOI file, compressed with the method
+    """
+
+    MAGIC = b"qoiz"
+    HEADER = struct.Struct(">4sBBQ")
+
+    @staticmethod
+    def encode(
+        color_data, description: dict, method: str = "zlib", level: int = None
+    ) -> bytes:
+        """
+        Encode an image, streaming the QOI output through the compressor block by block.
+
+        :param color_data: Bytes-like object, NumPy array or list of ints containing pixel data.
+        :param description: Dictionary containing 'width', 'height', 'channels', 'colorspace'.
+        :param method: "zlib", "bz2" or "lzma".
+        :param level: Compression level of the method, or None for its default.
+        :return: bytes object containing the compressed file.
+        """
+        level = QOICompressed._check_method(method, level)
+        width, height, channels, colorspace = QOIEncoder._check_description(description)
+
+        flat = _as_flat_uint8(color_data)
+        if flat.size != width * height * channels:
+            raise ValueError("QOI.encode: The length of colorData is incorrect")
+
+        return QOICompressed._compress(
+            _iter_vectorized(flat, width, height, channels, colorspace), method, level
+        )
+
+    @staticmethod
+    def compress(file_data, method: str = "zlib", level: int = None) -> bytes:
+        """
+        Wrap an encoded QOI file.
+
+        :param file_data: Bytes-like object containing the QOI file.
+        :param method: "zlib", "bz2" or "lzma".
+        :param level: Compression level of the method, or None for its default.
+        :return: bytes object containing the compressed file.
+        """
+        level = QOICompressed._check_method(method, level)
+        view = memoryview(file_data).cast("B")
+        parse_header(bytes(view[:14]))
+        return QOICompressed._compress([view], method, level)
+
+    @staticmethod
+    def decompress(file_data) -> bytes:
+        """
+        Unwrap the QOI file of a compressed file.
+
+        :param file_data: Bytes-like object containing the compressed file.
+        :return: bytes object containing the QOI file.
+        """
+        view = memoryview(file_data).cast("B")
+        method, _, length = QOICompressed.read_header(view)
+        decompressor = METHODS[method][3]()
+        qoi_data = decompressor.decompress(view[QOICompressed.HEADER.size :])
+        if not decompressor.eof:
+            raise ValueError("QOI.decode: The compressed stream is truncated")
+        if decompressor.unused_data:
+            raise ValueError("QOI.decode: Unexpected data after the compressed stream")
+        if len(qoi_data) != length:
+            raise ValueError(
+                "QOI.decode: The QOI file length does not match the header"
+            )
+        return qoi_data
+
+    @staticmethod
+    def decode(file, output_channels: int = None, block_size: int = None) -> dict:
+        """
+        Decode a compressed file, decompressing it block by block into `QOIStreamDecoder`.
+
+        Neither the compressed nor the QOI stream is held in memory as a whole,
+        only the decoded pixels.
+
+        :param file: Bytes-like or binary file object containing the compressed file.
+        :param output_channels: Number of channels to include in the decoded array (3 or 4).
+                                If None, uses the channels defined in the file header.
+        :param block_size: Number of bytes read and decompressed at a time.
+        :return: Dictionary containing width, height, colorspace, channels, and data (bytes).
+        """
+        if not hasattr(file, "read"):
+            file = io.BytesIO(file)
+        method, _, length = QOICompressed.read_header(
+            file.read(QOICompressed.HEADER.size)
+        )
+
+        reader = _DecompressingReader(file, METHODS[method][3](), block_size)
+        stream = QOIStreamDecoder(reader, output_channels, block_size)
+        row_bytes = stream.width * stream.output_channels
+        result = bytearray(stream.height * row_bytes)
+        target = np.frombuffer(result, dtype=np.uint8)
+        write_pos = 0
+        batch_rows = max(1, QOIStreamDecoder.EXPAND_PIXELS // max(stream.width, 1))
+        for rows in stream.iter_rows(batch_rows):
+            target[write_pos : write_pos + rows.size] = rows.reshape(-1)
+            write_pos += rows.size
+
+        # The end marker (and anything after the pixels) is still unread
+        if reader.read_to_end() != length:
+            raise ValueError(
+                "QOI.decode: The QOI file length does not match the header"
+            )
+
+        return {
+            "width": stream.width,
+            "height": stream.height,
+            "colorspace": stream.colorspace,
+            "channels": stream.output_channels,
+            "data": bytes(result),
+        }
+
+    @staticmethod
+    def read_header(file_data) -> tuple:
+        """
+        Parse the header of a compressed file.
+
+        :param file_data: Bytes-like object starting with the header.
+        :return: (method, level, length of the QOI file) tuple.
+        """
+        if len(file_data) < QOICompressed.HEADER.size:
+            raise ValueError("QOI.decode: File too short for header")
+        magic, method_id, level, length = QOICompressed.HEADER.unpack(
+            file_data[: QOICompressed.HEADER.size]
+        )
+        if magic != QOICompressed.MAGIC:
+            raise ValueError(
+                "QOI.decode: The signature of the compressed file is invalid"
+            )
+        if method_id not in METHOD_NAMES:
+            raise ValueError("QOI.decode: Unknown compression method")
+        return METHOD_NAMES[method_id], level, length
+
+    @staticmethod
+    def _check_method(method: str, level: int) -> int:
+        """Validate the method and level before any work; returns the level to use."""
+        if method not in METHODS:
+            raise ValueError(f"QOI.encode: Unknown compression method {method}")
+        if level is None:
+            return METHODS[method][1]
+        if level not in LEVELS[method]:
+            raise ValueError(
+                f"QOI.encode: Invalid {method} level {level}, must be in"
+                f" {LEVELS[method].start}-{LEVELS[method].stop - 1}"
+            )
+        return level
+
+    @staticmethod
+    def _compress(pieces, method: str, level: int) -> bytes:
+        method_id, _, make_compressor, _ = METHODS[method]
+        compressor = make_compressor(level)
+        result = bytearray(QOICompressed.HEADER.size)
+        length = 0
+        for piece in pieces:
+            result += compressor.compress(piece)
+            length += len(piece)
+        result += compressor.flush()
+
+        result[: QOICompressed.HEADER.size] = QOICompressed.HEADER.pack(
+            QOICompressed.MAGIC, method_id, level, length
+        )
+        return bytes(result)
+
+
+class _DecompressingReader:
+    """
+    Read-only file object decompressing another one on the fly, in bounded
+    steps so that highly compressed data never expands at once.
+    """
+
+    BLOCK_SIZE = 1 << 16
+
+    def __init__(self, fileobj, decompressor, block_size: int = None):
+        self._file = fileobj
+        self._decompressor = decompressor
+        self._block_size = block_size or self.BLOCK_SIZE
+        # Number of decompressed bytes returned so far
+        self.length = 0
+
+    def read(self, size: int = -1) -> bytes:
+        result = bytearray()
+        while (size < 0 or len(result) < size) and not self._decompressor.eof:
+            want = self._block_size if size < 0 else size - len(result)
+            # zlib hands back the input it did not consume, bz2 and lzma keep it
+            data = getattr(self._decompressor, "unconsumed_tail", b"")
+            at_eof = False
+            if not data and getattr(self._decompressor, "needs_input", True):
+                data = self._file.read(self._block_size)
+                at_eof = not data
+
+            inflated = self._decompressor.decompress(data, want)
+            if at_eof and not inflated and not self._decompressor.eof:
+                raise ValueError("QOI.decode: The compressed stream is truncated")
+            result += inflated
+        self.length += len(result)
+        return bytes(result)
+
+    def read_to_end(self) -> int:
+        """
+        Decompress and drop the rest of the stream, then check that nothing
+        follows it.
+
+        :return: Total number of decompressed bytes.
+        """
+        while self.read(self._block_size):
+            pass
+        if getattr(self._decompressor, "unused_data", b"") or self._file.read(1):
+            raise ValueError("QOI.decode: Unexpected data after the compressed stream")
+        return self.length
@@ -1,4 +1,28 @@
+import mmap
+import os
 import struct
+import time
+
+import numpy as np
+
+from .encoder import QOI_END_MARKER
+from .kernels import decode_kernel
+
+# Bytes of chunk data scanned and decoded per NumPy pass in
+# `QOIDecoder.decode_vectorized`. Bounds the size of the temporary arrays.
+DECODE_WINDOW_BYTES = 1 << 20
+
+# Size of the blocks whose chunk chains are followed in lockstep by `scan_chunks`,
+# and the number of blocks it aims for: smaller ranges use smaller blocks, so
+# the number of lockstep steps follows the range size
+SCAN_BLOCK_BYTES = 4096
+SCAN_MIN_BLOCKS = 256
+
+# Length in bytes of the chunk introduced by each possible tag byte
+CHUNK_LENGTHS = np.ones(256, dtype=np.int64)
+CHUNK_LENGTHS[0x80:0xC0] = 2  # QOI_OP_LUMA
+CHUNK_LENGTHS[0xFE] = 4  # QOI_OP_RGB
+CHUNK_LENGTHS[0xFF] = 5  # QOI_OP_RGBA
 
 
 class QOIDecoder:
@@ -12,6 +36,7 @@ class QOIDecoder:
         byte_offset: int = 0,
         byte_length: int = None,
         output_channels: int = None,
+        stats=None,
     ) -> dict:
         """
         Decode a QOI file given as a bytes/bytearray object.
@@ -21,16 +46,19 @@ class QOIDecoder:
         :param byte_length: Length of the QOI file in bytes.
         :param output_channels: Number of channels to include in the decoded array (3 or 4).
                                 If None, uses the channels defined in the file header.
+        :param stats: Optional QOIStats collecting opcode statistics and phase timings.
         :return: Dictionary containing width, height, colorspace, channels, and data (bytes).
         """
+        if stats is not None:
+            started = time.perf_counter()
 
         # --- Handle Slicing ---
         if byte_length is None:
             byte_length = len(file_data) - byte_offset
 
-        # Create a view of the specific slice to avoid copying large data if possible
-        # or simply slice if using standard bytes
-        data = file_data[byte_offset : byte_offset + byte_length]
+        # Create a view of the specific slice to avoid copying large data
+        # (works for bytes, bytearray, memoryview and mmap alike)
+        data = memoryview(file_data)[byte_offset : byte_offset + byte_length]
 
         # --- Header Parsing ---
         # QOI Header is 14 bytes:
@@ -71,107 +99,76 @@ class QOIDecoder:
         pixel_length = width * height * output_channels
         result = bytearray(pixel_length)
 
-        # Index array: 64 pixels, initialized to (0, 0, 0, 0)
-        # We store tuples for easy unpacking
-        index = [(0, 0, 0, 0)] * 64
-
-        # Initial pixel state (R, G, B, A)
-        r, g, b, a = 0, 0, 0, 255
-
         read_pos = 14
-        write_pos = 0
-        run = 0
         total_pixels = width * height
-        pixels_processed = 0
 
-        # We subtract 8 to safely check for the end marker (though the loop condition below handles it via count)
-        chunks_length = len(data) - 8
+        if stats is not None:
+            stats.add_time("setup", time.perf_counter() - started)
+            started = time.perf_counter()
 
         # --- Decoding Loop ---
-        # Iterate until we have processed all pixels
-        while pixels_processed < total_pixels:
-
-            # 1. Handle Run-Length Decoding
-            if run > 0:
-                run -= 1
-                # We skip reading a byte and just output the current pixel again
-
-            # 2. Read Next Op-Code (if valid)
-            elif read_pos < len(data):
-                b1 = data[read_pos]
-                read_pos += 1
-
-                # QOI_OP_RGB (0xFE/0b11111110)
-                if b1 == 0xFE:
-                    r = data[read_pos]
-                    g = data[read_pos + 1]
-                    b = data[read_pos + 2]
-                    read_pos += 3
-
-                # QOI_OP_RGBA (0xFF/0b11111111)
-                elif b1 == 0xFF:
-                    r = data[read_pos]
-                    g = data[read_pos + 1]
-                    b = data[read_pos + 2]
-                    a = data[read_pos + 3]
-                    read_pos += 4
-
-                # QOI_OP_INDEX (00xxxxxx)
-                elif (b1 & 0xC0) == 0x00:
-                    r, g, b, a = index[b1]
-
-                # QOI_OP_DIFF (01xxxxxx)
-                elif (b1 & 0xC0) == 0x40:
-                    # Extract 2-bit differences and subtract bias of 2
-                    # Use % 256 to wrap the result to 8-bit unsigned
-                    dr = ((b1 >> 4) & 0x03) - 2
-                    dg = ((b1 >> 2) & 0x03) - 2
-                    db = (b1 & 0x03) - 2
-
-                    r = (r + dr) % 256
-                    g = (g + dg) % 256
-                    b = (b + db) % 256
-
-                # QOI_OP_LUMA (10xxxxxx)
-                elif (b1 & 0xC0) == 0x80:
-                    b2 = data[read_pos]
-                    read_pos += 1
-
-                    dg = (b1 & 0x3F) - 32
-                    dr_dg = ((b2 >> 4) & 0x0F) - 8
-                    db_dg = (b2 & 0x0F) - 8
-
-                    r = (r + dg + dr_dg) % 256
-                    g = (g + dg) % 256
-                    b = (b + dg + db_dg) % 256
-
-                # QOI_OP_RUN (11xxxxxx)
-                elif (b1 & 0xC0) == 0xC0:
-                    run = b1 & 0x3F
-
-                # 3. Update Index (Only happens if we just read a new tag)
-                # The index formula: (r*3 + g*5 + b*7 + a*11) % 64
-                index_pos = (r * 3 + g * 5 + b * 7 + a * 11) % 64
-                index[index_pos] = (r, g, b, a)
-
-            # 4. Write Pixel to Result
-            if output_channels == 4:
-                result[write_pos] = r
-                result[write_pos + 1] = g
-                result[write_pos + 2] = b
-                result[write_pos + 3] = a
-                write_pos += 4
-            else:
-                result[write_pos] = r
-                result[write_pos + 1] = g
-                result[write_pos + 2] = b
-                write_pos += 3
-
-            pixels_processed += 1
+        # Generated for the output channel count, without per-pixel channel checks
+        pixels_processed = decode_kernel(output_channels)(
+            data, read_pos, total_pixels, width, result
+        )
 
         if pixels_processed < total_pixels:
             raise ValueError("QOI.decode: Incomplete image")
 
+        if stats is not None:
+            stats.add_time("pixels", time.perf_counter() - started)
+            stats.record(data)
+
+        return {
+            "width": width,
+            "height": height,
+            "colorspace": colorspace,
+            "channels": output_channels,
+            "data": bytes(result),
+        }
+
+    @staticmethod
+    def decode_vectorized(
+        file_data: bytes,
+        byte_offset: int = 0,
+        byte_length: int = None,
+        output_channels: int = None,
+        stats=None,
+    ) -> dict:
+        """
+        Decode a QOI file in two vectorized passes per window of chunk data.
+
+        The first pass scans the tag bytes to find chunk boundaries and the
+        number of pixels each chunk produces. The second rebuilds the channels
+        with modular prefix sums over the DIFF/LUMA deltas and fills runs by
+        broadcasting. QOI_OP_INDEX lookups are resolved by matching every index
+        chunk to the last chunk that wrote its slot and collapsing the chains
+        between index chunks by pointer jumping; windows where an index chunk
+        changes the alpha channel fall back to a sequential pass.
+
+        Parameters and return value are the same as `QOIDecoder.decode`.
+        """
+        if stats is not None:
+            started = time.perf_counter()
+
+        width, height, _, colorspace, output_channels = parse_header(
+            bytes(memoryview(file_data)[byte_offset : byte_offset + 14]),
+            output_channels,
+        )
+        result = bytearray(width * height * output_channels)
+
+        if stats is not None:
+            stats.add_time("setup", time.perf_counter() - started)
+            started = time.perf_counter()
+
+        QOIDecoder.decode_into(
+            file_data, result, byte_offset, byte_length, output_channels
+        )
+
+        if stats is not None:
+            stats.add_time("pixels", time.perf_counter() - started)
+            stats.record(file_data, byte_offset, byte_length)
+
         return {
             "width": width,
             "height": height,
@@ -180,6 +177,546 @@ class QOIDecoder:
             "data": bytes(result),
         }
 
+    @staticmethod
+    def decode_into(
+        file_data,
+        out,
+        byte_offset: int = 0,
+        byte_length: int = None,
+        output_channels: int = None,
+    ) -> dict:
+        """
+        Decode a QOI file straight into a caller-supplied buffer.
+
+        The input is read through a view, so `mmap` and `memoryview` objects are
+        decoded without copying them, and the pixels are written directly into
+        `out` with the same vectorized passes as `decode_vectorized`.
+
+        :param file_data: Bytes-like object (bytes, bytearray, memoryview, mmap) containing the QOI file.
+        :param out: Writable buffer (bytearray, NumPy array, shared memory, ...) of at least
+                    width * height * output_channels bytes.
+        :param byte_offset: Offset to the start of the QOI file in file_data.
+        :param byte_length: Length of the QOI file in bytes.
+        :param output_channels: Number of channels to include in the decoded array (3 or 4).
+                                If None, uses the channels defined in the file header.
+        :return: Dictionary containing width, height, colorspace, channels, and data (`out`).
+        """
+        if byte_length is None:
+            byte_length = len(file_data) - byte_offset
+
+        data = np.frombuffer(
+            file_data, dtype=np.uint8, count=byte_length, offset=byte_offset
+        )
+
+        width, height, channels, colorspace, output_channels = parse_header(
+            data[:14].tobytes(), output_channels
+        )
+
+        total_pixels = width * height
+        target = np.frombuffer(memoryview(out).cast("B"), dtype=np.uint8)
+        if target.size < total_pixels * output_channels:
+            raise ValueError("QOI.decode: The output buffer is too small")
+        if not target.flags.writeable:
+            raise ValueError("QOI.decode: The output buffer is not writable")
+        result = target[: total_pixels * output_channels].reshape(-1, output_channels)
+
+        # --- Decoding ---
+        state = VectorDecoderState()
+        read_pos = 14
+        pixels_processed = 0
+
+        while pixels_processed < total_pixels:
+            read_pos, pixels = decode_window(
+                data,
+                read_pos,
+                min(read_pos + DECODE_WINDOW_BYTES, len(data)),
+                total_pixels - pixels_processed,
+                state,
+            )
+            if pixels is None:
+                raise ValueError("QOI.decode: Incomplete image")
+
+            result[pixels_processed : pixels_processed + len(pixels)] = pixels[
+                :, :output_channels
+            ]
+            pixels_processed += len(pixels)
+
+        return {
+            "width": width,
+            "height": height,
+            "colorspace": colorspace,
+            "channels": output_channels,
+            "data": out,
+        }
+
+    @staticmethod
+    def decode_file(path: str, out=None, output_channels: int = None) -> dict:
+        """
+        Decode a .qoi file through a read-only memory map.
+
+        :param path: Path of the .qoi file.
+        :param out: Optional writable buffer receiving the pixels (see `decode_into`).
+                    If None, a bytearray of the right size is allocated.
+        :param output_channels: Number of channels to include in the decoded array (3 or 4).
+                                If None, uses the channels defined in the file header.
+        :return: Dictionary containing width, height, colorspace, channels, and data.
+        """
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < 14:
+                raise ValueError("QOI.decode: File too short for header")
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if out is None:
+            width, height, _, _, channels = parse_header(mapped[:14], output_channels)
+            out = bytearray(width * height * channels)
+
+        decoded = QOIDecoder.decode_into(mapped, out, output_channels=output_channels)
+        # Only close on success: on error the traceback may still reference views
+        mapped.close()
+        return decoded
+
+    @staticmethod
+    def probe(file) -> dict:
+        """
+        Read the description of a QOI file from its 14-byte header only.
+
+        :param file: Path, binary file object (read from its current position)
+                     or bytes-like object containing the QOI file.
+        :return: Dictionary containing width, height, channels and colorspace.
+        """
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, "rb") as f:
+                header = f.read(14)
+        elif hasattr(file, "read"):
+            header = file.read(14)
+        else:
+            header = bytes(memoryview(file).cast("B")[:14])
+
+        width, height, channels, colorspace, _ = parse_header(header)
+        return {
+            "width": width,
+            "height": height,
+            "channels": channels,
+            "colorspace": colorspace,
+        }
+
+    @staticmethod
+    def validate(file_data, byte_offset: int = 0, byte_length: int = None) -> dict:
+        """
+        Check the structure of a QOI file without decoding any pixel.
+
+        The chunk stream is walked window by window with `scan_chunks`, counting
+        the pixels every chunk produces. The file is valid when its chunks end
+        exactly at the end marker and produce exactly width * height pixels.
+
+        :param file_data: Path (read through a memory map) or bytes-like object
+                          containing the QOI file.
+        :param byte_offset: Offset to the start of the QOI file in file_data.
+        :param byte_length: Length of the QOI file in bytes.
+        :return: Dictionary containing width, height, channels, colorspace and
+                 the number of chunks. Raises ValueError on invalid files.
+        """
+        if isinstance(file_data, (str, os.PathLike)):
+            with open(file_data, "rb") as f:
+                if os.fstat(f.fileno()).st_size < 14:
+                    raise ValueError("QOI.decode: File too short for header")
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            described = QOIDecoder.validate(mapped, byte_offset, byte_length)
+            mapped.close()
+            return described
+
+        if byte_length is None:
+            byte_length = len(file_data) - byte_offset
+        data = np.frombuffer(
+            file_data, dtype=np.uint8, count=byte_length, offset=byte_offset
+        )
+        width, height, channels, colorspace, _ = parse_header(data[:14].tobytes())
+
+        stop = len(data) - len(QOI_END_MARKER)
+        if stop < 14 or data[stop:].tobytes() != QOI_END_MARKER:
+            raise ValueError("QOI.decode: The end marker is missing")
+
+        # --- Chunk Walk ---
+        total_pixels = width * height
+        pixels = 0
+        chunks = 0
+        read_pos = 14
+        while read_pos < stop:
+            offsets = scan_chunks(
+                data, read_pos, min(read_pos + DECODE_WINDOW_BYTES, stop)
+            )
+            if len(offsets) == 0:
+                raise ValueError("QOI.decode: Truncated chunk before the end marker")
+
+            tags = data[offsets]
+            runs = tags[(tags >= 0xC0) & (tags < 0xFE)]
+            pixels += len(offsets) + int(np.sum(runs & 0x3F, dtype=np.int64))
+            chunks += len(offsets)
+            if pixels > total_pixels:
+                raise ValueError("QOI.decode: The chunks exceed the image size")
+            read_pos = int(offsets[-1] + CHUNK_LENGTHS[tags[-1]])
+
+        if pixels < total_pixels:
+            raise ValueError("QOI.decode: Incomplete image")
+
+        return {
+            "width": width,
+            "height": height,
+            "channels": channels,
+            "colorspace": colorspace,
+            "chunks": chunks,
+        }
+
+
+def parse_header(header: bytes, output_channels: int = None) -> tuple:
+    """
+    Parse and validate the 14-byte QOI header.
+
+    :param header: The first bytes of the QOI file.
+    :param output_channels: Requested number of output channels, or None for the file's own.
+    :return: (width, height, channels, colorspace, output_channels) tuple.
+    """
+    if len(header) < 14:
+        raise ValueError("QOI.decode: File too short for header")
+
+    magic, width, height, channels, colorspace = struct.unpack(">4sIIBB", header[:14])
+
+    if magic != b"qoif":
+        raise ValueError("QOI.decode: The signature of the QOI file is invalid")
+
+    if output_channels is None:
+        output_channels = channels
+
+    # --- Validation ---
+    if not (3 <= channels <= 4):
+        raise ValueError(
+            "QOI.decode: The number of channels declared in the file is invalid"
+        )
+
+    if colorspace > 1:
+        raise ValueError("QOI.decode: The colorspace declared in the file is invalid")
+
+    if not (3 <= output_channels <= 4):
+        raise ValueError("QOI.decode: The number of channels for the output is invalid")
+
+    return width, height, channels, colorspace, output_channels
+
+
+class VectorDecoderState:
+    """Decoder state carried from one vectorized window to the next."""
+
+    __slots__ = ("prev", "index")
+
+    def __init__(self):
+        # Previous pixel as RGBA bytes, starting at opaque black.
+        self.prev = np.array([0, 0, 0, 255], dtype=np.uint8)
+        # The 64-entry color index, RGBA bytes packed little-endian into uint32.
+        self.index = np.zeros(64, dtype="<u4")
+
+
+def scan_chunks(data: np.ndarray, start: int, stop: int) -> np.ndarray:
+    """
+    Find the offsets of all complete chunks in data[start:stop].
+
+    The range is split into blocks and the chunk chain of every block is
+    followed in lockstep, assuming it begins at the block start. The true
+    entry offset of each block is then resolved in order; when it differs,
+    the chain is walked from the real entry until it joins the assumed one,
+    which in QOI streams happens within a few chunks.
+
+    :param data: uint8 array holding the QOI stream.
+    :param start: Offset of the first chunk.
+    :param stop: End of the range to scan; a chunk crossing it is not returned.
+    :return: int64 array of chunk offsets into `data`.
+    """
+    lengths = CHUNK_LENGTHS[data[start:stop]]
+    n = len(lengths)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+
+    block_size = min(SCAN_BLOCK_BYTES, max(n // SCAN_MIN_BLOCKS, 64))
+    block_count = -(-n // block_size)
+    block_start = np.arange(block_count, dtype=np.int64) * block_size
+    block_end = np.minimum(block_start + block_size, n)
+
+    # --- Lockstep Walk ---
+    is_chunk = np.zeros(n, dtype=bool)
+    block_exit = np.empty(block_count, dtype=np.int64)
+    pos = block_start.copy()
+    end = block_end
+    block = np.arange(block_count)
+    while len(pos):
+        is_chunk[pos] = True
+        pos = pos + lengths[pos]
+        done = pos >= end
+        if done.any():
+            block_exit[block[done]] = pos[done]
+            keep = ~done
+            pos = pos[keep]
+            end = end[keep]
+            block = block[keep]
+
+    # --- Entry Resolution ---
+    entry = 0
+    for b, (b_start, b_end, b_exit) in enumerate(
+        zip(block_start.tolist(), block_end.tolist(), block_exit.tolist())
+    ):
+        if entry == b_start:
+            entry = b_exit
+            continue
+
+        # The previous block's last chunk spills into this one
+        walked = []
+        pos = entry
+        while pos < b_end and not is_chunk[pos]:
+            walked.append(pos)
+            pos += int(lengths[pos])
+        is_chunk[b_start:pos] = False
+        is_chunk[walked] = True
+        entry = b_exit if pos < b_end else pos
+
+    offsets = np.flatnonzero(is_chunk)
+    offsets = offsets[offsets + lengths[offsets] <= n]
+    return offsets + start
+
+
+def decode_window(
+    data: np.ndarray, start: int, stop: int, max_pixels: int, state: VectorDecoderState
+):
+    """
+    Decode the complete chunks in data[start:stop].
+
+    :param data: uint8 array holding the QOI stream.
+    :param start: Offset of the first chunk.
+    :param stop: End of the window; a chunk crossing it is left for the next call.
+    :param max_pixels: Number of pixels still missing from the image.
+    :param state: VectorDecoderState, updated in place.
+    :return: (next read offset, (n, 4) uint8 array of RGBA pixels), or
+             (start, None) if the window holds no complete chunk.
+    """
+    next_pos, chunks = decode_window_chunks(data, start, stop, max_pixels, state)
+    if chunks is None:
+        return start, None
+
+    _, _, counts, values = chunks
+    return next_pos, np.repeat(values, counts, axis=0)
+
+
+def decode_window_chunks(
+    data: np.ndarray, start: int, stop: int, max_pixels: int, state: VectorDecoderState
+):
+    """
+    Same as decode_window, but return one value per chunk instead of expanding runs.
+
+    :return: (next read offset, (offsets, tags, counts, values)), or (start, None)
+             if the window holds no complete chunk. values is an (m, 4) uint8 array,
+             counts the number of pixels each chunk produces.
+    """
+    offsets = scan_chunks(data, start, stop)
+    if len(offsets) == 0:
+        return start, None
+
+    tags = data[offsets]
+    counts = np.where((tags >= 0xC0) & (tags < 0xFE), (tags & 0x3F) + 1, 1)
+
+    # Stop at the chunk that completes the image, clipping an overlong run
+    produced = np.cumsum(counts)
+    if produced[-1] >= max_pixels:
+        last = int(np.searchsorted(produced, max_pixels))
+        offsets = offsets[: last + 1]
+        tags = tags[: last + 1]
+        counts = counts[: last + 1]
+        counts[-1] -= produced[last] - max_pixels
+
+    values = decode_chunk_values(data, offsets, tags, state)
+    next_pos = int(offsets[-1] + CHUNK_LENGTHS[tags[-1]])
+    return next_pos, (offsets, tags, counts, values)
+
+
+def _hash(px: np.ndarray) -> np.ndarray:
+    """Index positions of (n, 4) uint8 pixels (uint8 arithmetic wraps modulo 256)."""
+    return (
+        px[:, 0] * np.uint8(3)
+        + px[:, 1] * np.uint8(5)
+        + px[:, 2] * np.uint8(7)
+        + px[:, 3] * np.uint8(11)
+    ) & np.uint8(63)
+
+
+def decode_chunk_values(
+    data: np.ndarray, offsets: np.ndarray, tags: np.ndarray, state: VectorDecoderState
+) -> np.ndarray:
+    """
+    Compute the pixel value produced by every chunk.
+
+    :param data: uint8 array holding the QOI stream.
+    :param offsets: Offsets of the chunks in `data`.
+    :param tags: Tag bytes of the chunks.
+    :param state: VectorDecoderState, updated in place.
+    :return: (m, 4) uint8 array with the RGBA value of every chunk.
+    """
+    m = len(tags)
+    u8 = np.uint8
+    positions = np.arange(m)
+
+    is_index = tags < 0x40
+    is_diff = (tags & 0xC0) == 0x40
+    is_luma = (tags & 0xC0) == 0x80
+    is_rgb = tags == 0xFE
+    is_rgba = tags == 0xFF
+
+    # Rows of four channel bytes are gathered as single little-endian uint32s
+    def packed(px):
+        return px.view("<u4").reshape(-1)
+
+    def unpacked(px):
+        return px.view(u8).reshape(-1, 4)
+
+    # --- Channel Deltas ---
+    # The alpha column stays zero: DIFF and LUMA never change alpha.
+    delta = np.zeros((m, 4), dtype=u8)
+    t = tags[is_diff]
+    delta[is_diff, 0] = ((t >> 4) & 0x03) - u8(2)
+    delta[is_diff, 1] = ((t >> 2) & 0x03) - u8(2)
+    delta[is_diff, 2] = (t & 0x03) - u8(2)
+
+    t = tags[is_luma]
+    b2 = data[offsets[is_luma] + 1]
+    dg = (t & 0x3F) - u8(32)
+    delta[is_luma, 0] = dg + (b2 >> 4) - u8(8)
+    delta[is_luma, 1] = dg
+    delta[is_luma, 2] = dg + (b2 & 0x0F) - u8(8)
+
+    # --- Explicit Values ---
+    explicit = np.zeros((m, 4), dtype=u8)
+    explicit[is_rgb, :3] = data[offsets[is_rgb, None] + np.arange(1, 4)]
+    explicit[is_rgba] = data[offsets[is_rgba, None] + np.arange(1, 5)]
+
+    # --- Modular Prefix Sums ---
+    # Each RGB value restarts at the last chunk that sets it absolutely
+    # (RGB, RGBA or INDEX); the alpha value only changes on RGBA chunks,
+    # assuming index chunks keep it (verified below).
+    last_abs = np.maximum.accumulate(
+        np.where(is_rgb | is_rgba | is_index, positions, -1)
+    )
+    last_alpha = np.maximum.accumulate(np.where(is_rgba, positions, -1))
+    has_abs = last_abs >= 0
+    abs_pos = np.where(has_abs, last_abs, 0)
+
+    cum = np.cumsum(delta, axis=0, dtype=u8)
+    cum_at_abs = packed(cum)[abs_pos]
+    cum_at_abs[~has_abs] = 0
+    rel = cum - unpacked(cum_at_abs)
+
+    base = packed(explicit)[abs_pos]
+    base[~has_abs] = packed(state.prev)[0]
+    values = unpacked(base) + rel
+    values[:, 3] = np.where(
+        last_alpha >= 0, explicit[np.maximum(last_alpha, 0), 3], state.prev[3]
+    )
+
+    # --- Index Resolution ---
+    # Chunks following an index chunk are that chunk's value plus `rel`. Their
+    # hash is known without the value: it is the index tag plus the hash of `rel`,
+    # as long as the slot read holds a value of that hash (checked below).
+    from_index = has_abs & is_index[abs_pos]
+    hashes = _hash(values)
+    hashes = np.where(from_index, (tags[abs_pos] + _hash(rel)) & u8(63), hashes)
+
+    # The slot read by an index chunk was last written by the previous chunk
+    # with the same hash, or comes from the index carried into this window.
+    order = np.argsort(hashes, kind="stable")
+    h_sorted = hashes[order]
+    first = np.ones(m, dtype=bool)
+    first[1:] = h_sorted[1:] != h_sorted[:-1]
+    writer_sorted = np.empty(m, dtype=np.int64)
+    writer_sorted[1:] = order[:-1]
+    writer_sorted[first] = -1
+    writer = np.empty(m, dtype=np.int64)
+    writer[order] = writer_sorted
+
+    index_pos = np.flatnonzero(is_index)
+    index_no = np.cumsum(is_index) - 1
+    ref = writer[index_pos]
+    ref_from_index = (ref >= 0) & from_index[np.maximum(ref, 0)]
+
+    root = packed(values)[np.maximum(ref, 0)]
+    carried = ref < 0
+    slots = tags[index_pos[carried]]
+    root[carried] = state.index[slots]
+    if not np.array_equal(_hash(unpacked(root[carried])), slots):
+        # A carried slot holds a value of another hash (the initial zeros), so
+        # the hashes of the chunks following it are not known in advance
+        return _decode_chunk_values_sequential(data, offsets, tags, state)
+
+    # Pointer jumping over the index chunks that depend on an earlier one
+    parent = np.full(len(index_pos), -1, dtype=np.int64)
+    offset = np.zeros(len(index_pos), dtype="<u4")
+    src = ref[ref_from_index]
+    parent[ref_from_index] = index_no[abs_pos[src]]
+    offset[ref_from_index] = packed(rel)[src]
+    linked = np.flatnonzero(parent >= 0)
+    while len(linked):
+        up = parent[linked]
+        offset[linked] = packed(unpacked(offset[linked]) + unpacked(offset[up]))
+        root[linked] = root[up]
+        parent[linked] = parent[up]
+        linked = linked[parent[linked] >= 0]
+
+    index_values = unpacked(root) + unpacked(offset)
+    if not np.array_equal(index_values[:, 3], values[index_pos, 3]):
+        # An index chunk changed the alpha channel
+        return _decode_chunk_values_sequential(data, offsets, tags, state)
+
+    follow = np.flatnonzero(from_index)
+    values[follow] = unpacked(packed(index_values)[index_no[abs_pos[follow]]]) + rel[
+        follow
+    ]
+
+    # --- State Update ---
+    last = np.ones(m, dtype=bool)
+    last[:-1] = first[1:]
+    state.index[h_sorted[last]] = packed(values)[order[last]]
+    state.prev = values[-1].copy()
+    return values
+
+
+def _decode_chunk_values_sequential(
+    data: np.ndarray, offsets: np.ndarray, tags: np.ndarray, state: VectorDecoderState
+) -> np.ndarray:
+    """Sequential version of `decode_chunk_values` for windows it cannot vectorize."""
+    raw = memoryview(data)
+    r, g, b, a = state.prev.tolist()
+    index = [tuple(px) for px in state.index.view(np.uint8).reshape(64, 4).tolist()]
+    values = bytearray(len(tags) * 4)
+    write_pos = 0
+
+    for pos, b1 in zip(offsets.tolist(), tags.tolist()):
+        if b1 == 0xFE:
+            r, g, b = raw[pos + 1], raw[pos + 2], raw[pos + 3]
+        elif b1 == 0xFF:
+            r, g, b, a = raw[pos + 1], raw[pos + 2], raw[pos + 3], raw[pos + 4]
+        elif b1 < 0x40:
+            r, g, b, a = index[b1]
+        elif b1 < 0x80:
+            r = (r + ((b1 >> 4) & 0x03) - 2) % 256
+            g = (g + ((b1 >> 2) & 0x03) - 2) % 256
+            b = (b + (b1 & 0x03) - 2) % 256
+        elif b1 < 0xC0:
+            b2 = raw[pos + 1]
+            dg = (b1 & 0x3F) - 32
+            r = (r + dg + ((b2 >> 4) & 0x0F) - 8) % 256
+            g = (g + dg) % 256
+            b = (b + dg + (b2 & 0x0F) - 8) % 256
+
+        index[(r * 3 + g * 5 + b * 7 + a * 11) % 64] = (r, g, b, a)
+        values[write_pos : write_pos + 4] = bytes((r, g, b, a))
+        write_pos += 4
+
+    state.prev = np.array((r, g, b, a), dtype=np.uint8)
+    state.index = np.array(index, dtype=np.uint8).view("<u4").reshape(64)
+    return np.frombuffer(values, dtype=np.uint8).reshape(-1, 4)
+
 
 # Example Usage
 if __name__ == "__main__":
@@ -1,15 +1,27 @@
+import os
 import struct
+import time
+
+import numpy as np
+
+from .kernels import encode_kernel, pixel_bytes
+
+# Number of pixels classified per NumPy pass in `QOIEncoder.encode_vectorized`.
+# Bounds the size of the temporary arrays independently of the image size.
+VECTOR_BLOCK_PIXELS = 1 << 20
+
+# 7 bytes of 0x00 followed by 1 byte of 0x01
+QOI_END_MARKER = b"\x00\x00\x00\x00\x00\x00\x00\x01"
 
 
 class QOIEncoder:
     @staticmethod
-    def encode(color_data, description: dict) -> bytes:
+    def _check_description(description: dict) -> tuple[int, int, int, int]:
         """
-        Encode a QOI file.
+        Validate an image description.
 
-        :param color_data: Bytes-like object (bytes, bytearray, list of ints) containing pixel data.
         :param description: Dictionary containing 'width', 'height', 'channels', 'colorspace'.
-        :return: bytes object containing the QOI file content.
+        :return: (width, height, channels, colorspace) tuple.
         """
         width = description.get("width")
         height = description.get("height")
@@ -31,6 +43,28 @@ class QOIEncoder:
                 "QOI.encode: Invalid description.colorspace, must be 0 or 1"
             )
 
+        return width, height, channels, colorspace
+
+    @staticmethod
+    def encode(color_data, description: dict, stats=None) -> bytes:
+        """
+        Encode a QOI file.
+
+        :param color_data: Bytes-like object (bytes, bytearray, list of ints) containing pixel data.
+        :param description: Dictionary containing 'width', 'height', 'channels', 'colorspace'.
+        :param stats: Optional QOIStats collecting opcode statistics and phase timings.
+        :return: bytes object containing the QOI file content.
+        """
+        if stats is not None:
+            started = time.perf_counter()
+
+        width, height, channels, colorspace = QOIEncoder._check_description(
+            description
+        )
+
+        # Items must be Python ints (NumPy uint8 scalars would wrap in the kernel)
+        color_data = pixel_bytes(color_data)
+
         pixel_length = width * height * channels
         if len(color_data) != pixel_length:
             raise ValueError("QOI.encode: The length of colorData is incorrect")
@@ -49,103 +83,359 @@ class QOIEncoder:
         # 12: channels, 13: colorspace
         result.extend(struct.pack(">IIBB", width, height, channels, colorspace))
 
-        # Encoding State
-        prev_r, prev_g, prev_b, prev_a = 0, 0, 0, 255
-        run = 0
-
-        # Index array: 64 pixels, initialized to zero.
-        # Storing as tuples (r, g, b, a) for easier comparison.
-        index = [(0, 0, 0, 0)] * 64
-
-        total_pixels = width * height
+        if stats is not None:
+            stats.add_time("setup", time.perf_counter() - started)
+            started = time.perf_counter()
 
         # --- Pixel Loop ---
-        for i in range(0, len(color_data), channels):
-            # Extract current pixel
-            r = color_data[i]
-            g = color_data[i + 1]
-            b = color_data[i + 2]
-
-            # Handle alpha based on channel count
-            if channels == 4:
-                a = color_data[i + 3]
-            else:
-                a = 255
-
-            # Check for run
-            if r == prev_r and g == prev_g and b == prev_b and a == prev_a:
-                run += 1
-                # If we hit max run length (62) or it's the very last pixel
-                if run == 62 or i == (pixel_length - channels):
-                    # QOI_OP_RUN
-                    result.append(0b11000000 | (run - 1))
-                    run = 0
-            else:
-                # If we were in a run, end it before processing the new pixel
-                if run > 0:
-                    # QOI_OP_RUN
-                    result.append(0b11000000 | (run - 1))
-                    run = 0
-
-                # Check Index
-                index_pos = (r * 3 + g * 5 + b * 7 + a * 11) % 64
-
-                if index[index_pos] == (r, g, b, a):
-                    result.append(index_pos)  # QOI_OP_INDEX (00xxxxxx)
-                else:
-                    # Update index
-                    index[index_pos] = (r, g, b, a)
-
-                    if a == prev_a:
-                        # Calculate differences
-                        # (x - y + 256) % 256 ensures we get the byte-wrapped difference (0-255)
-                        # Then we shift range to -128..127
-                        vr = (r - prev_r + 256) % 256
-                        if vr > 127:
-                            vr -= 256
-
-                        vg = (g - prev_g + 256) % 256
-                        if vg > 127:
-                            vg -= 256
-
-                        vb = (b - prev_b + 256) % 256
-                        if vb > 127:
-                            vb -= 256
-
-                        vg_r = vr - vg
-                        vg_b = vb - vg
-
-                        # QOI_OP_DIFF
-                        if (-3 < vr < 2) and (-3 < vg < 2) and (-3 < vb < 2):
-                            result.append(
-                                0b01000000
-                                | ((vr + 2) << 4)
-                                | ((vg + 2) << 2)
-                                | (vb + 2)
-                            )
-
-                        # QOI_OP_LUMA
-                        elif (-9 < vg_r < 8) and (-33 < vg < 32) and (-9 < vg_b < 8):
-                            result.append(0b10000000 | (vg + 32))
-                            result.append(((vg_r + 8) << 4) | (vg_b + 8))
-
-                        # QOI_OP_RGB
-                        else:
-                            result.append(0b11111110)
-                            result.extend((r, g, b))
-                    else:
-                        # QOI_OP_RGBA
-                        result.append(0b11111111)
-                        result.extend((r, g, b, a))
-
-            prev_r, prev_g, prev_b, prev_a = r, g, b, a
+        # Generated for the channel count, without per-pixel channel checks
+        encode_kernel(channels)(color_data, result)
 
         # --- End Marker ---
         # 7 bytes of 0x00 followed by 1 byte of 0x01
-        result.extend(b"\x00\x00\x00\x00\x00\x00\x00\x01")
+        result.extend(QOI_END_MARKER)
+
+        if stats is not None:
+            stats.add_time("pixels", time.perf_counter() - started)
+            stats.record(result)
 
         return bytes(result)
 
+    @staticmethod
+    def encode_vectorized(color_data, description: dict, stats=None) -> bytes:
+        """
+        Encode a QOI file using NumPy to classify whole blocks of pixels at once.
+
+        Run lengths, wrapped per-channel deltas, hash positions and DIFF/LUMA
+        eligibility are computed as arrays. The index-cache state is resolved
+        per hash bucket as well: a pixel is a QOI_OP_INDEX hit exactly when the
+        previous non-run pixel with the same hash is identical to it, so no
+        per-pixel interpreted loop is needed. The output is byte-identical to
+        `QOIEncoder.encode`.
+
+        :param color_data: Bytes-like object, NumPy array or list of ints containing pixel data.
+        :param description: Dictionary containing 'width', 'height', 'channels', 'colorspace'.
+        :param stats: Optional QOIStats collecting opcode statistics and phase timings.
+        :return: bytes object containing the QOI file content.
+        """
+        if stats is not None:
+            started = time.perf_counter()
+
+        width, height, channels, colorspace = QOIEncoder._check_description(
+            description
+        )
+
+        flat = _as_flat_uint8(color_data)
+        if flat.size != width * height * channels:
+            raise ValueError("QOI.encode: The length of colorData is incorrect")
+
+        if stats is not None:
+            stats.add_time("setup", time.perf_counter() - started)
+            started = time.perf_counter()
+
+        result = bytearray()
+        for piece in _iter_vectorized(flat, width, height, channels, colorspace):
+            result.extend(piece)
+
+        if stats is not None:
+            stats.add_time("pixels", time.perf_counter() - started)
+            stats.record(result)
+
+        return bytes(result)
+
+    @staticmethod
+    def max_size(description: dict) -> int:
+        """
+        Worst-case size of the QOI file for an image description.
+
+        Every pixel takes at most one byte more than its channels (QOI_OP_RGB
+        for 3 channels, QOI_OP_RGBA for 4), plus the header and end marker.
+
+        :param description: Dictionary containing 'width', 'height', 'channels', 'colorspace'.
+        :return: Upper bound on the encoded size in bytes.
+        """
+        width, height, channels, _ = QOIEncoder._check_description(description)
+        return 14 + width * height * (channels + 1) + len(QOI_END_MARKER)
+
+    @staticmethod
+    def encode_into(color_data, description: dict, out) -> int:
+        """
+        Encode a QOI file into a caller-supplied buffer.
+
+        :param color_data: Bytes-like object, NumPy array or list of ints containing pixel data.
+        :param description: Dictionary containing 'width', 'height', 'channels', 'colorspace'.
+        :param out: Writable buffer, ideally of `QOIEncoder.max_size(description)` bytes.
+        :return: Number of bytes written to `out`.
+        """
+        width, height, channels, colorspace = QOIEncoder._check_description(
+            description
+        )
+
+        flat = _as_flat_uint8(color_data)
+        if flat.size != width * height * channels:
+            raise ValueError("QOI.encode: The length of colorData is incorrect")
+
+        target = np.frombuffer(memoryview(out).cast("B"), dtype=np.uint8)
+        if not target.flags.writeable:
+            raise ValueError("QOI.encode: The output buffer is not writable")
+
+        write_pos = 0
+        for piece in _iter_vectorized(flat, width, height, channels, colorspace):
+            if write_pos + len(piece) > len(target):
+                raise ValueError("QOI.encode: The output buffer is too small")
+            target[write_pos : write_pos + len(piece)] = np.frombuffer(
+                piece, dtype=np.uint8
+            )
+            write_pos += len(piece)
+
+        return write_pos
+
+    @staticmethod
+    def encode_to_file(color_data, description: dict, file) -> int:
+        """
+        Encode a QOI file and write it out block by block.
+
+        Only the encoded bytes of one block of `VECTOR_BLOCK_PIXELS` pixels are
+        held in memory at a time.
+
+        :param color_data: Bytes-like object, NumPy array or list of ints containing pixel data.
+        :param description: Dictionary containing 'width', 'height', 'channels', 'colorspace'.
+        :param file: Path, file descriptor or binary file object to write to.
+        :return: Number of bytes written.
+        """
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, "wb") as f:
+                return QOIEncoder.encode_to_file(color_data, description, f)
+
+        width, height, channels, colorspace = QOIEncoder._check_description(
+            description
+        )
+
+        flat = _as_flat_uint8(color_data)
+        if flat.size != width * height * channels:
+            raise ValueError("QOI.encode: The length of colorData is incorrect")
+
+        written = 0
+        for piece in _iter_vectorized(flat, width, height, channels, colorspace):
+            if isinstance(file, int):
+                view = memoryview(piece)
+                while view:
+                    view = view[os.write(file, view) :]
+            else:
+                file.write(piece)
+            written += len(piece)
+
+        return written
+
+
+def _iter_vectorized(flat, width, height, channels, colorspace):
+    """Yield a QOI file piece by piece: header, one piece per block, end."""
+    yield b"qoif" + struct.pack(">IIBB", width, height, channels, colorspace)
+
+    state = VectorEncoderState()
+    step = VECTOR_BLOCK_PIXELS * channels
+    for start in range(0, flat.size, step):
+        block = _to_rgba(flat[start : start + step], channels)
+        yield encode_block(block, state)
+
+    # --- End Marker ---
+    yield finish_block_state(state) + QOI_END_MARKER
+
+
+class VectorEncoderState:
+    """Encoder state carried from one vectorized block to the next."""
+
+    __slots__ = ("prev", "run", "index")
+
+    def __init__(self):
+        # Previous pixel as RGBA bytes, starting at opaque black.
+        self.prev = np.array([0, 0, 0, 255], dtype=np.uint8)
+        # Length of the run of pixels equal to `prev` that is still open.
+        self.run = 0
+        # The 64-entry color index, pixels packed into uint32 (zero initialized).
+        self.index = np.zeros(64, dtype=np.uint32)
+
+
+def _as_flat_uint8(color_data) -> np.ndarray:
+    """Return a flat uint8 view of `color_data`, copying only when it is not a buffer."""
+    if isinstance(color_data, np.ndarray):
+        return np.ascontiguousarray(color_data, dtype=np.uint8).reshape(-1)
+    try:
+        return np.frombuffer(color_data, dtype=np.uint8)
+    except TypeError:
+        # Lists or other sequences of ints
+        return np.asarray(color_data, dtype=np.uint8).reshape(-1)
+
+
+def _to_rgba(flat: np.ndarray, channels: int) -> np.ndarray:
+    """Reshape flat pixel bytes into a contiguous (n, 4) RGBA array."""
+    if channels == 4:
+        return np.ascontiguousarray(flat.reshape(-1, 4))
+    rgb = flat.reshape(-1, 3)
+    rgba = np.empty((len(rgb), 4), dtype=np.uint8)
+    rgba[:, :3] = rgb
+    rgba[:, 3] = 255
+    return rgba
+
+
+def encode_block(px: np.ndarray, state: VectorEncoderState) -> np.ndarray:
+    """
+    Encode a block of pixels with array operations.
+
+    :param px: C-contiguous (n, 4) uint8 array of RGBA pixels.
+    :param state: VectorEncoderState carried over from the previous block, updated in place.
+    :return: uint8 array of encoded chunks. A run still open at the end of the
+             block is kept in `state.run` and written by a later block or by
+             `finish_block_state`.
+    """
+    n = len(px)
+    if n == 0:
+        return np.empty(0, dtype=np.uint8)
+
+    # Previous pixel of every pixel (the first one comes from the carried state)
+    prev_px = np.empty_like(px)
+    prev_px[0] = state.prev
+    prev_px[1:] = px[:-1]
+
+    packed = px.view(np.uint32).reshape(n)
+    same = packed == prev_px.view(np.uint32).reshape(n)
+
+    # --- Run Lengths ---
+    # Distance to the last pixel that broke the run. A run carried in from the
+    # previous block behaves as if it started `state.run` pixels before index 0.
+    positions = np.arange(n, dtype=np.int64)
+    last_break = np.where(same, -1 - state.run, positions)
+    np.maximum.accumulate(last_break, out=last_break)
+    run_len = positions - last_break  # 0 for pixels that are not part of a run
+
+    # A QOI_OP_RUN of 62 is written every time a run reaches a multiple of 62
+    full_run = same & (run_len % 62 == 0)
+
+    # Shorter runs are flushed right before the next non-run pixel
+    run_before = np.empty(n, dtype=np.int64)
+    run_before[0] = state.run
+    run_before[1:] = run_len[:-1]
+
+    lit_pos = np.flatnonzero(~same)
+    pending = run_before[lit_pos] % 62
+
+    # --- Literal Pixel Classification ---
+    cur = px[lit_pos]
+    prv = prev_px[lit_pos]
+    values = packed[lit_pos]
+    # uint8 arithmetic wraps modulo 256, which preserves the value modulo 64
+    hashes = (
+        cur[:, 0] * np.uint8(3)
+        + cur[:, 1] * np.uint8(5)
+        + cur[:, 2] * np.uint8(7)
+        + cur[:, 3] * np.uint8(11)
+    ) & np.uint8(63)
+
+    # Index lookup: the index slot of a hash always holds the most recent
+    # non-run pixel with that hash (or the carried-in slot for the first one).
+    m = len(lit_pos)
+    order = np.argsort(hashes, kind="stable")
+    h_sorted = hashes[order]
+    v_sorted = values[order]
+    first = np.ones(m, dtype=bool)
+    first[1:] = h_sorted[1:] != h_sorted[:-1]
+    ref = np.empty_like(v_sorted)
+    ref[1:] = v_sorted[:-1]
+    ref[first] = state.index[h_sorted[first]]
+    in_index = np.empty(m, dtype=bool)
+    in_index[order] = v_sorted == ref
+
+    last = np.ones(m, dtype=bool)
+    last[:-1] = first[1:]
+    state.index[h_sorted[last]] = v_sorted[last]
+
+    # Byte-wrapped differences shifted to -128..127
+    delta = (cur - prv).view(np.int8).astype(np.int16)
+    vr = delta[:, 0]
+    vg = delta[:, 1]
+    vb = delta[:, 2]
+    vg_r = vr - vg
+    vg_b = vb - vg
+
+    same_alpha = cur[:, 3] == prv[:, 3]
+    is_diff = (
+        ~in_index
+        & same_alpha
+        & (-3 < vr) & (vr < 2)
+        & (-3 < vg) & (vg < 2)
+        & (-3 < vb) & (vb < 2)
+    )
+    is_luma = (
+        ~in_index
+        & same_alpha
+        & ~is_diff
+        & (-9 < vg_r) & (vg_r < 8)
+        & (-33 < vg) & (vg < 32)
+        & (-9 < vg_b) & (vg_b < 8)
+    )
+    is_rgb = ~in_index & same_alpha & ~is_diff & ~is_luma
+    is_rgba = ~in_index & ~same_alpha
+
+    # --- Output Layout ---
+    op_size = np.ones(m, dtype=np.int64)
+    op_size[is_luma] = 2
+    op_size[is_rgb] = 4
+    op_size[is_rgba] = 5
+    has_pending = pending > 0
+
+    sizes = full_run.astype(np.int64)
+    sizes[lit_pos] = op_size + has_pending
+    ends = np.cumsum(sizes)
+    starts = ends - sizes
+    out = np.empty(int(ends[-1]), dtype=np.uint8)
+
+    # QOI_OP_RUN
+    out[starts[full_run]] = 0b11000000 | 61
+    lit_start = starts[lit_pos]
+    out[lit_start[has_pending]] = 0b11000000 | (pending[has_pending] - 1)
+    op_start = lit_start + has_pending
+
+    # QOI_OP_INDEX
+    out[op_start[in_index]] = hashes[in_index]
+
+    # QOI_OP_DIFF
+    out[op_start[is_diff]] = (
+        0b01000000
+        | ((vr[is_diff] + 2) << 4)
+        | ((vg[is_diff] + 2) << 2)
+        | (vb[is_diff] + 2)
+    )
+
+    # QOI_OP_LUMA
+    pos = op_start[is_luma]
+    out[pos] = 0b10000000 | (vg[is_luma] + 32)
+    out[pos + 1] = ((vg_r[is_luma] + 8) << 4) | (vg_b[is_luma] + 8)
+
+    # QOI_OP_RGB
+    pos = op_start[is_rgb]
+    out[pos] = 0b11111110
+    for c in range(3):
+        out[pos + 1 + c] = cur[is_rgb, c]
+
+    # QOI_OP_RGBA
+    pos = op_start[is_rgba]
+    out[pos] = 0b11111111
+    for c in range(4):
+        out[pos + 1 + c] = cur[is_rgba, c]
+
+    state.prev = px[-1].copy()
+    state.run = int(run_len[-1])
+    return out
+
+
+def finish_block_state(state: VectorEncoderState) -> bytes:
+    """Return the QOI_OP_RUN that closes a run still open after the last block."""
+    run = state.run % 62
+    state.run = 0
+    if run:
+        return bytes((0b11000000 | (run - 1),))
+    return b""
+
 
 # Example Usage
 if __name__ == "__main__":
@@ -0,0 +1,333 @@
+import sys
+import textwrap
+
+# Hash contribution of every channel value: the QOI index position
+# (r * 3 + g * 5 + b * 7 + a * 11) % 64 becomes four table lookups and a mask
+# (the sum of four values below 64 stays below 256, and 64 divides 256).
+HASH_R = tuple((v * 3) & 63 for v in range(256))
+HASH_G = tuple((v * 5) & 63 for v in range(256))
+HASH_B = tuple((v * 7) & 63 for v in range(256))
+HASH_A = tuple((v * 11) & 63 for v in range(256))
+# Contribution of the implicit alpha of 3-channel pixels
+HASH_OPAQUE = HASH_A[255]
+
+# Bit offsets of r, g, b and a in a packed pixel, the native-endian 32-bit
+# integer read from its 4 bytes (so that RGBA data can be read as array("I"))
+if sys.byteorder == "little":
+    SHIFTS = (0, 8, 16, 24)
+else:
+    SHIFTS = (24, 16, 8, 0)
+ALPHA_MASK = 255 << SHIFTS[3]
+
+# Compiled kernels, by (direction, channels)
+_kernels = {}
+
+
+def encode_kernel(channels: int):
+    """
+    Pixel loop of `QOIEncoder.encode` specialized for 3- or 4-channel input.
+
+    The kernel is generated and compiled on first use, then cached. It is called
+    as kernel(color_data, result) and appends the chunks of every pixel of
+    color_data to the bytearray result (header and end marker excluded).
+    """
+    key = ("encode", channels)
+    if key not in _kernels:
+        _kernels[key] = _compile(_encoder_source(channels), "encode_pixels")
+    return _kernels[key]
+
+
+def decode_kernel(output_channels: int):
+    """
+    Chunk loop of `QOIDecoder.decode` specialized for 3- or 4-channel output.
+
+    The channel count declared in the file does not change the loop (alpha is
+    tracked either way, as index hits may change it), so kernels only depend
+    on the output. Called as kernel(data, read_pos, total_pixels, row_pixels,
+    result), it fills result and returns the number of pixels written.
+    """
+    key = ("decode", output_channels)
+    if key not in _kernels:
+        _kernels[key] = _compile(_decoder_source(output_channels), "decode_pixels")
+    return _kernels[key]
+
+
+def pixel_bytes(color_data):
+    """
+    Pixel data whose items are Python ints, as the generated kernels expect.
+
+    NumPy arrays and other buffers of bytes are viewed as unsigned bytes: the
+    items of their channel slices would otherwise be NumPy uint8 scalars, whose
+    arithmetic wraps at 255. Wider integer buffers are converted to lists.
+
+    :param color_data: Bytes-like object, NumPy array or list of ints.
+    :return: bytes, bytearray, list or memoryview of format "B".
+    """
+    if isinstance(color_data, (bytes, bytearray, list)):
+        return color_data
+    try:
+        view = memoryview(color_data)
+    except TypeError:
+        return list(color_data)
+    if view.itemsize != 1:
+        return [int(v) for v in view.cast("B").cast(view.format)]
+    try:
+        return view.cast("B")
+    except TypeError:
+        # Non-contiguous buffers
+        return view.tobytes()
+
+
+def packed_pixels(color_data) -> memoryview:
+    """
+    View RGBA pixel data as packed 32-bit integers (see SHIFTS).
+
+    :param color_data: Bytes-like object or list of ints, 4 bytes per pixel.
+    :return: memoryview of format "I", one item per pixel.
+    """
+    try:
+        view = memoryview(color_data).cast("B")
+    except TypeError:
+        # Lists of ints, non-contiguous buffers
+        view = memoryview(bytes(color_data))
+    return view.cast("I")
+
+
+def _compile(source: str, name: str):
+    namespace = {
+        "HASH_R": HASH_R,
+        "HASH_G": HASH_G,
+        "HASH_B": HASH_B,
+        "HASH_A": HASH_A,
+        "HASH_OPAQUE": HASH_OPAQUE,
+    }
+    exec(compile(source, f"<qoi kernel {name}>", "exec"), namespace)
+    return namespace[name]
+
+
+def _fill(template: str, **blocks) -> str:
+    """
+    Substitute the `{name}` placeholders of a template. A placeholder alone on its
+    line is replaced by a block of lines at the indentation of the placeholder.
+    """
+    lines = []
+    for line in textwrap.dedent(template).splitlines():
+        name = line.strip()
+        if name.startswith("{") and name.endswith("}"):
+            block = textwrap.dedent(blocks[name[1:-1]]).strip("\n")
+            line = textwrap.indent(block, line[: len(line) - len(name)])
+        else:
+            for key, value in blocks.items():
+                line = line.replace("{" + key + "}", value)
+        lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+# --- Encoder ---
+
+_ENCODER_TEMPLATE = """
+def encode_pixels(
+    color_data,
+    result,
+    hash_r=HASH_R,
+    hash_g=HASH_G,
+    hash_b=HASH_B,
+    hash_a=HASH_A,
+):
+    append = result.append
+    extend = result.extend
+
+    prev_r = prev_g = prev_b = 0
+    {init}
+    run = 0
+
+    for {pixel} in zip({planes}):
+        # Same pixel as before: extend the run, flushing it when full
+        if {same}:
+            run += 1
+            if run == 62:
+                append(0xFD)
+                run = 0
+            continue
+
+        if run:
+            append(0xC0 | (run - 1))
+            run = 0
+
+        {hash}
+        if index[index_pos] == px:
+            append(index_pos)
+        else:
+            index[index_pos] = px
+            {literal}
+
+        {update}
+
+    if run:
+        append(0xC0 | (run - 1))
+"""
+
+# Signed byte-wrapped differences, then the smallest chunk that fits
+_DIFF_BLOCK = """
+vr = ((r - prev_r + 128) & 255) - 128
+vg = ((g - prev_g + 128) & 255) - 128
+vb = ((b - prev_b + 128) & 255) - 128
+if -3 < vr < 2 and -3 < vg < 2 and -3 < vb < 2:
+    append(0x40 | ((vr + 2) << 4) | ((vg + 2) << 2) | (vb + 2))
+elif -33 < vg < 32 and -9 < vr - vg < 8 and -9 < vb - vg < 8:
+    extend((0x80 | (vg + 32), ((vr - vg + 8) << 4) | (vb - vg + 8)))
+else:
+    extend((0xFE, r, g, b))
+"""
+
+
+def _encoder_source(channels: int) -> str:
+    if channels == 4:
+        return _fill(
+            _ENCODER_TEMPLATE,
+            init="prev_a = 255\nindex = [(0, 0, 0, 0)] * 64",
+            pixel="r, g, b, a",
+            planes="color_data[0::4], color_data[1::4], color_data[2::4], color_data[3::4]",
+            same="r == prev_r and g == prev_g and b == prev_b and a == prev_a",
+            hash=(
+                "px = (r, g, b, a)\n"
+                "index_pos = (hash_r[r] + hash_g[g] + hash_b[b] + hash_a[a]) & 63"
+            ),
+            literal=(
+                "if a != prev_a:\n    extend((0xFF, r, g, b, a))\nelse:\n"
+                + textwrap.indent(_DIFF_BLOCK.strip("\n"), "    ")
+            ),
+            update="prev_r, prev_g, prev_b, prev_a = r, g, b, a",
+        )
+
+    # Alpha is always 255: no alpha reads, compares, or QOI_OP_RGBA. The index
+    # starts empty, since no opaque pixel can match its initial (0, 0, 0, 0).
+    return _fill(
+        _ENCODER_TEMPLATE,
+        init="index = [None] * 64",
+        pixel="r, g, b",
+        planes="color_data[0::3], color_data[1::3], color_data[2::3]",
+        same="r == prev_r and g == prev_g and b == prev_b",
+        hash=(
+            "px = (r, g, b)\n"
+            "index_pos = (hash_r[r] + hash_g[g] + hash_b[b] + HASH_OPAQUE) & 63"
+        ),
+        literal=_DIFF_BLOCK,
+        update="prev_r, prev_g, prev_b = r, g, b",
+    )
+
+
+# --- Decoder ---
+
+_DECODER_TEMPLATE = """
+def decode_pixels(
+    data,
+    read_pos,
+    total_pixels,
+    row_pixels,
+    result,
+    hash_r=HASH_R,
+    hash_g=HASH_G,
+    hash_b=HASH_B,
+    hash_a=HASH_A,
+):
+    data_length = len(data)
+    index = [(0, 0, 0, 0)] * 64
+    r = g = b = 0
+    a = 255
+    write_pos = 0
+    pixels_left = total_pixels
+
+    # Literal pixels are staged here and written to result a row at a time
+    row = bytearray()
+    append = row.append
+    row_left = row_pixels
+
+    while pixels_left:
+        if read_pos < data_length:
+            b1 = data[read_pos]
+            read_pos += 1
+
+            if b1 < 0x40:
+                # QOI_OP_INDEX
+                r, g, b, a = index[b1]
+            elif b1 < 0x80:
+                # QOI_OP_DIFF
+                r = (r + ((b1 >> 4) & 3) - 2) & 255
+                g = (g + ((b1 >> 2) & 3) - 2) & 255
+                b = (b + (b1 & 3) - 2) & 255
+            elif b1 < 0xC0:
+                # QOI_OP_LUMA
+                b2 = data[read_pos]
+                read_pos += 1
+                dg = (b1 & 0x3F) - 32
+                r = (r + dg + (b2 >> 4) - 8) & 255
+                g = (g + dg) & 255
+                b = (b + dg + (b2 & 0x0F) - 8) & 255
+            elif b1 == 0xFE:
+                # QOI_OP_RGB
+                r = data[read_pos]
+                g = data[read_pos + 1]
+                b = data[read_pos + 2]
+                read_pos += 3
+            elif b1 == 0xFF:
+                # QOI_OP_RGBA
+                r = data[read_pos]
+                g = data[read_pos + 1]
+                b = data[read_pos + 2]
+                a = data[read_pos + 3]
+                read_pos += 4
+            else:
+                # QOI_OP_RUN
+                index[(hash_r[r] + hash_g[g] + hash_b[b] + hash_a[a]) & 63] = (r, g, b, a)
+                count = (b1 & 0x3F) + 1
+                {fill}
+
+            index[(hash_r[r] + hash_g[g] + hash_b[b] + hash_a[a]) & 63] = (r, g, b, a)
+
+        else:
+            # Past the end of the data the last pixel is repeated
+            count = pixels_left
+            {fill}
+
+        {write}
+        pixels_left -= 1
+        row_left -= 1
+        if not row_left:
+            result[write_pos : write_pos + len(row)] = row
+            write_pos += len(row)
+            row.clear()
+            row_left = row_pixels
+
+    if row:
+        result[write_pos : write_pos + len(row)] = row
+
+    return total_pixels - pixels_left
+"""
+
+# Writes the current pixel count times with a single slice assignment, after
+# the pixels staged before it. Staging resumes where the run ends, which may
+# be mid-row.
+_FILL_BLOCK = """
+if row:
+    result[write_pos : write_pos + len(row)] = row
+    write_pos += len(row)
+    row.clear()
+if count > pixels_left:
+    count = pixels_left
+result[write_pos : write_pos + count * {channels}] = bytes({pixel}) * count
+write_pos += count * {channels}
+pixels_left -= count
+row_left = row_pixels - (total_pixels - pixels_left) % row_pixels
+continue
+"""
+
+
+def _decoder_source(output_channels: int) -> str:
+    pixel = "(r, g, b, a)" if output_channels == 4 else "(r, g, b)"
+    fill = _FILL_BLOCK.replace("{channels}", str(output_channels))
+    return _fill(
+        _DECODER_TEMPLATE,
+        fill=fill.replace("{pixel}", pixel),
+        write="\n".join(f"append({c})" for c in pixel[1:-1].split(", ")),
+    )
@@ -0,0 +1,241 @@
+import mmap
+import os
+import struct
+
+from .decoder import QOIDecoder, parse_header
+from .encoder import QOIEncoder
+
+# Layout of a pack (Big Endian):
+#
+# - magic "qoip" (4), version (1)
+# - the QOI streams, one after the other
+# - the table of contents, sorted by UTF-8 name: per entry the position of its
+#   name in the name table (4), name length (2), stream offset (8), stream
+#   length (8), width (4), height (4), channels (1)
+# - the name table, all names concatenated
+# - table of contents offset (8), entry count (4), magic "qoip" (4)
+PACK_MAGIC = b"qoip"
+PACK_VERSION = 1
+PACK_HEADER = struct.Struct(">4sB")
+PACK_ENTRY = struct.Struct(">IHQQIIB")
+PACK_TRAILER = struct.Struct(">QI4s")
+
+
+class QOIPackWriter:
+    """
+    Writer of a pack of many QOI images, stored one after the other in a single
+    file and looked up by name through a sorted table of contents.
+
+    Streams are written as they are added; the table of contents follows them
+    and is written by `close`.
+    """
+
+    def __init__(self, file):
+        """
+        :param file: Path or binary file object to write the pack to.
+        """
+        if isinstance(file, (str, os.PathLike)):
+            self._file = open(file, "wb")
+            self._owned = True
+        else:
+            self._file = file
+            self._owned = False
+
+        self._entries = {}
+        self._file.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION))
+        self._offset = PACK_HEADER.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._owned:
+            self._file.close()
+
+    def add(self, name: str, file_data):
+        """
+        Add an encoded QOI file to the pack.
+
+        :param name: Name of the image, unique within the pack.
+        :param file_data: Bytes-like object containing the QOI file.
+        """
+        view = memoryview(file_data).cast("B")
+        width, height, channels, _, _ = parse_header(bytes(view[:14]))
+        key = self._key(name)
+        self._file.write(view)
+        self._entries[key] = (self._offset, len(view), width, height, channels)
+        self._offset += len(view)
+
+    def add_image(self, name: str, color_data, description: dict):
+        """
+        Encode an image straight into the pack.
+
+        :param name: Name of the image, unique within the pack.
+        :param color_data: Bytes-like object, NumPy array or list of ints containing pixel data.
+        :param description: Dictionary containing 'width', 'height', 'channels', 'colorspace'.
+        """
+        key = self._key(name)
+        length = QOIEncoder.encode_to_file(color_data, description, self._file)
+        self._entries[key] = (
+            self._offset,
+            length,
+            description["width"],
+            description["height"],
+            description["channels"],
+        )
+        self._offset += length
+
+    def close(self):
+        """Write the table of contents and trailer, then close owned files."""
+        if self._entries is None:
+            return
+
+        names = bytearray()
+        table = bytearray()
+        for key in sorted(self._entries):
+            table.extend(PACK_ENTRY.pack(len(names), len(key), *self._entries[key]))
+            names.extend(key)
+
+        self._file.write(table)
+        self._file.write(names)
+        self._file.write(
+            PACK_TRAILER.pack(self._offset, len(self._entries), PACK_MAGIC)
+        )
+        self._entries = None
+        if self._owned:
+            self._file.close()
+
+    def _key(self, name: str) -> bytes:
+        if self._entries is None:
+            raise ValueError("QOI.encode: The pack is closed")
+        key = name.encode("utf-8")
+        if len(key) > 0xFFFF:
+            raise ValueError("QOI.encode: The image name is too long")
+        if key in self._entries:
+            raise ValueError(f"QOI.encode: Duplicate image name {name!r}")
+        return key
+
+
+class QOIPackReader:
+    """
+    Memory-mapped reader of a pack written by `QOIPackWriter`.
+
+    Opening reads the trailer only. Looking up an image binary searches the
+    table of contents in place, and decoding it reads its own stream only,
+    through a view of the mapping.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: Path of the pack file.
+        """
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < PACK_HEADER.size + PACK_TRAILER.size:
+                raise ValueError("QOI.decode: File too short for a pack")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version = PACK_HEADER.unpack_from(self._map, 0)
+        table_offset, self._count, end_magic = PACK_TRAILER.unpack_from(
+            self._map, len(self._map) - PACK_TRAILER.size
+        )
+        if magic != PACK_MAGIC or end_magic != PACK_MAGIC:
+            raise ValueError("QOI.decode: The signature of the pack is invalid")
+        if version != PACK_VERSION:
+            raise ValueError("QOI.decode: Unsupported pack version")
+
+        self._table = table_offset
+        self._names = table_offset + self._count * PACK_ENTRY.size
+        if self._names > len(self._map) - PACK_TRAILER.size:
+            raise ValueError("QOI.decode: The pack table of contents is truncated")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, name: str) -> bool:
+        return self._find(name) is not None
+
+    def __iter__(self):
+        return iter(self.names())
+
+    def close(self):
+        """Unmap the pack. Views returned by `read` must be released first."""
+        self._map.close()
+
+    def names(self) -> list:
+        """Names of all images, in table of contents (UTF-8 byte) order."""
+        return [self._name(i).decode("utf-8") for i in range(self._count)]
+
+    def info(self, name: str) -> dict:
+        """
+        Table of contents entry of an image.
+
+        :param name: Name of the image.
+        :return: Dictionary containing offset, length, width, height and channels.
+        """
+        _, _, offset, length, width, height, channels = self._entry(name)
+        return {
+            "offset": offset,
+            "length": length,
+            "width": width,
+            "height": height,
+            "channels": channels,
+        }
+
+    def read(self, name: str) -> memoryview:
+        """
+        Zero-copy view of the QOI stream of an image.
+
+        :param name: Name of the image.
+        :return: memoryview of the QOI file within the mapping.
+        """
+        _, _, offset, length, _, _, _ = self._entry(name)
+        return memoryview(self._map)[offset : offset + length]
+
+    def decode(self, name: str, output_channels: int = None) -> dict:
+        """
+        Decode a single image of the pack.
+
+        :param name: Name of the image.
+        :param output_channels: Number of channels to include in the decoded array (3 or 4).
+                                If None, uses the channels defined in the file header.
+        :return: Dictionary containing width, height, colorspace, channels, and data (bytes).
+        """
+        _, _, offset, length, _, _, _ = self._entry(name)
+        return QOIDecoder.decode(
+            self._map, offset, length, output_channels=output_channels
+        )
+
+    def _entry(self, name: str) -> tuple:
+        i = self._find(name)
+        if i is None:
+            raise KeyError(name)
+        return PACK_ENTRY.unpack_from(self._map, self._table + i * PACK_ENTRY.size)
+
+    def _name(self, i: int) -> bytes:
+        name_pos, name_length, *_ = PACK_ENTRY.unpack_from(
+            self._map, self._table + i * PACK_ENTRY.size
+        )
+        start = self._names + name_pos
+        return self._map[start : start + name_length]
+
+    def _find(self, name: str):
+        """Position of an image in the table of contents, or None."""
+        key = name.encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._name(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count and self._name(low) == key:
+            return low
+        return None
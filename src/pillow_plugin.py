@@ -0,0 +1,113 @@
+import numpy as np
+from PIL import Image, ImageFile
+
+from .decoder import VectorDecoderState, decode_window, parse_header
+from .encoder import QOIEncoder
+
+try:
+    # Pillow ships its own (pure Python) QOI plugin, registered when Image.init()
+    # imports it. Importing it first keeps it from replacing this one later on.
+    from PIL import QoiImagePlugin  # noqa: F401
+except ImportError:
+    pass
+
+
+def _accept(prefix: bytes) -> bool:
+    return prefix[:4] == b"qoif"
+
+
+class QOIImageFile(ImageFile.ImageFile):
+    """
+    Pillow image plugin for QOI files.
+
+    Opening reads the 14-byte header only; pixels are decoded when the image is
+    loaded, block by block through `QOIPillowDecoder`.
+    """
+
+    format = "QOI"
+    format_description = "Quite OK Image"
+
+    def _open(self):
+        try:
+            width, height, channels, colorspace, _ = parse_header(self.fp.read(14))
+        except ValueError as e:
+            # Pillow expects SyntaxError to move on to the next plugin
+            raise SyntaxError(str(e)) from e
+
+        self._mode = "RGBA" if channels == 4 else "RGB"
+        self._size = (width, height)
+        self.info["colorspace"] = colorspace
+        self.tile = [ImageFile._Tile(QOIPillowDecoder.NAME, (0, 0) + self.size, 14)]
+
+
+class QOIPillowDecoder(ImageFile.PyDecoder):
+    """
+    Incremental decoder fed with the file data by `ImageFile.load`.
+
+    Every call decodes the complete chunks of the data received so far with the
+    vectorized decoder and writes the finished rows into the image; the bytes of
+    a chunk cut at the end of the data are left for the next call.
+    """
+
+    NAME = "qoi_vectorized"
+
+    def init(self, args):
+        self._state = VectorDecoderState()
+        self._row_decoder = None
+        self._pixels_left = None
+        self._staged = None
+
+    def decode(self, buffer):
+        if self._row_decoder is None:
+            # Raw decoder writing complete rows into the image, one after the other
+            self._row_decoder = Image._getdecoder(self.mode, "raw", self.mode)
+            self._row_decoder.setimage(self.im, self.state.extents())
+            self._pixels_left = self.state.xsize * self.state.ysize
+            self._staged = np.empty((0, len(self.mode)), dtype=np.uint8)
+
+        if not self._pixels_left:
+            return -1, 0
+
+        data = np.frombuffer(buffer, dtype=np.uint8)
+        read_pos, pixels = decode_window(
+            data, 0, len(data), self._pixels_left, self._state
+        )
+        if pixels is None:
+            return 0, 0
+        self._pixels_left -= len(pixels)
+
+        staged = np.concatenate((self._staged, pixels[:, : len(self.mode)]))
+        complete = len(staged) // self.state.xsize * self.state.xsize
+        if complete:
+            self._row_decoder.decode(staged[:complete].tobytes())
+        self._staged = staged[complete:]
+
+        if not self._pixels_left:
+            return -1, 0
+        return read_pos, 0
+
+
+def _save(im, fp, filename):
+    if im.mode not in ("RGB", "RGBA"):
+        raise ValueError(f"QOI.encode: Unsupported image mode {im.mode}")
+
+    colorspace = im.encoderinfo.get("colorspace", im.info.get("colorspace", 0))
+    if colorspace in ("sRGB", "linear"):
+        colorspace = 0 if colorspace == "sRGB" else 1
+
+    QOIEncoder.encode_to_file(
+        np.asarray(im),
+        {
+            "width": im.size[0],
+            "height": im.size[1],
+            "channels": len(im.mode),
+            "colorspace": colorspace,
+        },
+        fp,
+    )
+
+
+Image.register_open(QOIImageFile.format, QOIImageFile, _accept)
+Image.register_decoder(QOIPillowDecoder.NAME, QOIPillowDecoder)
+Image.register_save(QOIImageFile.format, _save)
+Image.register_extension(QOIImageFile.format, ".qoi")
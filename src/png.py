@@ -0,0 +1,448 @@
+import struct
+import zlib
+
+import numpy as np
+
+from .encoder import _as_flat_uint8
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Channels of every supported color type: gray, RGB, palette, gray + alpha, RGBA
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+
+class PNGReader:
+    """
+    Streaming PNG decoder yielding the image row by row.
+
+    IDAT chunks are read block by block and inflated with `zlib.decompressobj`,
+    and every scanline is unfiltered as soon as it is complete, so memory use
+    depends on the block size and the row width, not on the image size.
+    Rows are converted the way the converter has Pillow convert images: to
+    RGBA for images with alpha or a transparent palette or gray level, to RGB
+    otherwise. `channels` is the number of channels of the rows.
+
+        with open("image.png", "rb") as f:
+            reader = PNGReader(f)
+            for rows in reader.iter_rows(batch_rows=16):
+                ...
+
+    Only 8-bit, non-interlaced images are supported; other PNG files raise
+    ValueError when the reader is created.
+    """
+
+    # Number of bytes of compressed data read from the file object at a time
+    BLOCK_SIZE = 1 << 16
+
+    def __init__(self, fileobj, block_size: int = None):
+        """
+        :param fileobj: Binary file object positioned at the start of the PNG file.
+        :param block_size: Number of bytes read at a time.
+        """
+        self._file = fileobj
+        self._block_size = block_size or self.BLOCK_SIZE
+
+        if fileobj.read(8) != PNG_SIGNATURE:
+            raise ValueError("PNG: The signature of the PNG file is invalid")
+
+        chunk_type, data = self._read_chunk()
+        if chunk_type != b"IHDR" or len(data) != 13:
+            raise ValueError("PNG: The file does not start with an IHDR chunk")
+        (
+            self.width,
+            self.height,
+            bit_depth,
+            self.color_type,
+            compression,
+            filter_method,
+            interlace,
+        ) = struct.unpack(">IIBBBBB", data)
+
+        if self.color_type not in PNG_CHANNELS or compression or filter_method:
+            raise ValueError("PNG: The image header is invalid")
+        if bit_depth != 8:
+            raise ValueError(f"PNG: Bit depth {bit_depth} is not supported")
+        if interlace:
+            raise ValueError("PNG: Interlaced images are not supported")
+
+        # Ancillary chunks up to the image data
+        palette = None
+        transparency = None
+        while True:
+            length, chunk_type = self._read_chunk_header()
+            if chunk_type == b"IDAT":
+                break
+            data = self._read_chunk_data(length, chunk_type)
+            if chunk_type == b"PLTE":
+                palette = data
+            elif chunk_type == b"tRNS":
+                transparency = data
+            elif chunk_type == b"IEND":
+                raise ValueError("PNG: The file has no image data")
+
+        self._idat_left = length
+        self._idat_crc = zlib.crc32(chunk_type)
+        self.channels, self._convert = self._row_converter(palette, transparency)
+
+    def __iter__(self):
+        return self.iter_rows()
+
+    def iter_rows(self, batch_rows: int = 1):
+        """
+        Decode the image and yield it in batches of rows.
+
+        :param batch_rows: Number of rows per batch (the last batch may be shorter).
+        :return: Generator of (rows, width, channels) uint8 arrays.
+        """
+        bpp = PNG_CHANNELS[self.color_type]
+        stride = self.width * bpp
+        batch_rows = max(batch_rows, 1)
+
+        decompressor = zlib.decompressobj()
+        inflated = bytearray()
+        compressed = b""
+        prior = bytes(stride)
+        batch = []
+
+        for _ in range(self.height):
+            # Inflate up to the end of the scanline (filter byte + stride), in
+            # bounded steps so that highly compressed data never expands at once
+            while len(inflated) <= stride:
+                if not compressed:
+                    compressed = self._read_idat()
+                if not compressed:
+                    # After the last IDAT, the inflater may still hold output
+                    # that a previous max_length limit left behind
+                    drained = decompressor.decompress(
+                        b"", max(self._block_size, stride + 1)
+                    )
+                    if not drained:
+                        raise ValueError("PNG: The image data is truncated")
+                    inflated += drained
+                    continue
+                inflated += decompressor.decompress(
+                    compressed, max(self._block_size, stride + 1)
+                )
+                compressed = decompressor.unconsumed_tail
+
+            line = inflated[1 : stride + 1]
+            prior = _unfilter(inflated[0], line, prior, bpp)
+            del inflated[: stride + 1]
+
+            batch.append(prior)
+            if len(batch) == batch_rows:
+                yield self._convert(b"".join(batch))
+                batch = []
+
+        if batch:
+            yield self._convert(b"".join(batch))
+
+    # --- Chunks ---
+
+    def _read_chunk_header(self) -> tuple:
+        header = self._file.read(8)
+        if len(header) < 8:
+            raise ValueError("PNG: The file is truncated")
+        return struct.unpack(">I4s", header)
+
+    def _read_chunk_data(self, length: int, chunk_type: bytes) -> bytes:
+        data = self._file.read(length)
+        crc = self._file.read(4)
+        if len(data) < length or len(crc) < 4:
+            raise ValueError("PNG: The file is truncated")
+        if zlib.crc32(data, zlib.crc32(chunk_type)) != struct.unpack(">I", crc)[0]:
+            raise ValueError(f"PNG: Bad CRC in the {chunk_type.decode()} chunk")
+        return data
+
+    def _read_chunk(self) -> tuple:
+        length, chunk_type = self._read_chunk_header()
+        return chunk_type, self._read_chunk_data(length, chunk_type)
+
+    def _read_idat(self) -> bytes:
+        """Next block of compressed data, across consecutive IDAT chunks; b"" at the end."""
+        while not self._idat_left:
+            if self._idat_crc is None:
+                return b""
+            # End of an IDAT chunk: check its CRC, then move on to the next one
+            crc = self._file.read(4)
+            if len(crc) < 4 or struct.unpack(">I", crc)[0] != self._idat_crc:
+                raise ValueError("PNG: Bad CRC in the IDAT chunk")
+            self._idat_left, chunk_type = self._read_chunk_header()
+            if chunk_type != b"IDAT":
+                self._idat_left = 0
+                self._idat_crc = None
+                return b""
+            self._idat_crc = zlib.crc32(chunk_type)
+
+        block = self._file.read(min(self._idat_left, self._block_size))
+        if not block:
+            raise ValueError("PNG: The file is truncated")
+        self._idat_left -= len(block)
+        self._idat_crc = zlib.crc32(block, self._idat_crc)
+        return block
+
+    # --- Color Conversion ---
+
+    def _row_converter(self, palette: bytes, transparency: bytes) -> tuple:
+        """
+        Output channels, and the function turning unfiltered rows into
+        (rows, width, channels) arrays.
+        """
+        width = self.width
+
+        if self.color_type == 3:
+            if palette is None:
+                raise ValueError("PNG: The palette is missing")
+            # Indexes past the end of the palette map to black
+            colors = np.zeros((256, 4), dtype=np.uint8)
+            entries = np.frombuffer(palette, dtype=np.uint8)
+            entries = entries[: len(entries) // 3 * 3].reshape(-1, 3)[:256]
+            colors[: len(entries), :3] = entries
+            colors[:, 3] = 255
+            if transparency is None:
+                colors = np.ascontiguousarray(colors[:, :3])
+            else:
+                alpha = np.frombuffer(transparency, dtype=np.uint8)[:256]
+                colors[: len(alpha), 3] = alpha
+            channels = colors.shape[1]
+            return channels, lambda rows: colors[np.frombuffer(rows, np.uint8)].reshape(
+                -1, width, channels
+            )
+
+        if self.color_type == 0:
+            # Gray, with an optional transparent gray level (a 16-bit sample)
+            key = None
+            if transparency is not None and len(transparency) >= 2:
+                key = struct.unpack(">H", transparency[:2])[0]
+
+            def convert(rows):
+                gray = np.frombuffer(rows, np.uint8).reshape(-1, width, 1)
+                if key is None:
+                    return np.repeat(gray, 3, axis=2)
+                alpha = np.where(gray == key, 0, 255).astype(np.uint8)
+                return np.concatenate([gray, gray, gray, alpha], axis=2)
+
+            return (3 if key is None else 4), convert
+
+        if self.color_type == 4:
+            return (
+                4,
+                lambda rows: np.frombuffer(rows, np.uint8).reshape(-1, width, 2)[
+                    ..., [0, 0, 0, 1]
+                ],
+            )
+
+        # RGB or RGBA as is (the converter keeps RGB images RGB, with or without tRNS)
+        channels = PNG_CHANNELS[self.color_type]
+        return channels, lambda rows: np.frombuffer(rows, np.uint8).reshape(
+            -1, width, channels
+        )
+
+
+def _unfilter(filter_type: int, line: bytearray, prior: bytes, bpp: int) -> bytes:
+    """
+    Undo the filter of a scanline.
+
+    :param filter_type: PNG filter type: None, Sub, Up, Average or Paeth (0-4).
+    :param line: Filtered scanline, without its filter type byte.
+    :param prior: Unfiltered previous scanline (zeros for the first one).
+    :param bpp: Bytes per complete pixel.
+    :return: bytes of the unfiltered scanline.
+    """
+    if filter_type == 0:
+        return bytes(line)
+
+    if filter_type == 1:
+        # Sub: running sum of every channel, modulo 256 in the uint8 accumulator
+        px = np.frombuffer(line, dtype=np.uint8).reshape(-1, bpp)
+        return np.cumsum(px, axis=0, dtype=np.uint8).tobytes()
+
+    if filter_type == 2:
+        # Up
+        return (
+            np.frombuffer(line, dtype=np.uint8) + np.frombuffer(prior, dtype=np.uint8)
+        ).tobytes()
+
+    if filter_type not in (3, 4):
+        raise ValueError(f"PNG: Invalid filter type {filter_type}")
+
+    # Average and Paeth depend on the pixel to the left: each channel is
+    # processed as its own sequence, carrying the left (a) and upper-left (c)
+    # values along
+    result = bytearray(len(line))
+    for channel in range(bpp):
+        values = []
+        append = values.append
+        a = c = 0
+        if filter_type == 3:
+            for x, b in zip(line[channel::bpp], prior[channel::bpp]):
+                a = (x + ((a + b) >> 1)) & 255
+                append(a)
+        else:
+            for x, b in zip(line[channel::bpp], prior[channel::bpp]):
+                pa = b - c
+                pb = a - c
+                pc = pa + pb
+                if pa < 0:
+                    pa = -pa
+                if pb < 0:
+                    pb = -pb
+                if pc < 0:
+                    pc = -pc
+                if pa <= pb and pa <= pc:
+                    a = (x + a) & 255
+                elif pb <= pc:
+                    a = (x + b) & 255
+                else:
+                    a = (x + c) & 255
+                append(a)
+                c = b
+        result[channel::bpp] = values
+    return bytes(result)
+
+
+class PNGWriter:
+    """
+    Streaming PNG encoder taking the image in batches of rows.
+
+    Rows are filtered as they come (each with the filter type that minimizes
+    the sum of its absolute filtered bytes, the usual libpng heuristic, unless
+    a filter type is forced), compressed with `zlib.compressobj` and written
+    out as IDAT chunks, so memory use does not depend on the image height.
+
+        with open("image.png", "wb") as f:
+            writer = PNGWriter(f, width, height, channels)
+            for rows in QOIStreamDecoder(qoi_file).iter_rows(batch_rows=16):
+                writer.write_rows(rows)
+            writer.close()
+    """
+
+    # Compressed bytes gathered before an IDAT chunk is written
+    IDAT_SIZE = 1 << 16
+
+    def __init__(
+        self,
+        fileobj,
+        width: int,
+        height: int,
+        channels: int,
+        compress_level: int = 6,
+        filter_type: int = None,
+    ):
+        """
+        :param fileobj: Binary file object receiving the PNG file.
+        :param width: Image width.
+        :param height: Image height.
+        :param channels: 3 (RGB) or 4 (RGBA).
+        :param compress_level: zlib level, from 0 (stored, fastest) to 9 (smallest).
+        :param filter_type: PNG filter type (0-4) used for every row, or None to
+                            pick the best one row by row.
+        """
+        if width < 1 or height < 1:
+            raise ValueError("PNG: Invalid image size")
+        if channels not in (3, 4):
+            raise ValueError("PNG: The number of channels is invalid")
+        if filter_type not in (None, 0, 1, 2, 3, 4):
+            raise ValueError(f"PNG: Invalid filter type {filter_type}")
+
+        self._file = fileobj
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self._filter_type = filter_type
+        self._compressor = zlib.compressobj(compress_level)
+        self._compressed = bytearray()
+        self._prior = np.zeros(width * channels, dtype=np.uint8)
+        self._rows_left = height
+
+        fileobj.write(PNG_SIGNATURE)
+        color_type = 2 if channels == 3 else 6
+        self._write_chunk(
+            b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)
+        )
+
+    def write_rows(self, rows):
+        """
+        Filter, compress and write the next rows.
+
+        :param rows: Bytes-like object, NumPy array or list of ints holding whole rows.
+        """
+        stride = self.width * self.channels
+        lines = _as_flat_uint8(rows).reshape(-1, stride)
+        if len(lines) > self._rows_left:
+            raise ValueError("PNG: More rows than the image height")
+        if not len(lines):
+            return
+        self._rows_left -= len(lines)
+
+        priors = np.concatenate((self._prior[None], lines[:-1]))
+        filtered = _filter(lines, priors, self.channels, self._filter_type)
+        self._prior = lines[-1].copy()
+
+        self._compressed += self._compressor.compress(filtered)
+        if len(self._compressed) >= self.IDAT_SIZE:
+            self._write_chunk(b"IDAT", self._compressed)
+            self._compressed = bytearray()
+
+    def close(self):
+        """Write the remaining image data and the end of the file."""
+        if self._rows_left:
+            raise ValueError("PNG: Fewer rows than the image height")
+        self._compressed += self._compressor.flush()
+        self._write_chunk(b"IDAT", self._compressed)
+        self._compressed = bytearray()
+        self._write_chunk(b"IEND", b"")
+
+    def _write_chunk(self, chunk_type: bytes, data: bytes):
+        self._file.write(struct.pack(">I", len(data)) + chunk_type)
+        self._file.write(data)
+        self._file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(chunk_type))))
+
+
+def _filter(
+    lines: np.ndarray, priors: np.ndarray, bpp: int, filter_type: int = None
+) -> bytes:
+    """
+    Filter scanlines.
+
+    :param lines: (rows, stride) uint8 array of unfiltered scanlines.
+    :param priors: (rows, stride) uint8 array of the scanlines above them.
+    :param bpp: Bytes per complete pixel.
+    :param filter_type: Filter type for every row, or None to pick the filter
+                        with the smallest sum of absolute (signed) bytes per row.
+    :return: bytes of the filtered scanlines, each preceded by its filter type.
+    """
+    x = lines.astype(np.int16)
+    b = priors.astype(np.int16)
+    a = np.zeros_like(x)
+    a[:, bpp:] = x[:, :-bpp]
+    c = np.zeros_like(b)
+    c[:, bpp:] = b[:, :-bpp]
+
+    def paeth():
+        pa = np.abs(b - c)
+        pb = np.abs(a - c)
+        pc = np.abs(a + b - 2 * c)
+        return np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+
+    predictors = {
+        0: lambda: 0,
+        1: lambda: a,
+        2: lambda: b,
+        3: lambda: (a + b) >> 1,
+        4: paeth,
+    }
+
+    if filter_type is not None:
+        types = np.full(len(x), filter_type, dtype=np.uint8)
+        filtered = (x - predictors[filter_type]()).astype(np.uint8)
+    else:
+        candidates = np.stack(
+            [(x - predictors[t]()).astype(np.uint8) for t in range(5)]
+        )
+        # Bytes read as signed: small differences of either sign score low
+        scores = np.abs(candidates.view(np.int8).astype(np.int32)).sum(axis=2)
+        types = scores.argmin(axis=0).astype(np.uint8)
+        filtered = candidates[types, np.arange(len(x))]
+
+    return np.concatenate((types[:, None], filtered), axis=1).tobytes()
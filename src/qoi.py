@@ -1,4 +1,7 @@
 import struct
+from array import array
+
+from .kernels import ALPHA_MASK, SHIFTS, packed_pixels
 
 class QOI:
     # QOI Constants
@@ -42,87 +45,99 @@ class QOI:
         out.extend(struct.pack(">IIBB", width, height, channels, colorspace))
 
         # State Variables
-        index = [[0, 0, 0, 0]] * 64 # Color lookup table (zero initialized)
-        px_prev = (0, 0, 0, 255)    # r, g, b, a (defaults to opaque black)
+        # Pixels are packed into 32-bit integers (see kernels.SHIFTS), so that
+        # run and index checks are single integer compares
+        r_shift, g_shift, b_shift, a_shift = SHIFTS
+        index = array('I', bytes(256))  # Color lookup table (zero initialized)
+        px_prev = 255 << a_shift        # Opaque black
+        r_prev, g_prev, b_prev = 0, 0, 0
         run = 0
         total_pixels = width * height
-        
-        # Iterate over pixels
-        # We step through the raw_bytes based on channel count
-        for i in range(0, len(raw_bytes), channels):
-            # Extract current pixel components
-            r = raw_bytes[i]
-            g = raw_bytes[i+1]
-            b = raw_bytes[i+2]
-            a = raw_bytes[i+3] if channels == 4 else 255
-            px_curr = (r, g, b, a)
 
+        if channels == 4:
+            # Read the RGBA bytes in place, one native-endian integer per pixel
+            pixels = packed_pixels(raw_bytes)
+        else:
+            # Interleave an opaque alpha with strided copies (run at C speed)
+            rgba = bytearray(b'\xff') * (total_pixels * 4)
+            rgba[0::4] = raw_bytes[0::3]
+            rgba[1::4] = raw_bytes[1::3]
+            rgba[2::4] = raw_bytes[2::3]
+            pixels = packed_pixels(rgba)
+
+        for px_curr in pixels:
             # Check for Run match
             if px_curr == px_prev:
                 run += 1
-                if run == 62 or (i + channels) == len(raw_bytes):
+                if run == 62:
                     # Write QOI_OP_RUN
                     out.append(cls.QOI_OP_RUN | (run - 1))
                     run = 0
                 continue
-            
+
             # If we had a run that ended, write it now
             if run > 0:
                 out.append(cls.QOI_OP_RUN | (run - 1))
                 run = 0
 
+            # Extract current pixel components
+            r = (px_curr >> r_shift) & 0xFF
+            g = (px_curr >> g_shift) & 0xFF
+            b = (px_curr >> b_shift) & 0xFF
+            a = (px_curr >> a_shift) & 0xFF
+
             # Check Index
             idx_pos = cls._hash(r, g, b, a)
-            if index[idx_pos] == list(px_curr):
+            if index[idx_pos] == px_curr:
                 out.append(cls.QOI_OP_INDEX | idx_pos)
-                px_prev = px_curr
-                continue
-
-            # Save current pixel to index
-            index[idx_pos] = list(px_curr)
-
-            # Check Diff (RGB only, alpha must match prev)
-            if a == px_prev[3]:
-                vr = (r - px_prev[0]) & 0xFF
-                vg = (g - px_prev[1]) & 0xFF
-                vb = (b - px_prev[2]) & 0xFF
-
-                # Convert to signed 8-bit for comparison
-                d_r = (vr - 256) if vr > 127 else vr
-                d_g = (vg - 256) if vg > 127 else vg
-                d_b = (vb - 256) if vb > 127 else vb
-
-                # QOI_OP_DIFF (2-bit diffs)
-                if -2 <= d_r <= 1 and -2 <= d_g <= 1 and -2 <= d_b <= 1:
-                    out.append(
-                        cls.QOI_OP_DIFF | 
-                        ((d_r + 2) << 4) | 
-                        ((d_g + 2) << 2) | 
-                        (d_b + 2)
-                    )
-                    px_prev = px_curr
-                    continue
-
-                # QOI_OP_LUMA (Green diff, and dr-dg, db-dg)
-                dr_dg = (d_r - d_g)
-                db_dg = (d_b - d_g)
-                if -32 <= d_g <= 31 and -8 <= dr_dg <= 7 and -8 <= db_dg <= 7:
-                    out.append(cls.QOI_OP_LUMA | (d_g + 32))
-                    out.append(((dr_dg + 8) << 4) | (db_dg + 8))
-                    px_prev = px_curr
-                    continue
-
-            # Fallback: QOI_OP_RGB or QOI_OP_RGBA
-            if a == px_prev[3]:
-                # RGB
-                out.append(cls.QOI_OP_RGB)
-                out.extend((r, g, b))
             else:
-                # RGBA
-                out.append(cls.QOI_OP_RGBA)
-                out.extend((r, g, b, a))
+                # Save current pixel to index
+                index[idx_pos] = px_curr
+
+                # Check Diff (RGB only, alpha must match prev)
+                if not (px_curr ^ px_prev) & ALPHA_MASK:
+                    vr = (r - r_prev) & 0xFF
+                    vg = (g - g_prev) & 0xFF
+                    vb = (b - b_prev) & 0xFF
+
+                    # Convert to signed 8-bit for comparison
+                    d_r = (vr - 256) if vr > 127 else vr
+                    d_g = (vg - 256) if vg > 127 else vg
+                    d_b = (vb - 256) if vb > 127 else vb
+
+                    dr_dg = (d_r - d_g)
+                    db_dg = (d_b - d_g)
+
+                    # QOI_OP_DIFF (2-bit diffs)
+                    if -2 <= d_r <= 1 and -2 <= d_g <= 1 and -2 <= d_b <= 1:
+                        out.append(
+                            cls.QOI_OP_DIFF | 
+                            ((d_r + 2) << 4) | 
+                            ((d_g + 2) << 2) | 
+                            (d_b + 2)
+                        )
+
+                    # QOI_OP_LUMA (Green diff, and dr-dg, db-dg)
+                    elif -32 <= d_g <= 31 and -8 <= dr_dg <= 7 and -8 <= db_dg <= 7:
+                        out.append(cls.QOI_OP_LUMA | (d_g + 32))
+                        out.append(((dr_dg + 8) << 4) | (db_dg + 8))
+
+                    # Fallback: QOI_OP_RGB
+                    else:
+                        out.append(cls.QOI_OP_RGB)
+                        out.extend((r, g, b))
+
+                # Fallback: QOI_OP_RGBA
+                else:
+                    out.append(cls.QOI_OP_RGBA)
+                    out.extend((r, g, b, a))
 
             px_prev = px_curr
+            r_prev, g_prev, b_prev = r, g, b
+
+        # A run still open at the last pixel
+        if run > 0:
+            out.append(cls.QOI_OP_RUN | (run - 1))
 
         # End Marker (7 bytes 0x00, 1 byte 0x01)
         out.extend(b'\x00' * 7 + b'\x01')
@@ -152,7 +167,12 @@ class QOI:
         data_len = len(qoi_data) - 8 # Ignore end marker for loop safety
         pixel_pos = 0
 
-        while pixel_pos < len(pixel_data) and p < data_len:
+        # Decoded pixels are staged here and written to pixel_data a row at a time
+        row = bytearray()
+        row_left = width
+        pixels_left = total_pixels
+
+        while pixels_left and p < data_len:
             byte1 = qoi_data[p]
             p += 1
 
@@ -183,29 +203,40 @@ class QOI:
 
             elif (byte1 & cls.QOI_MASK_2) == cls.QOI_OP_RUN:
                 run = (byte1 & 0x3F)
-                # Emit the current pixel run+1 times
-                # We do this logic slightly differently for decode
-                # to handle the loop cleanly
-                for _ in range(run + 1):
-                    pixel_data[pixel_pos]   = r
-                    pixel_data[pixel_pos+1] = g
-                    pixel_data[pixel_pos+2] = b
-                    if channels == 4:
-                        pixel_data[pixel_pos+3] = a
-                    pixel_pos += channels
-                continue # Skip the single append at the bottom
+                # Flush the staged pixels, then emit the current pixel run+1
+                # times with a single slice assignment (clipped to the image)
+                if row:
+                    pixel_data[pixel_pos:pixel_pos+len(row)] = row
+                    pixel_pos += len(row)
+                    row.clear()
+                count = min(run + 1, pixels_left)
+                pixel_data[pixel_pos:pixel_pos+count*channels] = bytes((r, g, b, a)[:channels]) * count
+                pixel_pos += count * channels
+                pixels_left -= count
+                # Staging resumes where the run ends, possibly mid-row
+                row_left = width - (total_pixels - pixels_left) % width
+                continue # Skip the staging at the bottom
 
             # Update Index
             idx_pos = cls._hash(r, g, b, a)
             index[idx_pos] = [r, g, b, a]
 
-            # Append Pixel
-            pixel_data[pixel_pos]   = r
-            pixel_data[pixel_pos+1] = g
-            pixel_data[pixel_pos+2] = b
+            # Stage Pixel
+            row.append(r)
+            row.append(g)
+            row.append(b)
             if channels == 4:
-                pixel_data[pixel_pos+3] = a
-            pixel_pos += channels
+                row.append(a)
+            pixels_left -= 1
+            row_left -= 1
+            if not row_left:
+                pixel_data[pixel_pos:pixel_pos+len(row)] = row
+                pixel_pos += len(row)
+                row.clear()
+                row_left = width
+
+        # Remaining staged pixels (data ended before the last row)
+        pixel_data[pixel_pos:pixel_pos+len(row)] = row
 
         return {
             'width': width,
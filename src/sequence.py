@@ -0,0 +1,258 @@
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from .decoder import QOIDecoder
+from .encoder import QOIEncoder, _as_flat_uint8
+
+# Layout of a sequence (Big Endian):
+#
+# - magic "qoiq" (4), version (1), width (4), height (4), channels (1),
+#   colorspace (1), keyframe interval (4)
+# - the frames, each a standard QOI file: keyframes hold the pixels, delta
+#   frames the per-byte difference with the previous frame, modulo 256
+# - the frame index: per frame its offset (8), length (8) and kind (1)
+# - frame index offset (8), frame count (4), magic "qoiq" (4)
+SEQUENCE_MAGIC = b"qoiq"
+SEQUENCE_VERSION = 1
+SEQUENCE_HEADER = struct.Struct(">4sBIIBBI")
+SEQUENCE_FRAME = struct.Struct(">QQB")
+SEQUENCE_TRAILER = struct.Struct(">QI4s")
+
+# Frame kinds stored in the index
+KEYFRAME = 0
+DELTA_FRAME = 1
+
+
+class QOISequenceWriter:
+    """
+    Writer of a sequence of same-sized frames, such as bursts or time-lapses.
+
+    Frames between keyframes are stored as the QOI encoding of their difference
+    with the previous frame: static regions become zeros, which QOI stores as
+    QOI_OP_RUN chunks of up to 62 pixels per byte. A keyframe is written every
+    `keyframe_interval` frames (or on request, e.g. at scene cuts), so seeking
+    never decodes more than an interval of frames.
+    """
+
+    DEFAULT_KEYFRAME_INTERVAL = 30
+
+    def __init__(self, file, description: dict, keyframe_interval: int = None):
+        """
+        :param file: Path or binary file object to write the sequence to.
+        :param description: Dictionary containing 'width', 'height', 'channels', 'colorspace'.
+        :param keyframe_interval: Number of frames from one keyframe to the next.
+        """
+        width, height, channels, colorspace = QOIEncoder._check_description(description)
+        self.description = {
+            "width": width,
+            "height": height,
+            "channels": channels,
+            "colorspace": colorspace,
+        }
+        self.keyframe_interval = keyframe_interval or self.DEFAULT_KEYFRAME_INTERVAL
+        if self.keyframe_interval < 1:
+            raise ValueError("QOI.encode: Invalid keyframe interval")
+
+        if isinstance(file, (str, os.PathLike)):
+            self._file = open(file, "wb")
+            self._owned = True
+        else:
+            self._file = file
+            self._owned = False
+
+        self._frames = []
+        self._previous = None
+        self._file.write(
+            SEQUENCE_HEADER.pack(
+                SEQUENCE_MAGIC,
+                SEQUENCE_VERSION,
+                width,
+                height,
+                channels,
+                colorspace,
+                self.keyframe_interval,
+            )
+        )
+        self._offset = SEQUENCE_HEADER.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._owned:
+            self._file.close()
+
+    def add_frame(self, color_data, keyframe: bool = None) -> int:
+        """
+        Encode the next frame.
+
+        :param color_data: Bytes-like object, NumPy array or list of ints containing pixel data.
+        :param keyframe: Force (True) or prevent (False) a keyframe. If None, every
+                         `keyframe_interval`-th frame is a keyframe. The first frame
+                         always is.
+        :return: Number of bytes written for the frame.
+        """
+        if self._frames is None:
+            raise ValueError("QOI.encode: The sequence is closed")
+        d = self.description
+        flat = _as_flat_uint8(color_data)
+        if flat.size != d["width"] * d["height"] * d["channels"]:
+            raise ValueError("QOI.encode: The length of colorData is incorrect")
+
+        if keyframe is None:
+            keyframe = len(self._frames) % self.keyframe_interval == 0
+        if keyframe or self._previous is None:
+            kind, pixels = KEYFRAME, flat
+        else:
+            kind, pixels = DELTA_FRAME, flat - self._previous
+
+        length = QOIEncoder.encode_to_file(pixels, d, self._file)
+        self._frames.append((self._offset, length, kind))
+        self._offset += length
+        self._previous = flat.copy()
+        return length
+
+    def close(self):
+        """Write the frame index and trailer, then close owned files."""
+        if self._frames is None:
+            return
+
+        index = bytearray()
+        for frame in self._frames:
+            index.extend(SEQUENCE_FRAME.pack(*frame))
+        self._file.write(index)
+        self._file.write(
+            SEQUENCE_TRAILER.pack(self._offset, len(self._frames), SEQUENCE_MAGIC)
+        )
+        self._frames = None
+        self._previous = None
+        if self._owned:
+            self._file.close()
+
+
+class QOISequenceReader:
+    """
+    Memory-mapped reader of a sequence written by `QOISequenceWriter`.
+
+    A frame is rebuilt from the nearest keyframe at or before it, adding the
+    delta frames that follow. The last frame decoded is kept, so reading the
+    frames in order decodes every stream once.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: Path of the sequence file.
+        """
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < SEQUENCE_HEADER.size + SEQUENCE_TRAILER.size:
+                raise ValueError("QOI.decode: File too short for a sequence")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (
+            magic,
+            version,
+            width,
+            height,
+            channels,
+            colorspace,
+            self.keyframe_interval,
+        ) = SEQUENCE_HEADER.unpack_from(self._map, 0)
+        index_offset, count, end_magic = SEQUENCE_TRAILER.unpack_from(
+            self._map, len(self._map) - SEQUENCE_TRAILER.size
+        )
+        if magic != SEQUENCE_MAGIC or end_magic != SEQUENCE_MAGIC:
+            raise ValueError("QOI.decode: The signature of the sequence is invalid")
+        if version != SEQUENCE_VERSION:
+            raise ValueError("QOI.decode: Unsupported sequence version")
+        if index_offset + count * SEQUENCE_FRAME.size != size - SEQUENCE_TRAILER.size:
+            raise ValueError("QOI.decode: The sequence frame index is truncated")
+
+        self.description = {
+            "width": width,
+            "height": height,
+            "channels": channels,
+            "colorspace": colorspace,
+        }
+        self._frames = [
+            SEQUENCE_FRAME.unpack_from(
+                self._map, index_offset + i * SEQUENCE_FRAME.size
+            )
+            for i in range(count)
+        ]
+        if any(offset + length > index_offset for offset, length, _ in self._frames):
+            raise ValueError("QOI.decode: Incomplete sequence data")
+
+        # Last frame rebuilt, and its position
+        self._pixels = np.zeros(width * height * channels, dtype=np.uint8)
+        self._delta = np.empty_like(self._pixels)
+        self._position = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def __iter__(self):
+        return self.iter_frames()
+
+    def close(self):
+        """Unmap the sequence."""
+        self._map.close()
+
+    def keyframe_before(self, n: int) -> int:
+        """Position of the nearest keyframe at or before frame n."""
+        for i in range(n, -1, -1):
+            if self._frames[i][2] == KEYFRAME:
+                return i
+        raise ValueError(f"QOI.decode: No keyframe at or before frame {n}")
+
+    def frame(self, n: int) -> dict:
+        """
+        Decode frame n.
+
+        :param n: Position of the frame, negative values counting from the end.
+        :return: Dictionary containing width, height, colorspace, channels, and data (bytes).
+        """
+        if n < 0:
+            n += len(self._frames)
+        if not (0 <= n < len(self._frames)):
+            raise IndexError("frame index out of range")
+
+        start = self.keyframe_before(n)
+        if self._position is not None and start <= self._position <= n:
+            # Continue from the frame decoded last
+            start = self._position + 1
+        self._position = None
+        for i in range(start, n + 1):
+            self._decode(i)
+        self._position = n
+
+        return dict(self.description, data=self._pixels.tobytes())
+
+    def iter_frames(self, start: int = 0, stop: int = None):
+        """
+        Decode frames [start, stop) in order.
+
+        :return: Generator of dictionaries, as returned by `frame`.
+        """
+        stop = len(self._frames) if stop is None else min(stop, len(self._frames))
+        for n in range(start, stop):
+            yield self.frame(n)
+
+    def _decode(self, i: int):
+        offset, length, kind = self._frames[i]
+        if kind == KEYFRAME:
+            QOIDecoder.decode_into(self._map, self._pixels, offset, length)
+        else:
+            QOIDecoder.decode_into(self._map, self._delta, offset, length)
+            np.add(self._pixels, self._delta, out=self._pixels)
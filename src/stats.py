@@ -0,0 +1,114 @@
+import time
+
+import numpy as np
+
+from .decoder import parse_header, scan_chunks
+
+OPCODES = ("INDEX", "DIFF", "LUMA", "RUN", "RGB", "RGBA")
+
+
+class QOIStats:
+    """
+    Opcode statistics collected by passing `stats=` to the encoders and decoders.
+
+    The codecs only time their phases and hand the finished QOI stream to
+    `record`, which classifies its chunks in one vectorized pass, so the hot
+    loops are untouched and nothing is spent when no stats object is given.
+    One object may accumulate over many images.
+    """
+
+    def __init__(self):
+        self.images = 0
+        self.pixels = 0
+        # Opcode name -> number of chunks / bytes spent on them
+        self.counts = dict.fromkeys(OPCODES, 0)
+        self.bytes = dict.fromkeys(OPCODES, 0)
+        # Number of QOI_OP_RUN chunks for each run length (1..62)
+        self.run_lengths = np.zeros(63, dtype=np.int64)
+        # Phase name -> seconds
+        self.times = {}
+
+    def add_time(self, phase: str, seconds: float):
+        """Accumulate the time spent in one phase of a codec."""
+        self.times[phase] = self.times.get(phase, 0.0) + seconds
+
+    def record(self, file_data, byte_offset: int = 0, byte_length: int = None):
+        """
+        Add the chunks of an encoded QOI file to the statistics.
+
+        :param file_data: Bytes-like object containing the QOI file.
+        :param byte_offset: Offset to the start of the QOI file in file_data.
+        :param byte_length: Length of the QOI file in bytes.
+        """
+        started = time.perf_counter()
+        if byte_length is None:
+            byte_length = len(file_data) - byte_offset
+        data = np.frombuffer(file_data, dtype=np.uint8)[
+            byte_offset : byte_offset + byte_length
+        ]
+        width, height, _, _, _ = parse_header(data[:14].tobytes())
+        total_pixels = width * height
+
+        # The 8-byte end marker would otherwise parse as QOI_OP_INDEX chunks
+        offsets = scan_chunks(data, 14, max(len(data) - 8, 14))
+        tags = data[offsets]
+        is_run = (tags >= 0xC0) & (tags < 0xFE)
+        produced = np.cumsum(np.where(is_run, (tags & 0x3F) + 1, 1))
+        if len(produced) and produced[-1] > total_pixels:
+            last = int(np.searchsorted(produced, total_pixels))
+            tags = tags[: last + 1]
+            is_run = is_run[: last + 1]
+
+        kinds = np.where(tags >= 0xFE, tags - 0xFE + 4, tags >> 6)
+        counts = np.bincount(kinds, minlength=6)
+        for kind, name in enumerate(OPCODES):
+            self.counts[name] += int(counts[kind])
+            self.bytes[name] += int(counts[kind]) * (1, 1, 2, 1, 4, 5)[kind]
+        self.run_lengths += np.bincount((tags[is_run] & 0x3F) + 1, minlength=63)
+
+        self.images += 1
+        self.pixels += total_pixels
+        self.add_time("stats", time.perf_counter() - started)
+
+    @property
+    def index_hit_rate(self) -> float:
+        """Share of the pixels not covered by runs that were found in the color index."""
+        lookups = sum(self.counts.values()) - self.counts["RUN"]
+        return self.counts["INDEX"] / lookups if lookups else 0.0
+
+    def as_dict(self) -> dict:
+        """Statistics as plain Python types, e.g. to dump as JSON."""
+        return {
+            "images": self.images,
+            "pixels": self.pixels,
+            "counts": dict(self.counts),
+            "bytes": dict(self.bytes),
+            "run_lengths": {
+                length: int(count)
+                for length, count in enumerate(self.run_lengths)
+                if count
+            },
+            "index_hit_rate": self.index_hit_rate,
+            "times": dict(self.times),
+        }
+
+    def __str__(self) -> str:
+        total_chunks = sum(self.counts.values()) or 1
+        total_bytes = sum(self.bytes.values()) or 1
+        lines = [f"{self.images} image(s), {self.pixels} pixels"]
+        for name in OPCODES:
+            lines.append(
+                f"  {name:<6} {self.counts[name]:>10} chunks"
+                f" ({self.counts[name] / total_chunks:6.1%})"
+                f" {self.bytes[name]:>12} bytes ({self.bytes[name] / total_bytes:6.1%})"
+            )
+        runs = self.run_lengths.sum()
+        if runs:
+            mean = (self.run_lengths * np.arange(63)).sum() / runs
+            lines.append(
+                f"  runs: mean length {mean:.1f}, {self.run_lengths[62]} at the maximum (62)"
+            )
+        lines.append(f"  index hit rate: {self.index_hit_rate:.1%}")
+        for phase, seconds in self.times.items():
+            lines.append(f"  {phase}: {seconds * 1000:.1f} ms")
+        return "\n".join(lines)
@@ -0,0 +1,234 @@
+import struct
+
+import numpy as np
+
+from . import encoder
+from .decoder import (
+    VectorDecoderState,
+    decode_window,
+    decode_window_chunks,
+    parse_header,
+)
+from .encoder import (
+    QOI_END_MARKER,
+    QOIEncoder,
+    VectorEncoderState,
+    _as_flat_uint8,
+    _to_rgba,
+    encode_block,
+    finish_block_state,
+)
+
+
+class QOIStreamEncoder:
+    """
+    Incremental QOI encoder that takes pixel data piece by piece.
+
+    Run, previous-pixel and index state are carried across calls, so rows,
+    strips or arbitrary byte slices (even ones that split a pixel) can be fed
+    as they become available and the encoded bytes written out immediately.
+
+        stream = QOIStreamEncoder(description)
+        for row in rows:
+            out.write(stream.feed(row))
+        out.write(stream.finish())
+    """
+
+    def __init__(self, description: dict):
+        """
+        :param description: Dictionary containing 'width', 'height', 'channels', 'colorspace'.
+        """
+        width, height, channels, colorspace = QOIEncoder._check_description(description)
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.colorspace = colorspace
+
+        self._header = b"qoif" + struct.pack(
+            ">IIBB", width, height, channels, colorspace
+        )
+        self._state = VectorEncoderState()
+        self._pixels_left = width * height
+        # Bytes of a pixel split across two calls to `feed`
+        self._partial = np.empty(0, dtype=np.uint8)
+        self._finished = False
+
+    def feed(self, color_data) -> bytes:
+        """
+        Encode the next piece of pixel data.
+
+        :param color_data: Bytes-like object, NumPy array or list of ints continuing the pixel data.
+        :return: bytes ready to be written (the header is included in the first result).
+        """
+        if self._finished:
+            raise ValueError("QOI.encode: The stream is already finished")
+
+        flat = _as_flat_uint8(color_data)
+        result = bytearray(self._header)
+        self._header = b""
+
+        # Complete a pixel left over from the previous call
+        if len(self._partial):
+            need = self.channels - len(self._partial)
+            head = np.concatenate((self._partial, flat[:need]))
+            flat = flat[need:]
+            if len(head) < self.channels:
+                self._partial = head
+                return bytes(result)
+            self._encode_pixels(head, result)
+
+        usable = len(flat) - len(flat) % self.channels
+        self._partial = flat[usable:].copy()
+
+        step = encoder.VECTOR_BLOCK_PIXELS * self.channels
+        for start in range(0, usable, step):
+            self._encode_pixels(flat[start : min(start + step, usable)], result)
+
+        return bytes(result)
+
+    def finish(self) -> bytes:
+        """
+        Close the stream.
+
+        :return: bytes that end the file: a pending run and the end marker.
+        """
+        if self._finished:
+            raise ValueError("QOI.encode: The stream is already finished")
+
+        if self._pixels_left or len(self._partial):
+            raise ValueError("QOI.encode: The length of colorData is incorrect")
+
+        result = bytearray(self._header)
+        self._header = b""
+        result.extend(finish_block_state(self._state))
+        result.extend(QOI_END_MARKER)
+        self._finished = True
+        return bytes(result)
+
+    def iter_encode(self, pieces):
+        """
+        Encode an iterable of pixel data pieces.
+
+        :param pieces: Iterable of bytes-like objects, NumPy arrays or lists of ints.
+        :return: Generator yielding the encoded file chunk by chunk.
+        """
+        for piece in pieces:
+            chunk = self.feed(piece)
+            if chunk:
+                yield chunk
+        yield self.finish()
+
+    def _encode_pixels(self, flat: np.ndarray, result: bytearray):
+        count = len(flat) // self.channels
+        if count > self._pixels_left:
+            raise ValueError("QOI.encode: The length of colorData is incorrect")
+        self._pixels_left -= count
+        result.extend(encode_block(_to_rgba(flat, self.channels), self._state))
+
+
+class QOIStreamDecoder:
+    """
+    Row-by-row QOI decoder reading from a binary file object.
+
+    The file is read in fixed-size blocks. Chunks that straddle two blocks are
+    kept back and decoded once the next block has been read, so memory use
+    depends on the block size and not on the image size.
+
+        with open("image.qoi", "rb") as f:
+            stream = QOIStreamDecoder(f)
+            for row in stream:
+                ...
+    """
+
+    # Number of bytes read from the file object at a time
+    BLOCK_SIZE = 1 << 16
+    # Number of pixels (about) expanded from runs at a time
+    EXPAND_PIXELS = 1 << 16
+
+    def __init__(self, fileobj, output_channels: int = None, block_size: int = None):
+        """
+        :param fileobj: Binary file object positioned at the start of the QOI file.
+        :param output_channels: Number of channels of the decoded rows (3 or 4).
+                                If None, uses the channels defined in the file header.
+        :param block_size: Number of bytes read at a time.
+        """
+        self._file = fileobj
+        self._block_size = block_size or self.BLOCK_SIZE
+
+        header = fileobj.read(14)
+        (
+            self.width,
+            self.height,
+            self.channels,
+            self.colorspace,
+            self.output_channels,
+        ) = parse_header(header, output_channels)
+
+    def __iter__(self):
+        return self.iter_rows()
+
+    def iter_rows(self, batch_rows: int = 1, as_memoryview: bool = False):
+        """
+        Decode the image and yield it in batches of rows.
+
+        :param batch_rows: Number of rows per batch (the last batch may be shorter).
+        :param as_memoryview: Yield memoryviews instead of NumPy arrays.
+        :return: Generator of (rows, width, output_channels) uint8 arrays or
+                 memoryviews over them.
+        """
+        width = self.width
+        batch_pixels = max(batch_rows, 1) * width
+        expand_pixels = max(batch_pixels, self.EXPAND_PIXELS)
+        pixels_left = self.width * self.height
+        if pixels_left == 0:
+            return
+
+        state = VectorDecoderState()
+        buffer = b""
+        staged = np.empty((0, self.output_channels), dtype=np.uint8)
+        at_eof = False
+
+        while pixels_left:
+            block = b"" if at_eof else self._file.read(self._block_size)
+            at_eof = not block
+            buffer += block
+
+            data = np.frombuffer(buffer, dtype=np.uint8)
+            read_pos, chunks = decode_window_chunks(
+                data, 0, len(data), pixels_left, state
+            )
+            if chunks is None:
+                if at_eof:
+                    raise ValueError("QOI.decode: Incomplete image")
+                continue
+
+            # Keep the bytes of a chunk that continues in the next block
+            buffer = buffer[read_pos:]
+
+            # Expand runs a slice of chunks at a time, so that flat images never
+            # hold much more than a batch of pixels
+            _, _, counts, values = chunks
+            produced = np.cumsum(counts)
+            cuts = np.searchsorted(
+                produced, np.arange(expand_pixels, int(produced[-1]), expand_pixels)
+            )
+            for first, last in zip([0, *cuts.tolist()], [*cuts.tolist(), len(counts)]):
+                pixels = np.repeat(
+                    values[first:last, : self.output_channels],
+                    counts[first:last],
+                    axis=0,
+                )
+                pixels_left -= len(pixels)
+
+                staged = np.concatenate((staged, pixels))
+                full = (
+                    len(staged)
+                    if not pixels_left
+                    else len(staged) // batch_pixels * batch_pixels
+                )
+                for start in range(0, full, batch_pixels):
+                    rows = staged[start : start + batch_pixels].reshape(
+                        -1, width, self.output_channels
+                    )
+                    yield memoryview(rows) if as_memoryview else rows
+                staged = staged[full:]
@@ -0,0 +1,323 @@
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from .decoder import QOIDecoder, parse_header
+from .encoder import QOIEncoder, _as_flat_uint8
+
+
+class QOIStrips:
+    """
+    Container splitting an image into horizontal strips of standard QOI streams.
+
+    Every strip is an independent QOI file (with its own header, covering
+    `strip_height` rows), so strips can be encoded and decoded on separate
+    processes. Layout (Big Endian):
+
+    - magic "qois" (4), width (4), height (4), channels (1), colorspace (1)
+    - strip height (4), strip count (4)
+    - strip count + 1 offsets (8 each): start of every strip and end of the last
+    - the strips themselves
+    """
+
+    MAGIC = b"qois"
+    HEADER = struct.Struct(">4sIIBBII")
+    DEFAULT_STRIP_HEIGHT = 256
+
+    @staticmethod
+    def encode(
+        color_data,
+        description: dict,
+        strip_height: int = None,
+        workers: int = None,
+    ) -> bytes:
+        """
+        Encode an image into a strip container.
+
+        :param color_data: Bytes-like object, NumPy array or list of ints containing pixel data.
+        :param description: Dictionary containing 'width', 'height', 'channels', 'colorspace'.
+        :param strip_height: Number of rows per strip.
+        :param workers: Number of worker processes. None uses all CPUs, 1 encodes in-process.
+        :return: bytes object containing the container.
+        """
+        width, height, channels, colorspace = QOIEncoder._check_description(description)
+        strip_height = strip_height or QOIStrips.DEFAULT_STRIP_HEIGHT
+        if strip_height < 1:
+            raise ValueError("QOI.encode: Invalid strip height")
+
+        flat = _as_flat_uint8(color_data)
+        if flat.size != width * height * channels:
+            raise ValueError("QOI.encode: The length of colorData is incorrect")
+
+        row_bytes = width * channels
+        strips = [
+            (top * row_bytes, min(top + strip_height, height) - top)
+            for top in range(0, height, strip_height)
+        ]
+
+        if _worker_count(workers, len(strips)) == 1:
+            encoded = [
+                QOIEncoder.encode_vectorized(
+                    flat[offset : offset + rows * row_bytes],
+                    _strip_description(width, rows, channels, colorspace),
+                )
+                for offset, rows in strips
+            ]
+        else:
+            # Workers read their rows from shared memory instead of a pickled copy
+            shared = SharedMemory(create=True, size=max(flat.size, 1))
+            try:
+                shared.buf[: flat.size] = flat
+                with ProcessPoolExecutor(_worker_count(workers, len(strips))) as pool:
+                    encoded = list(
+                        pool.map(
+                            _encode_strip,
+                            [shared.name] * len(strips),
+                            [offset for offset, _ in strips],
+                            [rows for _, rows in strips],
+                            [(width, channels, colorspace)] * len(strips),
+                        )
+                    )
+            finally:
+                shared.close()
+                shared.unlink()
+
+        return QOIStrips._pack(
+            width, height, channels, colorspace, strip_height, encoded
+        )
+
+    @staticmethod
+    def decode(file_data, output_channels: int = None, workers: int = None) -> dict:
+        """
+        Decode a strip container.
+
+        :param file_data: Bytes-like object containing the container.
+        :param output_channels: Number of channels to include in the decoded array (3 or 4).
+                                If None, uses the channels defined in the container header.
+        :param workers: Number of worker processes. None uses all CPUs, 1 decodes in-process.
+        :return: Dictionary containing width, height, colorspace, channels, and data (bytes).
+        """
+        view = memoryview(file_data)
+        width, height, channels, colorspace, strip_height, offsets = (
+            QOIStrips.read_header(view)
+        )
+        if output_channels is None:
+            output_channels = channels
+        if not (3 <= output_channels <= 4):
+            raise ValueError(
+                "QOI.decode: The number of channels for the output is invalid"
+            )
+
+        row_bytes = width * output_channels
+        size = height * row_bytes
+        # (strip start, strip length, output offset) of every strip
+        strips = [
+            (start, stop - start, i * strip_height * row_bytes)
+            for i, (start, stop) in enumerate(zip(offsets, offsets[1:]))
+        ]
+        QOIStrips._check_strips(
+            view, width, height, channels, colorspace, strip_height, strips
+        )
+
+        if _worker_count(workers, len(strips)) == 1:
+            result = bytearray(size)
+            for start, length, out_offset in strips:
+                QOIDecoder.decode_into(
+                    view,
+                    memoryview(result)[out_offset:],
+                    start,
+                    length,
+                    output_channels,
+                )
+            result = bytes(result)
+        else:
+            # Workers read their strips from one shared copy of the container
+            # and decode straight into one shared output buffer
+            shared_in = SharedMemory(create=True, size=max(len(view), 1))
+            shared = SharedMemory(create=True, size=max(size, 1))
+            try:
+                shared_in.buf[: len(view)] = view
+                with ProcessPoolExecutor(_worker_count(workers, len(strips))) as pool:
+                    list(
+                        pool.map(
+                            _decode_strip,
+                            [shared_in.name] * len(strips),
+                            [shared.name] * len(strips),
+                            strips,
+                            [output_channels] * len(strips),
+                        )
+                    )
+                result = bytes(shared.buf[:size])
+            finally:
+                for block in (shared_in, shared):
+                    block.close()
+                    block.unlink()
+
+        return {
+            "width": width,
+            "height": height,
+            "colorspace": colorspace,
+            "channels": output_channels,
+            "data": result,
+        }
+
+    @staticmethod
+    def read_header(file_data) -> tuple:
+        """
+        Parse the container header and strip offset table.
+
+        :param file_data: Bytes-like object containing the container.
+        :return: (width, height, channels, colorspace, strip_height, offsets) tuple.
+        """
+        view = memoryview(file_data)
+        if len(view) < QOIStrips.HEADER.size:
+            raise ValueError("QOI.decode: File too short for header")
+
+        magic, width, height, channels, colorspace, strip_height, count = (
+            QOIStrips.HEADER.unpack(view[: QOIStrips.HEADER.size])
+        )
+        if magic != QOIStrips.MAGIC:
+            raise ValueError("QOI.decode: The signature of the strip file is invalid")
+
+        table_end = QOIStrips.HEADER.size + 8 * (count + 1)
+        if len(view) < table_end:
+            raise ValueError("QOI.decode: File too short for the strip table")
+        offsets = list(
+            struct.unpack(f">{count + 1}Q", view[QOIStrips.HEADER.size : table_end])
+        )
+        if offsets[0] < table_end or any(
+            stop < start for start, stop in zip(offsets, offsets[1:])
+        ):
+            raise ValueError("QOI.decode: The strip offsets are invalid")
+        if offsets[-1] > len(view):
+            raise ValueError("QOI.decode: Incomplete strip data")
+
+        return width, height, channels, colorspace, strip_height, offsets
+
+    @staticmethod
+    def from_qoi(file_data, strip_height: int = None, workers: int = None) -> bytes:
+        """
+        Losslessly convert a plain .qoi file into a strip container.
+
+        :param file_data: Bytes-like object containing the QOI file.
+        :param strip_height: Number of rows per strip.
+        :param workers: Number of worker processes.
+        :return: bytes object containing the container.
+        """
+        decoded = QOIDecoder.decode_vectorized(file_data)
+        return QOIStrips.encode(decoded["data"], decoded, strip_height, workers)
+
+    @staticmethod
+    def to_qoi(file_data, workers: int = None) -> bytes:
+        """
+        Losslessly convert a strip container into a plain single-stream .qoi file.
+
+        :param file_data: Bytes-like object containing the container.
+        :param workers: Number of worker processes.
+        :return: bytes object containing the QOI file.
+        """
+        decoded = QOIStrips.decode(file_data, workers=workers)
+        return QOIEncoder.encode_vectorized(decoded["data"], decoded)
+
+    @staticmethod
+    def _check_strips(view, width, height, channels, colorspace, strip_height, strips):
+        """
+        Check that every strip is a QOI stream of the container's format covering
+        its own rows, so that a malformed strip can never write into the rows of
+        its neighbours.
+        """
+        if strip_height < 1 or len(strips) != -(-height // strip_height):
+            raise ValueError("QOI.decode: The strip count does not match the image")
+        for i, (start, length, _) in enumerate(strips):
+            rows = min(strip_height, height - i * strip_height)
+            strip_width, strip_rows, strip_channels, strip_colorspace, _ = parse_header(
+                bytes(view[start : start + min(length, 14)])
+            )
+            if (strip_width, strip_rows, strip_channels, strip_colorspace) != (
+                width,
+                rows,
+                channels,
+                colorspace,
+            ):
+                raise ValueError(
+                    f"QOI.decode: The header of strip {i} does not match the container"
+                )
+
+    @staticmethod
+    def _pack(width, height, channels, colorspace, strip_height, encoded) -> bytes:
+        table_size = 8 * (len(encoded) + 1)
+        offsets = [QOIStrips.HEADER.size + table_size]
+        for strip in encoded:
+            offsets.append(offsets[-1] + len(strip))
+
+        result = bytearray(
+            QOIStrips.HEADER.pack(
+                QOIStrips.MAGIC,
+                width,
+                height,
+                channels,
+                colorspace,
+                strip_height,
+                len(encoded),
+            )
+        )
+        result.extend(struct.pack(f">{len(offsets)}Q", *offsets))
+        for strip in encoded:
+            result.extend(strip)
+        return bytes(result)
+
+
+def _strip_description(width, rows, channels, colorspace) -> dict:
+    return {
+        "width": width,
+        "height": rows,
+        "channels": channels,
+        "colorspace": colorspace,
+    }
+
+
+def _worker_count(workers, strip_count) -> int:
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return max(1, min(workers, strip_count))
+
+
+def _encode_strip(shared_name, offset, rows, image) -> bytes:
+    """Worker: encode `rows` rows starting at byte `offset` of the shared pixels."""
+    width, channels, colorspace = image
+    shared = SharedMemory(name=shared_name, track=False)
+    try:
+        pixels = np.frombuffer(
+            shared.buf, dtype=np.uint8, count=rows * width * channels, offset=offset
+        )
+        encoded = QOIEncoder.encode_vectorized(
+            pixels, _strip_description(width, rows, channels, colorspace)
+        )
+        del pixels
+        return encoded
+    finally:
+        shared.close()
+
+
+def _decode_strip(input_name, output_name, strip, output_channels):
+    """Worker: decode one strip of the shared container into the shared output."""
+    start, length, out_offset = strip
+    shared_in = SharedMemory(name=input_name, track=False)
+    shared = SharedMemory(name=output_name, track=False)
+    source = target = None
+    try:
+        source = shared_in.buf[start : start + length]
+        width, rows, _, _, output_channels = parse_header(
+            bytes(source[:14]), output_channels
+        )
+        target = shared.buf[out_offset : out_offset + width * rows * output_channels]
+        QOIDecoder.decode_into(source, target, output_channels=output_channels)
+    finally:
+        for view in (source, target):
+            if view is not None:
+                view.release()
+        shared_in.close()
+        shared.close()
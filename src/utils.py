@@ -1,22 +1,58 @@
+import hashlib
+import json
+import os
+
 import numpy as np
 from PIL import Image
 
+from .cache import ConversionCache
+
+RAW_EXTENSIONS = ("dng", "cr2", "nef", "arw", "raw")
+
+
+def load_image(
+    filepath: str,
+    half_size: bool = False,
+    raw_cache_dir: str = None,
+    raw_cache_bytes: int = None,
+    **postprocess,
+) -> tuple[np.ndarray, dict]:
+    """
+    Load an image and return pixel data as numpy array + description.
 
-def load_image(filepath: str) -> tuple[np.ndarray, dict]:
-    """Load an image and return pixel data as numpy array + description."""
+    The array is C-contiguous and writable, and can be handed to the encoders as
+    is. RAW pixels read from the cache are a copy-on-write memory map: writes
+    stay private to the array and never reach the cache file.
+
+    :param filepath: Path of the image.
+    :param half_size: RAW only: demosaic at half resolution, which is much faster.
+    :param raw_cache_dir: RAW only: directory caching the postprocessed pixels as
+                          .npy files, returned memory-mapped on later calls.
+    :param raw_cache_bytes: RAW only: byte budget of the cache directory, least recently
+                            used files being evicted beyond it (1 GiB by default).
+    :param postprocess: RAW only: other rawpy postprocess options, e.g.
+                        demosaic_algorithm=rawpy.DemosaicAlgorithm.LINEAR.
+    """
 
     ext = filepath.lower().split(".")[-1]
 
-    if ext in ("dng", "cr2", "nef", "arw", "raw"):
-        # RAW formats - requires rawpy
-        import rawpy
+    if ext in RAW_EXTENSIONS:
+        rgb = _load_raw(
+            filepath,
+            dict(postprocess, half_size=half_size),
+            raw_cache_dir,
+            raw_cache_bytes,
+        )
+        height, width, channels = rgb.shape
+        return rgb, {
+            "width": width,
+            "height": height,
+            "channels": channels,
+            "colorspace": 0,
+        }
 
-        with rawpy.imread(filepath) as raw:
-            rgb = raw.postprocess()
-        img = Image.fromarray(rgb)
-    else:
-        # Standard formats (PNG, JPEG, etc.)
-        img = Image.open(filepath)
+    # Standard formats (PNG, JPEG, etc.)
+    img = Image.open(filepath)
 
     # Convert to RGB or RGBA
     if img.mode == "RGBA":
@@ -31,3 +67,44 @@ def load_image(filepath: str) -> tuple[np.ndarray, dict]:
         "channels": channels,
         "colorspace": 0,
     }
+
+
+def _load_raw(
+    filepath: str, params: dict, cache_dir: str = None, cache_bytes: int = None
+) -> np.ndarray:
+    """Develop a RAW file with rawpy, going through the .npy cache when enabled."""
+    if cache_dir is not None:
+        cache_path = os.path.join(cache_dir, _raw_cache_key(filepath, params) + ".npy")
+        try:
+            # The modification time of a cached file is its last use, as in
+            # ConversionCache, whose eviction keeps the directory in budget
+            os.utime(cache_path)
+            return np.load(cache_path, mmap_mode="c")
+        except FileNotFoundError:
+            pass
+
+    # RAW formats - requires rawpy
+    import rawpy
+
+    with rawpy.imread(filepath) as raw:
+        rgb = np.ascontiguousarray(raw.postprocess(**params))
+
+    if cache_dir is not None:
+        # Written under a temporary name, so concurrent loaders never map a partial file
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, rgb)
+        os.replace(tmp_path, cache_path)
+        ConversionCache(cache_dir, cache_bytes).evict()
+
+    return rgb
+
+
+def _raw_cache_key(filepath: str, params: dict) -> str:
+    """Identify a RAW development by file identity (path, size, mtime) and options."""
+    stat = os.stat(filepath)
+    identity = [os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns, params]
+    return hashlib.sha256(
+        json.dumps(identity, sort_keys=True, default=str).encode()
+    ).hexdigest()
@@ -1,7 +1,36 @@
+import asyncio
+import io
+import json
+import os
+import zlib
+
 import numpy as np
+import pytest
+from PIL import Image
 
+import benchmark
+import converter
 import qoi as OfficialQOI
-from src import QOIDecoder, QOIEncoder, load_image
+import server
+import src
+from src import (
+    ConversionCache,
+    PNGReader,
+    PNGWriter,
+    QOICompressed,
+    QOIDecoder,
+    QOIEncoder,
+    QOIPackReader,
+    QOIPackWriter,
+    QOIRowIndex,
+    QOISequenceReader,
+    QOISequenceWriter,
+    QOIStats,
+    QOIStreamDecoder,
+    QOIStreamEncoder,
+    QOIStrips,
+    load_image,
+)
 
 INPUT_IMAGE = "fruits.png"
 INPUT_IMAGE = "test.dng"
@@ -23,3 +52,696 @@ def test_qoi():
         desc["height"], desc["width"], desc["channels"]
     )
     assert np.array_equal(decoded, our_decoded_array), "Decoded data mismatch!"
+
+
+def _synthetic_images():
+    """Small images covering runs, index hits, diffs, lumas and alpha changes."""
+    rng = np.random.default_rng(0)
+    for channels in (3, 4):
+        yield rng.integers(0, 256, (17, 23, channels), dtype=np.uint8)
+        yield rng.integers(0, 3, (31, 29, channels), dtype=np.uint8)
+        yield np.zeros((9, 150, channels), dtype=np.uint8)
+        steps = rng.integers(-3, 4, (19, 40, channels))
+        yield np.cumsum(steps, axis=1).astype(np.uint8)
+    # Alpha that flips between index hits
+    image = rng.integers(0, 3, (21, 30, 4), dtype=np.uint8)
+    image[..., 3] = rng.integers(0, 2, (21, 30)) * 255
+    yield image
+
+
+def _description(image):
+    """QOI description of an (height, width, channels) image array."""
+    height, width, channels = image.shape
+    return {"width": width, "height": height, "channels": channels, "colorspace": 0}
+
+
+def test_encode_vectorized(monkeypatch):
+    """The NumPy encoder must match the C extension, also across block boundaries."""
+    pixel_data, desc = load_image("fruits.png")
+    assert QOIEncoder.encode_vectorized(pixel_data, desc) == OfficialQOI.encode(
+        pixel_data
+    )
+
+    monkeypatch.setattr("src.encoder.VECTOR_BLOCK_PIXELS", 7)
+    for image in _synthetic_images():
+        desc = _description(image)
+        assert QOIEncoder.encode_vectorized(image, desc) == OfficialQOI.encode(image)
+
+
+def test_decode_vectorized(monkeypatch):
+    """The two-pass decoder must match the C extension, also across windows."""
+    pixel_data, desc = load_image("fruits.png")
+    decoded = QOIDecoder.decode_vectorized(OfficialQOI.encode(pixel_data))
+    assert decoded["data"] == pixel_data.tobytes()
+
+    monkeypatch.setattr("src.decoder.DECODE_WINDOW_BYTES", 37)
+    monkeypatch.setattr("src.decoder.SCAN_BLOCK_BYTES", 5)
+    for image in _synthetic_images():
+        encoded = OfficialQOI.encode(image)
+        for output_channels in (3, 4):
+            assert QOIDecoder.decode_vectorized(
+                encoded, output_channels=output_channels
+            ) == QOIDecoder.decode(encoded, output_channels=output_channels)
+
+    # An index chunk reading an initial (0, 0, 0, 0) slot other than slot 0:
+    # the pixel following it hashes like its value, not like the slot
+    header = b"qoif\x00\x00\x00\x03\x00\x00\x00\x01\x04\x00"
+    encoded = header + b"\xff\x40\x00\x00\x00\x05\x00" + b"\x00" * 7 + b"\x01"
+    expected = OfficialQOI.decode(encoded).tobytes()
+    assert QOIDecoder.decode_vectorized(encoded)["data"] == expected
+    assert b"".join(map(bytes, QOIStreamDecoder(io.BytesIO(encoded)))) == expected
+
+
+def test_stream_encoder():
+    """Feeding rows or slices that split pixels must give the same file."""
+    for image in _synthetic_images():
+        desc = _description(image)
+        expected = OfficialQOI.encode(image)
+
+        stream = QOIStreamEncoder(desc)
+        assert b"".join(stream.iter_encode(image)) == expected
+
+        raw = image.tobytes()
+        stream = QOIStreamEncoder(desc)
+        pieces = [raw[i : i + 5] for i in range(0, len(raw), 5)]
+        assert b"".join(stream.iter_encode(pieces)) == expected
+
+
+def test_stream_decoder():
+    """Rows decoded from small blocks must match a whole-file decode."""
+    for image in _synthetic_images():
+        height, width, channels = image.shape
+        encoded = OfficialQOI.encode(image)
+
+        stream = QOIStreamDecoder(io.BytesIO(encoded), block_size=3)
+        rows = list(stream)
+        assert len(rows) == height
+        assert np.array_equal(np.concatenate(rows), image)
+
+        stream = QOIStreamDecoder(io.BytesIO(encoded), output_channels=4)
+        batches = list(stream.iter_rows(batch_rows=4, as_memoryview=True))
+        decoded = QOIDecoder.decode(encoded, output_channels=4)["data"]
+        assert b"".join(bytes(batch) for batch in batches) == decoded
+
+
+def test_decode_into(tmp_path):
+    """Decoding from a memory map straight into a NumPy array."""
+    pixel_data, desc = load_image("fruits.png")
+    path = tmp_path / "fruits.qoi"
+    path.write_bytes(OfficialQOI.encode(pixel_data))
+
+    out = np.zeros_like(pixel_data)
+    decoded = QOIDecoder.decode_file(str(path), out)
+    assert decoded["data"] is out
+    assert np.array_equal(out, pixel_data)
+
+    out = np.zeros(pixel_data.size + 7, dtype=np.uint8)
+    encoded = memoryview(b"xx" + path.read_bytes())
+    QOIDecoder.decode_into(encoded, out, byte_offset=2)
+    assert out[: pixel_data.size].tobytes() == pixel_data.tobytes()
+
+
+def test_encode_into(tmp_path):
+    """Preallocated and file-backed encoding give the same bytes as encode."""
+    pixel_data, desc = load_image("fruits.png")
+    expected = OfficialQOI.encode(pixel_data)
+
+    out = bytearray(QOIEncoder.max_size(desc))
+    written = QOIEncoder.encode_into(pixel_data, desc, out)
+    assert out[:written] == expected
+
+    path = tmp_path / "fruits.qoi"
+    assert QOIEncoder.encode_to_file(pixel_data, desc, str(path)) == len(expected)
+    assert path.read_bytes() == expected
+
+
+def test_strips():
+    """Strip containers round-trip, in-process and across worker processes."""
+    pixel_data, desc = load_image("fruits.png")
+    encoded = OfficialQOI.encode(pixel_data)
+
+    for workers in (1, 2):
+        container = QOIStrips.encode(
+            pixel_data, desc, strip_height=100, workers=workers
+        )
+        decoded = QOIStrips.decode(container, workers=workers)
+        assert decoded["data"] == pixel_data.tobytes()
+
+    assert QOIStrips.to_qoi(QOIStrips.from_qoi(encoded, strip_height=64)) == encoded
+
+    # Malformed containers: a strip declaring more rows than it covers (it would
+    # overwrite the next strip), of another colorspace, or offsets out of order
+    container = bytes(QOIStrips.encode(pixel_data, desc, 100, workers=1))
+    table = QOIStrips.HEADER.size
+    first = QOIStrips.read_header(container)[-1][0]
+    edits = {
+        "oversized strip": (first + 8, (101).to_bytes(4, "big")),
+        "colorspace": (first + 13, b"\x01"),
+        "offset in the header": (table, bytes(8)),
+        "offsets out of order": (table + 8, (first - 1).to_bytes(8, "big")),
+        "offset past the end": (table + 8, (len(container) + 1).to_bytes(8, "big")),
+    }
+    for name, (position, value) in edits.items():
+        broken = bytearray(container)
+        broken[position : position + len(value)] = value
+        for workers in (1, 2):
+            with pytest.raises(ValueError, match="QOI.decode"):
+                QOIStrips.decode(broken, workers=workers)
+
+
+def test_row_index(monkeypatch):
+    """Row ranges decoded from checkpoints match the full decode."""
+    monkeypatch.setattr("src.checkpoint.DECODE_WINDOW_BYTES", 64)
+    for image in _synthetic_images():
+        height, width, channels = image.shape
+        encoded = OfficialQOI.encode(image)
+        row_index = QOIRowIndex.from_bytes(
+            QOIRowIndex.build(encoded, every_rows=4).to_bytes()
+        )
+        for start, stop in ((0, height), (5, 6), (height // 2, height), (7, 7)):
+            decoded = row_index.decode_rows(encoded, start, stop)
+            assert decoded["height"] == stop - start
+            assert decoded["data"] == image[start:stop].tobytes()
+
+
+def test_batch_convert(tmp_path, monkeypatch):
+    """Batch conversion converts once, then skips up-to-date outputs."""
+    (tmp_path / "in" / "sub").mkdir(parents=True)
+    for name in ("a.png", "sub/b.png"):
+        Image.open("fruits.png").save(tmp_path / "in" / name)
+    out = str(tmp_path / "out")
+
+    assert converter.batch_convert([str(tmp_path / "in")], out, workers=1) == (2, 0, 0)
+    decoded = QOIDecoder.decode_file(os.path.join(out, "sub", "b.qoi"))
+    assert decoded["data"] == Image.open("fruits.png").tobytes()
+
+    # An output older than its input is still skipped when the manifest matches
+    os.utime(os.path.join(out, "a.qoi"), ns=(0, 0))
+    assert converter.batch_convert([str(tmp_path / "in")], out, workers=1) == (0, 2, 0)
+
+    # In place, the outputs of a run are not converted back by the next one
+    monkeypatch.chdir(tmp_path / "in")
+    originals = {name: Image.open(name).info for name in ("a.png", "sub/b.png")}
+    for expected in ((2, 0, 0), (0, 2, 0)):
+        assert converter.batch_convert(["."], workers=1) == expected
+    assert {name: Image.open(name).info for name in originals} == originals
+
+    # Neither of a PNG and a QOI file of the same name may overwrite the other
+    os.replace("a.qoi", "c.qoi")
+    Image.open("a.png").save("c.png")
+    assert converter.batch_convert(["."], workers=1) == (1, 1, 2)
+    assert os.path.exists("a.qoi") and Image.open("c.png").info == originals["a.png"]
+
+
+def _repeat_source(source, target):
+    """Conversion writing its source nine times."""
+    with open(source, "rb") as src, open(target, "wb") as f:
+        f.write(src.read() * 9)
+
+
+def test_conversion_cache(tmp_path):
+    """The same source under another name is a hit; eviction drops the oldest entry."""
+    cache = ConversionCache(tmp_path / "cache", max_bytes=1500)
+    calls = []
+
+    def convert(source, target):
+        calls.append(source)
+        with open(target, "wb") as f:
+            f.write(b"x" * 1000)
+
+    for name, content in (("a", b"1"), ("b", b"1"), ("c", b"2")):
+        (tmp_path / name).write_bytes(content)
+    assert not cache.convert(str(tmp_path / "a"), str(tmp_path / "a.out"), convert)
+    assert cache.convert(str(tmp_path / "b"), str(tmp_path / "b.out"), convert)
+    assert (tmp_path / "b.out").read_bytes() == b"x" * 1000
+    assert len(calls) == 1
+
+    os.utime(cache.path(cache.key(str(tmp_path / "a"))), ns=(0, 0))
+    assert not cache.convert(str(tmp_path / "c"), str(tmp_path / "c.out"), convert)
+    assert cache.evict() == 1000
+    assert not os.path.exists(cache.path(cache.key(str(tmp_path / "a"))))
+
+    # Converting another source to an output linked from a hit (even twice, the
+    # output then sharing its inode with the entry) leaves the entry intact
+    cache = ConversionCache(tmp_path / "cache2")
+    for name in ("a", "a", "c", "a"):
+        cache.convert(str(tmp_path / name), str(tmp_path / "out"), _repeat_source)
+        assert (tmp_path / "out").read_bytes() == (tmp_path / name).read_bytes() * 9
+
+
+def test_benchmark_compare():
+    """The benchmark corpus is reproducible and compare flags slowdowns only."""
+    corpus = benchmark.make_corpus(sizes=(16,), kinds=["noise", "alpha"])
+    assert all(
+        (a[2] == b[2]).all()
+        for a, b in zip(
+            corpus, benchmark.make_corpus(sizes=(16,), kinds=["noise", "alpha"])
+        )
+    )
+
+    baseline = benchmark.run_benchmarks(corpus, ["numpy"], repeat=1, log=None)
+    assert all(result["roundtrip_ok"] for result in baseline)
+    current = [dict(result, encode_mps=result["encode_mps"] / 2) for result in baseline]
+    regressed = {
+        row[2] for row in benchmark.compare_results(baseline, current) if row[-1]
+    }
+    assert regressed == {"encode_mps"}
+
+
+def test_stats():
+    """Opcode statistics account for every byte and pixel, encoding or decoding."""
+    for image in _synthetic_images():
+        height, width = image.shape[:2]
+        description = _description(image)
+        encode_stats, decode_stats = QOIStats(), QOIStats()
+        encoded = QOIEncoder.encode(image.tobytes(), description, stats=encode_stats)
+        QOIDecoder.decode_vectorized(encoded, stats=decode_stats)
+
+        assert encode_stats.as_dict()["counts"] == decode_stats.as_dict()["counts"]
+        assert sum(encode_stats.bytes.values()) == len(encoded) - 22
+        runs = encode_stats.run_lengths
+        assert (
+            sum(encode_stats.counts.values())
+            - encode_stats.counts["RUN"]
+            + (runs * np.arange(len(runs))).sum()
+            == width * height
+        )
+        assert {"setup", "pixels", "stats"} <= set(encode_stats.times)
+
+
+def test_backends(monkeypatch):
+    """Every backend passes the self-check and can be picked per call or by environment."""
+    pixel_data, desc = load_image("fruits.png")
+    encoded = OfficialQOI.encode(pixel_data)
+    backends = src.available_backends()
+    assert {"python", "numpy", "c"} <= set(backends)
+
+    for name in backends:
+        assert src.encode(pixel_data, desc, backend=name) == encoded
+        assert src.decode(encoded, backend=name)["data"] == pixel_data.tobytes()
+
+    monkeypatch.setenv("QOI_BACKEND", "numpy")
+    assert src.backends.get_backend().name == "numpy"
+    monkeypatch.setenv("QOI_BACKEND", "python")
+    assert src.encode(pixel_data, desc) == encoded
+
+    monkeypatch.setattr(src.backends, "BACKENDS", dict(src.backends.BACKENDS))
+    src.register_backend("broken", lambda data, desc: b"", lambda data, oc: {}, 99)
+    assert "broken" not in src.available_backends()
+
+
+def test_load_image_raw_cache(tmp_path, monkeypatch):
+    """Developed RAW pixels are cached per postprocess options and memory-mapped."""
+    import rawpy
+
+    calls = []
+
+    class FakeRaw:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def postprocess(self, **params):
+            calls.append(params)
+            size = 8 if params["half_size"] else 16
+            return np.arange(size * size * 3, dtype=np.uint8).reshape(size, size, 3)
+
+    monkeypatch.setattr(rawpy, "imread", lambda path: FakeRaw())
+    raw_path = str(tmp_path / "image.dng")
+    open(raw_path, "wb").close()
+    cache_dir = str(tmp_path / "raw-cache")
+
+    first, desc = load_image(raw_path, raw_cache_dir=cache_dir)
+    again, _ = load_image(raw_path, raw_cache_dir=cache_dir)
+    half, half_desc = load_image(raw_path, half_size=True, raw_cache_dir=cache_dir)
+
+    assert len(calls) == 2
+    assert isinstance(again, np.memmap) and (again == first).all()
+    assert (desc["width"], half_desc["width"]) == (16, 8)
+
+    # Writable like uncached results, without touching the cache file
+    again += 1
+    assert (load_image(raw_path, raw_cache_dir=cache_dir)[0] == first).all()
+    pixels, _ = load_image("fruits.png")
+    pixels[0, 0] = 0
+
+    # Beyond the byte budget, the least recently used files are evicted
+    cache_dir = str(tmp_path / "small-cache")
+    for half_size in (False, True, True, False):
+        load_image(raw_path, half_size, cache_dir, raw_cache_bytes=1000)
+    assert len(calls) == 5 and len(os.listdir(cache_dir)) == 1
+
+
+def test_pillow_plugin(tmp_path, monkeypatch):
+    """Pillow opens QOI header-only, decodes lazily in blocks and saves QOI."""
+    monkeypatch.setattr("PIL.ImageFile.MAXBLOCK", 1000)
+    for image in _synthetic_images():
+        path = tmp_path / "image.qoi"
+        path.write_bytes(OfficialQOI.encode(image))
+
+        with Image.open(path) as img:
+            assert isinstance(img, src.QOIImageFile)
+            assert img.size == image.shape[1::-1] and img.tile
+            assert img.tobytes() == image.tobytes()
+
+        Image.fromarray(image).save(tmp_path / "saved.qoi")
+        assert (tmp_path / "saved.qoi").read_bytes() == path.read_bytes()
+
+
+def test_conversion_service():
+    """The service converts both ways, enforces size limits and reports metrics."""
+    with open("fruits.png", "rb") as f:
+        png = f.read()
+
+    async def scenario():
+        service = server.ConversionService(workers=1, max_body_bytes=1 << 20)
+        host, port = await service.start("127.0.0.1", 0)
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            status, qoi_data = await server.request(
+                reader, writer, "POST", "/png-to-qoi", png
+            )
+            assert status == 200
+            status, png_data = await server.request(
+                reader, writer, "POST", "/qoi-to-png", qoi_data
+            )
+            assert status == 200
+            assert Image.open(io.BytesIO(png_data)).tobytes() == (
+                Image.open("fruits.png").tobytes()
+            )
+            status, _ = await server.request(
+                reader, writer, "POST", "/qoi-to-png", b"x"
+            )
+            assert status == 422
+            # An unused body is skipped, not parsed as the next request
+            smuggled = b"GET /nope HTTP/1.1\r\n\r\n"
+            status, metrics = await server.request(
+                reader, writer, "GET", "/metrics", smuggled
+            )
+            status, again = await server.request(reader, writer, "GET", "/metrics")
+            assert status == 200 and json.loads(again)["counters"]["200"] == 3
+            writer.close()
+
+            # Too large: rejected without reading the body, on every route
+            for path in ("/png-to-qoi", "/nope"):
+                reader, writer = await asyncio.open_connection(host, port)
+                status, _ = await server.request(
+                    reader, writer, "POST", path, bytes((1 << 20) + 1)
+                )
+                assert status == 413
+                writer.close()
+
+            for length in (b"-1", b"12x", "\u00b2".encode("latin-1")):
+                reader, writer = await asyncio.open_connection(host, port)
+                writer.write(
+                    b"POST /png-to-qoi HTTP/1.1\r\nContent-Length: %s\r\n\r\n" % length
+                )
+                head = await reader.readuntil(b"\r\n\r\n")
+                assert head.startswith(b"HTTP/1.1 400") and b"close" in head
+                writer.close()
+
+            # Oversized and truncated request heads are answered, then closed
+            for request, status in (
+                (b"GET /metrics HTTP/1.1\r\nX: " + b"a" * 70000, b"431"),
+                (b"GET /metrics HTTP/1.1\r\nHost", b"400"),
+            ):
+                reader, writer = await asyncio.open_connection(host, port)
+                writer.write(request)
+                writer.write_eof()
+                head = await reader.readuntil(b"\r\n\r\n")
+                assert head.startswith(b"HTTP/1.1 " + status) and b"close" in head
+                writer.close()
+            return json.loads(metrics)
+        finally:
+            await service.close()
+
+    metrics = asyncio.run(scenario())
+    assert metrics["counters"] == {"200": 2, "422": 1}
+    assert metrics["queue_depth"] == 0 and metrics["latency_ms"]["count"] == 2
+
+
+def test_kernels():
+    """The generated pure Python loops match the reference codec for every channel mix."""
+    for image in _synthetic_images():
+        desc = _description(image)
+        encoded = QOIEncoder.encode(image.tobytes(), desc)
+        assert encoded == OfficialQOI.encode(image)
+        # NumPy input: uint8 items must not wrap in the DIFF/LUMA arithmetic
+        for array in (image.reshape(-1), image):
+            assert QOIEncoder.encode(array, desc) == encoded
+        for output_channels in (3, 4):
+            decoded = QOIDecoder.decode(encoded, output_channels=output_channels)
+            expected = OfficialQOI.decode(encoded, channels=output_channels)
+            assert decoded["data"] == expected.tobytes()
+
+    assert src.kernels.encode_kernel(3) is src.kernels.encode_kernel(3)
+    assert src.kernels.decode_kernel(4) is not src.kernels.decode_kernel(3)
+
+
+def test_decode_runs():
+    """Runs crossing row ends, and data ending early, decode like pixel by pixel."""
+    image = np.zeros((40, 7, 4), dtype=np.uint8)
+    image[5:9, 3:] = (10, 20, 30, 255)
+    image[20] = np.arange(28, dtype=np.uint8).reshape(7, 4)
+    image[31:, :, 3] = 128
+    # Literal pixels following a run that ends mid-row
+    image[24:26].reshape(-1, 4)[3:] = np.arange(44, dtype=np.uint8).reshape(11, 4)
+    encoded = OfficialQOI.encode(image)
+    assert bytes(src.QOI.decode(encoded)["data"]) == image.tobytes()
+    for output_channels in (3, 4):
+        decoded = QOIDecoder.decode(encoded, output_channels=output_channels)
+        expected = OfficialQOI.decode(encoded, channels=output_channels)
+        assert decoded["data"] == expected.tobytes()
+
+    # Staged pixels are written a row at a time, never across a row end
+    class Result(bytearray):
+        def __setitem__(self, key, value):
+            if isinstance(value, bytearray):
+                rows.add((key.start // 28, (key.stop - 1) // 28))
+            super().__setitem__(key, value)
+
+    rows = set()
+    result = Result(image.size)
+    src.kernels.decode_kernel(4)(memoryview(encoded), 14, 280, 7, result)
+    assert result == image.tobytes() and all(top == end for top, end in rows)
+
+    # Past the end of the data, the last decoded pixel is repeated
+    first_chunk = encoded[:15]  # QOI_OP_INDEX of (0, 0, 0, 0)
+    assert QOIDecoder.decode(first_chunk)["data"] == bytes(image.size)
+
+
+def test_qoi_class_encode():
+    """The QOI class encodes packed pixels from bytes and from lists of ints."""
+    for image in _synthetic_images():
+        height, width, channels = image.shape
+        expected = OfficialQOI.encode(image)
+        for raw in (image.tobytes(), list(image.tobytes())):
+            assert src.QOI.encode(raw, width, height, channels) == expected
+
+
+def test_png_reader(tmp_path):
+    """Streamed PNG rows match Pillow for every color type the converter handles."""
+    source = Image.open("fruits.png")
+    palette = source.convert("P")
+    palette.info["transparency"] = 3
+    images = [source.convert(mode) for mode in ("RGB", "RGBA", "L", "LA")]
+    for img in images + [source.convert("P"), palette]:
+        path = tmp_path / f"{img.mode}.png"
+        img.save(path)
+        expected = Image.open(path)
+        has_alpha = "A" in expected.getbands() or "transparency" in expected.info
+        expected = expected.convert("RGBA" if has_alpha else "RGB")
+
+        with open(path, "rb") as f:
+            reader = PNGReader(f, block_size=1000)
+            rows = np.concatenate(list(reader.iter_rows(batch_rows=7)))
+        assert rows.tobytes() == expected.tobytes()
+
+    # Large and highly compressible: a few IDAT bytes expand into many rows,
+    # inflated in small steps to the very end of the data
+    flat = np.zeros((1500, 1200, 3), dtype=np.uint8)
+    flat[::250] = 200
+    Image.fromarray(flat).save(tmp_path / "flat.png")
+    with open(tmp_path / "flat.png", "rb") as f:
+        rows = np.concatenate(list(PNGReader(f, block_size=16).iter_rows(64)))
+    assert rows.tobytes() == flat.tobytes()
+
+    # Adam7 passes are not scanlines: interlaced files are rejected up front
+    data = bytearray((tmp_path / "RGB.png").read_bytes())
+    data[28] = 1  # IHDR interlace method
+    data[29:33] = zlib.crc32(data[12:29]).to_bytes(4, "big")
+    with pytest.raises(ValueError, match="PNG: Interlaced"):
+        PNGReader(io.BytesIO(data))
+
+    converter.png_to_qoi("fruits.png", tmp_path / "a.qoi", verbose=False)
+    converter.png_to_qoi("fruits.png", tmp_path / "b.qoi", False, streaming=True)
+    assert (tmp_path / "a.qoi").read_bytes() == (tmp_path / "b.qoi").read_bytes()
+
+
+def test_png_writer(tmp_path):
+    """Rows streamed from a QOI file come back from the PNG with every filter choice."""
+    pixel_data, desc = load_image("fruits.png")
+    rgba = np.dstack([pixel_data, pixel_data[..., 1]])
+    height, width = rgba.shape[:2]
+
+    for filter_type in (None, 0, 1, 2, 3, 4):
+        buffer = io.BytesIO()
+        writer = PNGWriter(buffer, width, height, 4, 1, filter_type)
+        for start in range(0, height, 100):
+            writer.write_rows(rgba[start : start + 100])
+        writer.close()
+
+        assert np.array_equal(np.asarray(Image.open(buffer)), rgba)
+        buffer.seek(0)
+        rows = np.concatenate(list(PNGReader(buffer).iter_rows(batch_rows=50)))
+        assert np.array_equal(rows, rgba)
+
+    converter.png_to_qoi("fruits.png", tmp_path / "a.qoi", verbose=False)
+    converter.qoi_to_png(tmp_path / "a.qoi", tmp_path / "a.png", False, streaming=True)
+    assert np.array_equal(np.asarray(Image.open(tmp_path / "a.png")), pixel_data)
+
+
+def test_pack(tmp_path):
+    """Images of a pack are looked up by name and decoded one at a time."""
+    path = tmp_path / "sprites.qoip"
+    images = {
+        f"sprite_{i:02}.qoi": image for i, image in enumerate(_synthetic_images())
+    }
+
+    with QOIPackWriter(str(path)) as writer:
+        for name in sorted(images, reverse=True):
+            image = images[name]
+            if image.shape[2] == 3:
+                writer.add(name, OfficialQOI.encode(image))
+            else:
+                writer.add_image(name, image, _description(image))
+
+    with QOIPackReader(str(path)) as reader:
+        assert reader.names() == sorted(images) and len(reader) == len(images)
+        assert "missing.qoi" not in reader
+        # Names sorting before, between and after the stored ones
+        for missing in ("", "missing.qoi", "sprite_05", "sprite_99.qoi"):
+            for lookup in (reader.info, reader.read, reader.decode):
+                with pytest.raises(KeyError):
+                    lookup(missing)
+        for name, image in images.items():
+            assert reader.info(name)["width"] == image.shape[1]
+            assert bytes(reader.read(name)) == OfficialQOI.encode(image)
+            assert reader.decode(name)["data"] == image.tobytes()
+
+
+def test_probe_validate(tmp_path, monkeypatch, capsys):
+    """Headers are probed and chunk streams validated without decoding pixels."""
+    monkeypatch.setattr("src.decoder.DECODE_WINDOW_BYTES", 64)
+    for i, image in enumerate(_synthetic_images()):
+        encoded = OfficialQOI.encode(image)
+        (tmp_path / f"{i}.qoi").write_bytes(encoded)
+
+        described = QOIDecoder.validate(encoded)
+        assert described == dict(_description(image), chunks=described["chunks"])
+        with open(tmp_path / f"{i}.qoi", "rb") as f:
+            assert QOIDecoder.probe(f) == QOIDecoder.probe(encoded)
+
+    header = b"qoif\x00\x00\x00\x01\x00\x00\x00\x02\x04\x00"
+    marker = b"\x00" * 7 + b"\x01"
+    # A chunk cut short by the end marker is not a run past the last pixel
+    broken = {
+        "truncated": (header + b"\x00\xfe\x01\x02" + marker, "Truncated chunk"),
+        "overrun": (header + b"\xc2" + marker, "exceed the image size"),
+        "underrun": (header + b"\xc0" + marker, "Incomplete image"),
+        "unterminated": (header + b"\xc1", "end marker is missing"),
+    }
+    for name, (data, message) in broken.items():
+        with pytest.raises(ValueError, match=message):
+            QOIDecoder.validate(data)
+        (tmp_path / f"{name}.qoi").write_bytes(data)
+
+    assert QOIDecoder.validate(header + b"\xc1" + marker)["chunks"] == 1
+    assert converter.check_files([str(tmp_path)], full=True, workers=1) == (13, 4)
+    assert converter.main(["--probe", "-j", "1", str(tmp_path / "0.qoi")]) == 0
+    assert capsys.readouterr().out.split("\t")[1:] == ["23", "17", "3", "0\n"]
+
+
+def test_compressed():
+    """Compressed files round-trip through every method, decoded block by block."""
+    for image in _synthetic_images():
+        encoded = OfficialQOI.encode(image)
+        for method in ("zlib", "bz2", "lzma"):
+            container = QOICompressed.encode(image, _description(image), method)
+            assert QOICompressed.read_header(container)[::2] == (method, len(encoded))
+            assert QOICompressed.decompress(container) == encoded
+            decoded = QOICompressed.decode(io.BytesIO(container), block_size=37)
+            assert decoded["data"] == image.tobytes()
+
+    container = QOICompressed.compress(encoded, "zlib", 1)
+    header_size = QOICompressed.HEADER.size
+    wrong_length = bytearray(container)
+    wrong_length[header_size - 1] += 1
+    broken = {
+        "truncated": container[:-10],
+        "padded": container + b"\x00",
+        "wrong length": bytes(wrong_length),
+    }
+    for name, data in broken.items():
+        for unwrap in (QOICompressed.decode, QOICompressed.decompress):
+            try:
+                unwrap(data)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError(f"{name} container accepted by {unwrap}")
+
+    for method, level in (("bz2", 0), ("zlib", 10), ("lzma", -1), ("zstd", None)):
+        try:
+            QOICompressed.compress(encoded, method, level)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{method} level {level} accepted")
+
+    corpus = benchmark.make_corpus(sizes=(16,), kinds=["photo"])
+    results = benchmark.run_compression_benchmarks(
+        corpus, ["zlib"], levels=(1,), repeat=1, log=None
+    )
+    assert [r["method"] for r in results] == ["qoi", "zlib"]
+    assert all(r["roundtrip_ok"] for r in results)
+
+
+def test_sequence(tmp_path):
+    """Frames rebuilt from keyframes and deltas match, in order and when seeking."""
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (12, 20, 4), dtype=np.uint8)]
+    for i in range(10):
+        frame = frames[-1].copy()
+        frame[i, : i + 3] = rng.integers(0, 256, (i + 3, 4))
+        frames.append(frame)
+    desc = {"width": 20, "height": 12, "channels": 4, "colorspace": 0}
+
+    path = tmp_path / "burst.qoiq"
+    with QOISequenceWriter(str(path), desc, keyframe_interval=4) as writer:
+        sizes = [
+            writer.add_frame(frame, True if i == 6 else None)
+            for i, frame in enumerate(frames)
+        ]
+    assert max(sizes[1:4]) < sizes[0] // 4
+
+    with QOISequenceReader(str(path)) as reader:
+        assert len(reader) == len(frames) and reader.description == desc
+        assert [reader.keyframe_before(n) for n in (3, 4, 7, 9)] == [0, 4, 6, 8]
+        for n, decoded in enumerate(reader):
+            assert decoded["data"] == frames[n].tobytes()
+        for n in (9, 2, 5, -1, 3):
+            assert reader.frame(n)["data"] == frames[n].tobytes()
+
+    # Marking the first frame as a delta leaves frames 1-3 without a keyframe
+    data = bytearray(path.read_bytes())
+    index_offset = int.from_bytes(data[-16:-8], "big")
+    data[index_offset + 16] = 1
+    path.write_bytes(data)
+    with QOISequenceReader(str(path)) as reader:
+        for n in (2, 0):
+            with pytest.raises(ValueError, match="No keyframe"):
+                reader.frame(n)
+        assert reader.frame(5)["data"] == frames[5].tobytes()